@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from dotenv import load_dotenv
@@ -24,6 +24,114 @@ class Settings(BaseSettings):
     # Logging
     log_level: str = "INFO"
     
+    # Execution Pools (blocking embedding and storage work)
+    encode_pool_workers: int = 2  # batched embedding model calls running at once
+    io_pool_workers: int = 8
+    executor_queue_depth: int = 64
+    
+    # Database
+    database_url: str = "sqlite:///./data/sqlite/therapist_bot.db"
+    database_driver: str = "sync"  # "sync" (ORM calls on the I/O pool) or "async" (asyncio engine)
+    database_async_url: Optional[str] = None  # defaults to DATABASE_URL with its async driver
+    database_pool_size: int = 10
+    database_max_overflow: int = 20
+    database_pool_timeout_seconds: float = 10.0
+    database_migrations_enabled: bool = True
+    
+    # Session Cache
+    session_cache_enabled: bool = True
+    session_cache_size: int = 1024
+    session_cache_ttl_seconds: float = 900.0
+    session_cache_recent_messages: int = 20
+    
+    # SQLite Storage Profile
+    sqlite_wal_enabled: bool = True
+    sqlite_synchronous: str = "NORMAL"  # "OFF", "NORMAL", "FULL" or "EXTRA"
+    sqlite_cache_size_kib: int = 65536
+    sqlite_mmap_size_bytes: int = 268435456
+    sqlite_busy_timeout_ms: int = 5000
+    
+    # Embedding Model
+    embedding_backend: str = "torch"  # "torch", "torch_int8", "onnx" or "onnx_int8"
+    embedding_onnx_int8_file: str = "onnx/model_qint8_avx2.onnx"
+    
+    # Embedding Batching
+    embedding_max_batch_size: int = 32
+    embedding_max_wait_ms: float = 5.0
+    embedding_cache_size: int = 2048
+    
+    # Vector Store
+    vector_backend: str = "chroma"  # "chroma" or "numpy"
+    numpy_store_path: str = "./vector_data"
+    vector_dtype: str = "float32"  # "float32", "float16" or "int8" (NumPy backend)
+    vector_pca_path: Optional[str] = None  # fitted PCAProjection (.npz); changes stored dimension
+    vector_layout: str = "per_session"  # "per_session" or "shared"
+    vector_shared_shards: int = 1
+    collection_cache_size: int = 1024
+    collection_cache_idle_seconds: float = 900.0
+    chroma_memory_limit_bytes: int = 512 * 1024 * 1024
+    vector_write_batch_size: int = 64
+    vector_write_max_delay_ms: float = 5.0
+    
+    # LLM Admission Control
+    llm_max_in_flight: int = 8
+    llm_max_queue: int = 32
+    llm_queue_timeout_seconds: float = 10.0
+    
+    # LLM Resilience
+    llm_max_attempts: int = 3
+    llm_retry_base_delay_seconds: float = 0.25
+    llm_retry_max_delay_seconds: float = 4.0
+    llm_retry_budget_seconds: float = 30.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_min_delay_seconds: float = 1.0
+    llm_breaker_failure_rate: float = 0.5
+    llm_breaker_min_calls: int = 10
+    llm_breaker_window_seconds: float = 30.0
+    llm_breaker_open_seconds: float = 15.0
+    
+    # LLM HTTP Transport
+    llm_http_max_connections: int = 100
+    llm_http_max_keepalive_connections: int = 20
+    llm_http_keepalive_expiry_seconds: float = 30.0
+    llm_http2: bool = False  # requires the h2 package
+    llm_connect_timeout_seconds: float = 5.0
+    llm_read_timeout_seconds: float = 60.0
+    llm_write_timeout_seconds: float = 10.0
+    llm_pool_timeout_seconds: float = 5.0
+    
+    # Request Deadlines
+    request_timeout_seconds: float = 60.0
+    disconnect_poll_interval_seconds: float = 0.25
+    
+    # Idempotency
+    idempotency_ttl_seconds: float = 300.0  # replay window for explicit Idempotency-Key headers
+    idempotency_window_seconds: float = 10.0  # replay window for keys derived from session + message
+    idempotency_cache_size: int = 4096
+    
+    # Context Assembly
+    context_token_budget: int = 1500
+    context_recent_turns: int = 6
+    context_retrieved_items: int = 5
+    context_max_item_tokens: int = 300
+    
+    # Rolling Session Summaries
+    session_summary_enabled: bool = True
+    session_summary_every_turns: int = 10
+    session_summary_max_tokens: int = 250
+    
+    # LLM Model Routing
+    llm_routing_enabled: bool = True
+    llm_premium_model: str = "claude-3-5-sonnet-20241022"
+    llm_fast_model: str = "claude-3-5-haiku-20241022"
+    llm_premium_max_tokens: int = 1000
+    llm_fast_max_tokens: int = 400
+    llm_temperature: float = 0.7
+    llm_route_short_message_chars: int = 80
+    llm_route_long_message_chars: int = 400
+    llm_route_deep_session_messages: int = 12
+    llm_route_default_tier: str = "premium"  # "premium" or "fast"
+    
     @field_validator("anthropic_api_key")
     @classmethod
     def validate_anthropic_api_key(cls, v):
@@ -33,6 +141,55 @@ class Settings(BaseSettings):
             raise ValueError("Invalid Anthropic API key format")
         return v
     
+    @field_validator("embedding_backend")
+    @classmethod
+    def validate_embedding_backend(cls, v):
+        if v not in ("torch", "torch_int8", "onnx", "onnx_int8"):
+            raise ValueError("EMBEDDING_BACKEND must be one of: torch, torch_int8, onnx, onnx_int8")
+        return v
+    
+    @field_validator("llm_route_default_tier")
+    @classmethod
+    def validate_llm_route_default_tier(cls, v):
+        if v not in ("premium", "fast"):
+            raise ValueError("LLM_ROUTE_DEFAULT_TIER must be 'premium' or 'fast'")
+        return v
+    
+    @field_validator("database_driver")
+    @classmethod
+    def validate_database_driver(cls, v):
+        if v not in ("sync", "async"):
+            raise ValueError("DATABASE_DRIVER must be 'sync' or 'async'")
+        return v
+    
+    @field_validator("sqlite_synchronous")
+    @classmethod
+    def validate_sqlite_synchronous(cls, v):
+        if v.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError("SQLITE_SYNCHRONOUS must be one of: OFF, NORMAL, FULL, EXTRA")
+        return v.upper()
+    
+    @field_validator("vector_backend")
+    @classmethod
+    def validate_vector_backend(cls, v):
+        if v not in ("chroma", "numpy"):
+            raise ValueError("VECTOR_BACKEND must be 'chroma' or 'numpy'")
+        return v
+    
+    @field_validator("vector_dtype")
+    @classmethod
+    def validate_vector_dtype(cls, v):
+        if v not in ("float32", "float16", "int8"):
+            raise ValueError("VECTOR_DTYPE must be 'float32', 'float16' or 'int8'")
+        return v
+    
+    @field_validator("vector_layout")
+    @classmethod
+    def validate_vector_layout(cls, v):
+        if v not in ("per_session", "shared"):
+            raise ValueError("VECTOR_LAYOUT must be 'per_session' or 'shared'")
+        return v
+    
     
     model_config = {
         "env_file": ".env",
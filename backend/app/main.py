@@ -1,8 +1,10 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import structlog
 from datetime import datetime
+import json
 import os
 from dotenv import load_dotenv
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -10,9 +12,18 @@ from slowapi.util import get_remote_address
 
 from .models import MessageRequest, MessageResponse
 from .services.llm_service import LLMService
+from .services.admission import AdmissionController, AdmissionRejected
+from .services.resilience import CircuitBreaker, ResilientCaller
+from .services.model_router import ModelRouter
+from .services.http_transport import create_llm_http_client
+from .services.deadline import Deadline, DeadlineExceeded
+from .services.cancellation import ClientDisconnected, run_until_disconnected
+from .services.idempotency import IdempotencyGuard, OUTCOME_FRESH, request_key
 from .services.guardrails import validate_message_content
 from .services.rag_service import RAGService
-from .database.connection import init_database
+from .services.unit_of_work import UnitOfWork
+from .services.sqlite_profile import apply_configured_pragmas, run_migrations
+from .database.connection import get_database, init_database
 from .config import settings
 
 # Load environment variables
@@ -35,6 +46,15 @@ logger = structlog.get_logger()
 # Initialize services
 llm_service = None
 rag_service = None
+idempotency_guard = IdempotencyGuard(maxsize=settings.idempotency_cache_size)
+
+def _database_engine():
+    """The engine behind get_database() sessions."""
+    db = next(get_database())
+    try:
+        return db.get_bind()
+    finally:
+        db.close()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -45,13 +65,48 @@ async def lifespan(app: FastAPI):
     # Initialize database
     try:
         init_database()
+        engine = _database_engine()
+        apply_configured_pragmas(engine)
+        if settings.database_migrations_enabled:
+            run_migrations(engine)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error("Failed to initialize database", error=str(e))
         raise
     
     # Initialize LLM service
-    llm_service = LLMService(settings.anthropic_api_key)
+    llm_service = LLMService(
+        settings.anthropic_api_key,
+        http_client=create_llm_http_client(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+            keepalive_expiry=settings.llm_http_keepalive_expiry_seconds,
+            http2=settings.llm_http2,
+            connect_timeout=settings.llm_connect_timeout_seconds,
+            read_timeout=settings.llm_read_timeout_seconds,
+            write_timeout=settings.llm_write_timeout_seconds,
+            pool_timeout=settings.llm_pool_timeout_seconds
+        ),
+        admission=AdmissionController(
+            max_in_flight=settings.llm_max_in_flight,
+            max_queue=settings.llm_max_queue,
+            queue_timeout_seconds=settings.llm_queue_timeout_seconds
+        ),
+        resilience=ResilientCaller(
+            max_attempts=settings.llm_max_attempts,
+            base_delay=settings.llm_retry_base_delay_seconds,
+            max_delay=settings.llm_retry_max_delay_seconds,
+            budget_seconds=settings.llm_retry_budget_seconds,
+            hedge=settings.llm_hedge_enabled,
+            hedge_min_delay=settings.llm_hedge_min_delay_seconds,
+            breaker=CircuitBreaker(
+                failure_rate=settings.llm_breaker_failure_rate,
+                min_calls=settings.llm_breaker_min_calls,
+                window_seconds=settings.llm_breaker_window_seconds,
+                open_seconds=settings.llm_breaker_open_seconds
+            )
+        )
+    )
     logger.info("LLM service initialized")
     
     # Test API connection
@@ -64,7 +119,19 @@ async def lifespan(app: FastAPI):
     
     # Initialize RAG service
     try:
-        rag_service = RAGService(llm_service=llm_service)
+        router = ModelRouter(
+            premium_model=settings.llm_premium_model,
+            fast_model=settings.llm_fast_model,
+            premium_max_tokens=settings.llm_premium_max_tokens,
+            fast_max_tokens=settings.llm_fast_max_tokens,
+            temperature=settings.llm_temperature,
+            short_message_chars=settings.llm_route_short_message_chars,
+            long_message_chars=settings.llm_route_long_message_chars,
+            deep_session_messages=settings.llm_route_deep_session_messages,
+            default_tier=settings.llm_route_default_tier,
+            enabled=settings.llm_routing_enabled
+        )
+        rag_service = RAGService(llm_service=llm_service, router=router)
         logger.info("RAG service initialized successfully")
     except Exception as e:
         logger.error("Failed to initialize RAG service", error=str(e))
@@ -74,6 +141,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Therapist Bot API")
+    if rag_service:
+        rag_service.shutdown()
+        await rag_service.session_service.close()
+    if llm_service:
+        await llm_service.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -136,11 +208,15 @@ async def health_check():
 
 @app.post("/respond", response_model=MessageResponse)
 @limiter.limit(f"{settings.rate_limit_per_minute}/minute")
-async def respond_to_message(message_request: MessageRequest, request: Request):
+async def respond_to_message(message_request: MessageRequest, request: Request, response: Response):
     """
     Main endpoint for therapeutic conversations with RAG-enhanced context awareness.
     Processes user messages through safety guardrails and generates CBT-focused responses.
+    Retries carrying the same Idempotency-Key (or repeating the same message in a session
+    within a short window) share one computation instead of storing and generating again.
     """
+    # Everything below, including the LLM call, shares this request's time budget
+    deadline = Deadline(settings.request_timeout_seconds)
     user_message = message_request.message.strip()
     session_id = message_request.session_id
     
@@ -179,7 +255,28 @@ async def respond_to_message(message_request: MessageRequest, request: Request):
             logger.error("RAG service not initialized")
             raise HTTPException(status_code=500, detail="Service temporarily unavailable")
         
-        rag_response = await rag_service.generate_rag_response(user_message, session_id)
+        explicit_key = request.headers.get("Idempotency-Key")
+        dedup_key = request_key(session_id, user_message, explicit_key)
+        
+        async def generate():
+            if not dedup_key:
+                return await rag_service.generate_rag_response(user_message, session_id, deadline=deadline)
+            rag_response, outcome = await idempotency_guard.run(
+                dedup_key,
+                lambda: rag_service.generate_rag_response(user_message, session_id, deadline=deadline),
+                ttl_seconds=settings.idempotency_ttl_seconds if explicit_key else settings.idempotency_window_seconds
+            )
+            if outcome != OUTCOME_FRESH:
+                response.headers["Idempotent-Replayed"] = "true"
+            return rag_response
+        
+        # Stop generating (and storing) a reply nobody will read if the client goes away;
+        # a shared computation keeps running while another retry still waits on it
+        rag_response = await run_until_disconnected(
+            generate(),
+            request.is_disconnected,
+            poll_interval=settings.disconnect_poll_interval_seconds
+        )
         
         # Log successful response (without content for privacy)
         logger.info(
@@ -199,6 +296,12 @@ async def respond_to_message(message_request: MessageRequest, request: Request):
             is_new_session=rag_response["is_new_session"]
         )
         
+    except ClientDisconnected:
+        return _client_closed(session_id)
+    except AdmissionRejected as e:
+        raise _overloaded(e, session_id)
+    except DeadlineExceeded as e:
+        raise _timed_out(e, session_id)
     except Exception as e:
         logger.error(
             "error_processing_message",
@@ -213,6 +316,166 @@ async def respond_to_message(message_request: MessageRequest, request: Request):
             detail="I'm having trouble processing your message right now. Please try again in a moment."
         )
 
+def _overloaded(e: AdmissionRejected, session_id) -> HTTPException:
+    """503 with a Retry-After hint for load-shed requests"""
+    logger.warning("request_shed", reason=e.reason, retry_after=e.retry_after, session_id=session_id)
+    return HTTPException(
+        status_code=503,
+        detail="The service is busy right now. Please try again shortly.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def _timed_out(e: DeadlineExceeded, session_id) -> HTTPException:
+    """504 for requests that ran out of their deadline"""
+    logger.warning("request_deadline_exceeded", error_message=str(e), session_id=session_id)
+    return HTTPException(
+        status_code=504,
+        detail="This is taking longer than expected. Please try again in a moment."
+    )
+
+def _client_closed(session_id) -> Response:
+    """Nginx-style 499 for requests whose client disconnected; nobody receives it"""
+    logger.info("client_disconnected", session_id=session_id)
+    return Response(status_code=499)
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/respond/stream")
+@limiter.limit(f"{settings.rate_limit_per_minute}/minute")
+async def respond_to_message_stream(message_request: MessageRequest, request: Request):
+    """
+    Streaming variant of /respond using Server-Sent Events.
+    Emits a `token` event per text chunk and a final `done` event with session metadata;
+    the therapist message is persisted once the stream has completed.
+    """
+    deadline = Deadline(settings.request_timeout_seconds)
+    user_message = message_request.message.strip()
+    session_id = message_request.session_id
+    
+    logger.info(
+        "stream_message_received",
+        message_length=len(user_message),
+        session_id=session_id,
+        has_session=session_id is not None,
+        client_ip=request.client.host if request.client else "unknown"
+    )
+    
+    # Validate message content and check safety guardrails
+    is_valid, validation_response = validate_message_content(user_message)
+    
+    if not is_valid:
+        logger.warning(
+            "message_validation_failed",
+            message_preview=user_message[:50] + "..." if len(user_message) > 50 else user_message,
+            validation_response=validation_response,
+            session_id=session_id
+        )
+        
+        async def safety_events():
+            yield _sse_event("token", {"text": validation_response})
+            yield _sse_event("done", {
+                "session_id": session_id or "safety_response",
+                "context_used": False,
+                "is_new_session": False,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        
+        return StreamingResponse(safety_events(), media_type="text/event-stream")
+    
+    if not rag_service:
+        logger.error("RAG service not initialized")
+        raise HTTPException(status_code=500, detail="Service temporarily unavailable")
+    
+    # Wait for the first event before sending headers, so shed requests still get a 503
+    events = rag_service.stream_rag_response(user_message, session_id, deadline=deadline)
+    try:
+        first_event = await run_until_disconnected(
+            events.__anext__(),
+            request.is_disconnected,
+            poll_interval=settings.disconnect_poll_interval_seconds
+        )
+    except ClientDisconnected:
+        return _client_closed(session_id)
+    except AdmissionRejected as e:
+        raise _overloaded(e, session_id)
+    except DeadlineExceeded as e:
+        raise _timed_out(e, session_id)
+    except Exception as e:
+        logger.error(
+            "error_streaming_message",
+            error_type=type(e).__name__,
+            error_message=str(e),
+            session_id=session_id
+        )
+        raise HTTPException(
+            status_code=500,
+            detail="I'm having trouble processing your message right now. Please try again in a moment."
+        )
+    
+    async def replay_events():
+        yield first_event
+        async for event in events:
+            yield event
+    
+    async def rag_events():
+        try:
+            async for event in replay_events():
+                if event["type"] == "token":
+                    yield _sse_event("token", {"text": event["text"]})
+                else:
+                    logger.info(
+                        "rag_stream_completed",
+                        user_message_length=len(user_message),
+                        session_id=event["session_id"],
+                        context_used=event["context_used"],
+                        is_new_session=event["is_new_session"]
+                    )
+                    yield _sse_event("done", {
+                        "session_id": event["session_id"],
+                        "context_used": event["context_used"],
+                        "is_new_session": event["is_new_session"],
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+        except Exception as e:
+            logger.error(
+                "error_streaming_message",
+                error_type=type(e).__name__,
+                error_message=str(e),
+                session_id=session_id
+            )
+            # Headers are already sent, so errors are reported in-band
+            yield _sse_event("error", {
+                "detail": "I'm having trouble processing your message right now. Please try again in a moment."
+            })
+        finally:
+            # Closes the RAG and upstream streams promptly when the client disconnects mid-stream
+            await events.aclose()
+    
+    return StreamingResponse(
+        rag_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Saturation signals for autoscaling: LLM admission queue and execution pools"""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "llm_admission": llm_service.admission.stats() if llm_service and llm_service.admission else None,
+        "llm_resilience": llm_service.resilience.stats() if llm_service else None,
+        "execution_pools": rag_service.executor.stats() if rag_service else None,
+        "model_routing": rag_service.router.stats() if rag_service else None,
+        "llm_calls": llm_service.stats() if llm_service else None,
+        "rag_turns": rag_service.stats() if rag_service else None,
+        "session_summaries": rag_service.summarizer.stats() if rag_service else None,
+        "idempotency": idempotency_guard.stats(),
+        "database_units": UnitOfWork.stats(),
+        "session_cache": rag_service.session_service.cache.stats() if rag_service and rag_service.session_service.cache else None
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint with basic API information"""
@@ -222,7 +485,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "respond": "/respond (POST)",
+            "respond_stream": "/respond/stream (POST, text/event-stream)",
             "docs": "/docs"
         }
     }
@@ -0,0 +1,145 @@
+"""
+Admission control for upstream LLM calls: bounded concurrency, a bounded
+wait queue with deadlines, and load shedding.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+import math
+import time
+import structlog
+from typing import Dict, Optional
+
+logger = structlog.get_logger(__name__)
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed instead of queued; carries a Retry-After hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"LLM admission rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Limits in-flight LLM calls and sheds requests that cannot start in time.
+
+    At most ``max_in_flight`` calls run at once and at most ``max_queue``
+    wait for a slot. A waiting call gives up after its timeout; a call whose
+    estimated wait already exceeds its timeout is rejected immediately, so
+    overload turns into fast rejections instead of slow ones. Background
+    work uses ``try_admit``, which never queues and never takes a slot a
+    live call is waiting for.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32, queue_timeout_seconds: float = 10.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_seconds
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "deadline": 0, "busy": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Moving average of call duration, used to predict queue wait
+        self._service_time: Optional[float] = None
+
+    def estimated_wait(self) -> float:
+        """Seconds a newly arriving call is expected to wait for a slot."""
+        if self._in_flight < self.max_in_flight and self._queued == 0:
+            return 0.0
+        if self._service_time is None:
+            return 0.0
+        return (self._queued + 1) / self.max_in_flight * self._service_time
+
+    def _reject(self, reason: str):
+        self._rejected[reason] += 1
+        retry_after = max(1, math.ceil(self.estimated_wait()))
+        logger.warning("LLM call shed",
+                      reason=reason,
+                      in_flight=self._in_flight,
+                      queued=self._queued,
+                      retry_after=retry_after)
+        raise AdmissionRejected(reason, retry_after)
+
+    def check(self, timeout: Optional[float] = None):
+        """Raise AdmissionRejected if a call arriving now would be shed."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        if self._in_flight >= self.max_in_flight and self._queued >= self.max_queue:
+            self._reject("queue_full")
+        if timeout <= 0 or self.estimated_wait() > timeout:
+            self._reject("deadline")
+
+    @asynccontextmanager
+    async def admit(self, timeout: Optional[float] = None):
+        """Hold an LLM call slot for the duration of the block.
+
+        Args:
+            timeout: Longest time to wait for a slot; defaults to the queue timeout
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        self.check(timeout)
+
+        started = time.monotonic()
+        self._queued += 1
+        timed_out = False
+        try:
+            # asyncio.timeout cancels only the pending acquire; wait_for on 3.11 can
+            # time out after the acquire succeeded and leak the permit
+            async with asyncio.timeout(timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            timed_out = True
+        finally:
+            self._queued -= 1
+        if timed_out:
+            self._reject("deadline")
+
+        waited = time.monotonic() - started
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        async with self._holding():
+            yield
+
+    @asynccontextmanager
+    async def try_admit(self):
+        """Hold a slot for the block only if one is free right now.
+
+        Raises AdmissionRejected instead of queuing, including when live
+        calls are already waiting, so background work yields to them.
+        """
+        if self._queued or self._slots.locked():
+            self._reject("busy")
+        # A free slot is taken without suspending
+        await self._slots.acquire()
+        async with self._holding():
+            yield
+
+    @asynccontextmanager
+    async def _holding(self):
+        """Count an acquired slot as in flight and release it after the block."""
+        self._in_flight += 1
+        call_started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            duration = time.monotonic() - call_started
+            self._service_time = duration if self._service_time is None else 0.8 * self._service_time + 0.2 * duration
+
+    def stats(self) -> Dict:
+        """Return saturation counters for metrics and autoscaling."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "avg_wait_ms": self._wait_total / self._admitted * 1000 if self._admitted else 0.0,
+            "max_wait_ms": self._wait_max * 1000,
+            "estimated_wait_ms": self.estimated_wait() * 1000
+        }
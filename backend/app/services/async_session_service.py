@@ -0,0 +1,407 @@
+"""
+Asyncio implementation of the session store on SQLAlchemy's async engine.
+"""
+from sqlalchemy import delete, desc, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from ..database.models import ChatSession, Message, SessionInsight
+from . import session_counters
+import structlog
+from typing import List, Optional, Dict
+import uuid
+
+logger = structlog.get_logger(__name__)
+
+# Async drivers substituted for the default sync ones
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql"
+}
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` with the async driver for its dialect, e.g. sqlite:// -> sqlite+aiosqlite://."""
+    parsed = make_url(url)
+    if parsed.drivername in _ASYNC_DRIVERS:
+        parsed = parsed.set(drivername=_ASYNC_DRIVERS[parsed.drivername])
+    return parsed.render_as_string(hide_password=False)
+
+def _message_dict(message: Message) -> Dict:
+    return {
+        "content": message.content,
+        "type": message.message_type,
+        "timestamp": message.timestamp.isoformat() if message.timestamp else None,
+        "message_id": message.message_id
+    }
+
+class AsyncSessionService:
+    """Manages chat sessions and conversation history without blocking the event loop.
+
+    Same public API as SessionService, with coroutine methods. Database
+    round trips are awaited on the async engine's connection pool (aiosqlite
+    locally, e.g. asyncpg for a server database); vector store calls, which
+    are still blocking, go through the executor's I/O pool and only happen
+    after the rows they refer to have committed.
+    """
+
+    def __init__(self, database_url: str, embedding_service=None, executor=None, pool_size: int = 10,
+                 max_overflow: int = 20, pool_timeout: float = 10.0):
+        self.embedding_service = embedding_service
+        self.executor = executor
+        # The write-through session cache is only wired into the sync store
+        self.cache = None
+        url = async_database_url(database_url)
+        engine_options = {"pool_pre_ping": True}
+        if not url.startswith("sqlite"):
+            # SQLite connections are local files; pool sizing only matters for a server
+            engine_options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+        self.engine = create_async_engine(url, **engine_options)
+        self._sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        logger.info("Async session store initialized", driver=make_url(url).drivername)
+
+    async def close(self):
+        """Dispose of the engine's connection pool."""
+        await self.engine.dispose()
+
+    async def _run_vector(self, fn, *args, **kwargs):
+        if self.executor is None:
+            return fn(*args, **kwargs)
+        return await self.executor.run_io(fn, *args, **kwargs)
+
+    async def _get_session(self, db: AsyncSession, session_id: str) -> Optional[ChatSession]:
+        result = await db.execute(select(ChatSession).where(ChatSession.session_id == session_id))
+        return result.scalars().first()
+
+    async def _add_session(self, db: AsyncSession, metadata: Optional[Dict] = None) -> str:
+        session_id = str(uuid.uuid4())
+        db.add(ChatSession(session_id=session_id, session_metadata=metadata or {}, total_messages=0))
+        await db.flush()
+        await db.execute(session_counters.initial_rows(session_id))
+        return session_id
+
+    async def _create_collection(self, session_id: str):
+        """Create the vector collection of a committed session."""
+        if self.embedding_service:
+            await self._run_vector(self.embedding_service.create_session_collection, session_id)
+
+    async def _add_message(self, db: AsyncSession, session_id: str, content: str, message_type: str,
+                           token_count: Optional[int] = None) -> str:
+        message_id = str(uuid.uuid4())
+        new_message = Message(
+            message_id=message_id,
+            session_id=session_id,
+            content=content,
+            message_type=message_type,
+            token_count=token_count,
+            # Deterministic, so it is written with the row rather than after the vector
+            embedding_id=(
+                self.embedding_service.embedding_id_for(message_type, message_id)
+                if self.embedding_service else None
+            )
+        )
+
+        # Update session activity and message counters in SQL, without reading the row
+        for statement in session_counters.message_statements(session_id, message_type):
+            await db.execute(statement)
+
+        db.add(new_message)
+        await db.flush()
+
+        logger.info("Stored message",
+                   session_id=session_id,
+                   message_id=message_id,
+                   message_type=message_type,
+                   content_length=len(content))
+        return message_id
+
+    async def index_message(self, session_id: str, content: str, message_id: str, message_type: str,
+                            embedding=None) -> Optional[str]:
+        """Write a committed message's vector; its embedding ID is cleared if the write fails."""
+        if not self.embedding_service:
+            return None
+        embedding_id = await self.embedding_service.add_message_embedding_async(
+            session_id, content, message_id, message_type, embedding=embedding
+        )
+        if not embedding_id:
+            await self.clear_embedding_id(message_id)
+        return embedding_id
+
+    async def clear_embedding_id(self, message_id: str) -> bool:
+        """Unset the embedding ID of a message whose vector could not be written."""
+        try:
+            async with self._sessions.begin() as db:
+                await db.execute(
+                    update(Message).where(Message.message_id == message_id).values(embedding_id=None)
+                    .execution_options(synchronize_session=False)
+                )
+            return True
+        except Exception as e:
+            logger.error("Failed to clear embedding ID", message_id=message_id, error=str(e))
+            return False
+
+    async def _add_insight(self, db: AsyncSession, session_id: str, insight_type: str, content: str,
+                           confidence_score: Optional[float] = None) -> str:
+        insight_id = str(uuid.uuid4())
+        db.add(SessionInsight(
+            insight_id=insight_id,
+            session_id=session_id,
+            insight_type=insight_type,
+            content=content,
+            confidence_score=confidence_score
+        ))
+        for statement in session_counters.insight_statements(session_id):
+            await db.execute(statement)
+        return insight_id
+
+    async def create_session(self, metadata: Optional[Dict] = None) -> str:
+        """Create a new chat session and return the session ID."""
+        try:
+            async with self._sessions.begin() as db:
+                session_id = await self._add_session(db, metadata)
+            await self._create_collection(session_id)
+            logger.info("Created new chat session", session_id=session_id)
+            return session_id
+        except Exception as e:
+            logger.error("Failed to create session", error=str(e))
+            raise
+
+    async def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get session information by session ID."""
+        try:
+            async with self._sessions() as db:
+                return await self._get_session(db, session_id)
+        except Exception as e:
+            logger.error("Failed to get session", session_id=session_id, error=str(e))
+            return None
+
+    async def store_message(self, session_id: str, content: str, message_type: str, token_count: Optional[int] = None,
+                            embedding=None, index: bool = True) -> Optional[str]:
+        """Store a message in the database, then (unless ``index`` is False) in the vector store."""
+        try:
+            async with self._sessions.begin() as db:
+                message_id = await self._add_message(db, session_id, content, message_type, token_count)
+            if index:
+                await self.index_message(session_id, content, message_id, message_type, embedding=embedding)
+            return message_id
+        except Exception as e:
+            logger.error("Failed to store message",
+                        session_id=session_id,
+                        message_type=message_type,
+                        error=str(e))
+            return None
+
+    async def open_turn(self, session_id: Optional[str], content: str, embedding=None, index: bool = True) -> Dict:
+        """Resolve the session and store the user message in a single transaction.
+
+        Same contract as SessionService.open_turn.
+        """
+        async with self._sessions.begin() as db:
+            session = await self._get_session(db, session_id) if session_id else None
+            if session:
+                is_new_session = False
+                previous_messages = session.total_messages or 0
+                rolling_summary = (session.session_metadata or {}).get("rolling_summary", {})
+            else:
+                if session_id:
+                    logger.warning("Session not found, creating new one", requested_session_id=session_id)
+                session_id = await self._add_session(db)
+                is_new_session = True
+                previous_messages = 0
+                rolling_summary = {}
+
+            message_id = await self._add_message(db, session_id, content, "user")
+
+        if is_new_session:
+            await self._create_collection(session_id)
+        if index:
+            await self.index_message(session_id, content, message_id, "user", embedding=embedding)
+        return {
+            "session_id": session_id,
+            "is_new_session": is_new_session,
+            "message_id": message_id,
+            "previous_messages": previous_messages,
+            "rolling_summary": rolling_summary
+        }
+
+    async def store_reply(self, session_id: str, content: str, insights: Optional[List[Dict]] = None,
+                          index: bool = True) -> Optional[str]:
+        """Store the therapist message and the turn's insights (under a savepoint) in one commit.
+
+        Same contract as SessionService.store_reply.
+        """
+        try:
+            async with self._sessions.begin() as db:
+                message_id = await self._add_message(db, session_id, content, "therapist")
+                if insights:
+                    try:
+                        async with db.begin_nested():
+                            for insight in insights:
+                                await self._add_insight(db, session_id, insight["type"], insight["content"],
+                                                        insight["confidence"])
+                    except Exception as e:
+                        logger.warning("Failed to store insights", session_id=session_id, error=str(e))
+        except Exception as e:
+            logger.error("Failed to store reply", session_id=session_id, error=str(e))
+            return None
+
+        if index:
+            await self.index_message(session_id, content, message_id, "therapist")
+        return message_id
+
+    async def get_session_context(self, session_id: str, limit: int = 10) -> List[Dict]:
+        """Get recent conversation context for a session."""
+        try:
+            async with self._sessions() as db:
+                result = await db.execute(
+                    select(Message).where(Message.session_id == session_id)
+                    .order_by(desc(Message.timestamp)).limit(limit)
+                )
+                # Convert to context format (reverse to chronological order)
+                context = [_message_dict(message) for message in reversed(result.scalars().all())]
+
+            logger.info("Retrieved session context",
+                       session_id=session_id,
+                       message_count=len(context))
+            return context
+        except Exception as e:
+            logger.error("Failed to get session context", session_id=session_id, error=str(e))
+            return []
+
+    async def get_session_messages(self, session_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Get messages of a session in chronological order, starting at ``offset``."""
+        try:
+            async with self._sessions() as db:
+                result = await db.execute(
+                    select(Message).where(Message.session_id == session_id)
+                    .order_by(Message.timestamp).offset(offset).limit(limit)
+                )
+                return [_message_dict(message) for message in result.scalars().all()]
+        except Exception as e:
+            logger.error("Failed to get session messages", session_id=session_id, error=str(e))
+            return []
+
+    async def get_rolling_summary(self, session_id: str) -> Dict:
+        """Get the rolling summary stored in the session metadata, or an empty dict."""
+        session = await self.get_session(session_id)
+        if not session:
+            return {}
+        return (session.session_metadata or {}).get("rolling_summary", {})
+
+    async def save_rolling_summary(self, session_id: str, summary: Dict) -> bool:
+        """Store the rolling summary in the session metadata."""
+        try:
+            async with self._sessions.begin() as db:
+                session = await self._get_session(db, session_id)
+                if not session:
+                    return False
+                stored = (session.session_metadata or {}).get("rolling_summary", {})
+                if stored.get("summarized_messages", 0) >= summary.get("summarized_messages", 0):
+                    # Built on an older base than what is stored (see SessionService)
+                    logger.info("Skipped stale rolling summary", session_id=session_id)
+                    return False
+                # Assign a new dict so the JSON column is marked as changed
+                session.session_metadata = {**(session.session_metadata or {}), "rolling_summary": summary}
+
+            logger.info("Saved rolling summary",
+                       session_id=session_id,
+                       summarized_messages=summary.get("summarized_messages"))
+            return True
+        except Exception as e:
+            logger.error("Failed to save rolling summary", session_id=session_id, error=str(e))
+            return False
+
+    async def add_session_insight(self, session_id: str, insight_type: str, content: str,
+                                  confidence_score: Optional[float] = None) -> Optional[str]:
+        """Add a therapeutic insight to the session."""
+        try:
+            async with self._sessions.begin() as db:
+                insight_id = await self._add_insight(db, session_id, insight_type, content, confidence_score)
+
+            logger.info("Added session insight",
+                       session_id=session_id,
+                       insight_type=insight_type,
+                       insight_id=insight_id)
+            return insight_id
+        except Exception as e:
+            logger.error("Failed to add session insight",
+                        session_id=session_id,
+                        insight_type=insight_type,
+                        error=str(e))
+            return None
+
+    async def get_session_insights(self, session_id: str, insight_type: Optional[str] = None) -> List[Dict]:
+        """Get therapeutic insights for a session."""
+        try:
+            query = select(SessionInsight).where(SessionInsight.session_id == session_id)
+            if insight_type:
+                query = query.where(SessionInsight.insight_type == insight_type)
+
+            async with self._sessions() as db:
+                result = await db.execute(query.order_by(desc(SessionInsight.created_at)))
+                insights = [{
+                    "insight_id": insight.insight_id,
+                    "type": insight.insight_type,
+                    "content": insight.content,
+                    "confidence_score": insight.confidence_score,
+                    "created_at": insight.created_at.isoformat() if insight.created_at else None
+                } for insight in result.scalars().all()]
+
+            logger.info("Retrieved session insights",
+                       session_id=session_id,
+                       insight_type=insight_type,
+                       count=len(insights))
+            return insights
+        except Exception as e:
+            logger.error("Failed to get session insights",
+                        session_id=session_id,
+                        insight_type=insight_type,
+                        error=str(e))
+            return []
+
+    async def get_session_stats(self, session_id: str) -> Dict:
+        """Get statistical information about a session from its counters (see SessionService)."""
+        try:
+            async with self._sessions.begin() as db:
+                session = await self._get_session(db, session_id)
+                if not session:
+                    return {}
+
+                rows = (await db.execute(session_counters.counts_query(session_id))).all()
+                counts = session_counters.stored_counts(session.total_messages, rows)
+                if counts is None:
+                    rows = (await db.execute(session_counters.count_query(session_id))).all()
+                    statements, counts = session_counters.repair(session_id, rows)
+                    for statement in statements:
+                        await db.execute(statement)
+                    logger.info("Rebuilt session counters", session_id=session_id, **counts)
+
+            return {
+                "session_id": session_id,
+                "created_at": session.created_at.isoformat() if session.created_at else None,
+                "last_activity": session.last_activity.isoformat() if session.last_activity else None,
+                **counts,
+                "metadata": session.session_metadata
+            }
+        except Exception as e:
+            logger.error("Failed to get session stats", session_id=session_id, error=str(e))
+            return {}
+
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete a session and all associated data (for privacy compliance)."""
+        try:
+            async with self._sessions.begin() as db:
+                # Bulk deletes do not run ORM cascades, so remove children explicitly
+                await db.execute(delete(Message).where(Message.session_id == session_id))
+                await db.execute(delete(SessionInsight).where(SessionInsight.session_id == session_id))
+                await db.execute(session_counters.delete_rows(session_id))
+                await db.execute(delete(ChatSession).where(ChatSession.session_id == session_id))
+
+            # Delete from vector store
+            if self.embedding_service:
+                await self._run_vector(self.embedding_service.delete_session_collection, session_id)
+
+            logger.info("Deleted session", session_id=session_id)
+            return True
+        except Exception as e:
+            logger.error("Failed to delete session", session_id=session_id, error=str(e))
+            return False
@@ -0,0 +1,117 @@
+"""
+Thread-safe bounded LRU cache with optional idle-time expiry.
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Entries idle for longer than ``ttl_seconds`` are treated as missing. The
+    optional ``on_evict`` callback receives ``(key, value)`` whenever an entry
+    leaves the cache through eviction, expiry or explicit removal.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float] = None, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, touched_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - touched_at > self.ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used."""
+        evicted = None
+        with self._lock:
+            entry = self._data.get(key)
+            now = time.monotonic()
+            if entry is not None and self._expired(entry[1], now):
+                evicted = (key, self._data.pop(key)[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data[key] = (entry[0], now)
+                self._data.move_to_end(key)
+                self.hits += 1
+        if evicted:
+            self._notify(*evicted)
+        return default if entry is None else entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Insert or replace a value, evicting old entries to stay in bounds."""
+        evicted = []
+        with self._lock:
+            now = time.monotonic()
+            if key in self._data:
+                old_value = self._data.pop(key)[0]
+                if old_value is not value:
+                    evicted.append((key, old_value))
+            self._data[key] = (value, now)
+            evicted.extend(self._evict_locked(now))
+        for item in evicted:
+            self._notify(*item)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self._notify(key, entry[0])
+        return entry[0]
+
+    def expire(self):
+        """Drop entries that have been idle past the TTL."""
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic())
+        for item in evicted:
+            self._notify(*item)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            items = [(key, entry[0]) for key, entry in self._data.items()]
+            self._data.clear()
+        for item in items:
+            self._notify(*item)
+
+    def _evict_locked(self, now: float) -> list:
+        evicted = []
+        while self._data:
+            key, (value, touched_at) = next(iter(self._data.items()))
+            if len(self._data) <= self.maxsize and not self._expired(touched_at, now):
+                break
+            del self._data[key]
+            evicted.append((key, value))
+        return evicted
+
+    def _notify(self, key: Hashable, value: Any):
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry[1], time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """Return size and hit-rate counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
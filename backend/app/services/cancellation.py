@@ -0,0 +1,35 @@
+"""
+Cancellation of request work when the client goes away.
+"""
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+class ClientDisconnected(Exception):
+    """Raised when the client disconnected before its response was ready."""
+
+async def run_until_disconnected(awaitable: Awaitable[T], is_disconnected: Callable[[], Awaitable[bool]],
+                                 poll_interval: float = 0.25) -> T:
+    """Await ``awaitable``, cancelling it if ``is_disconnected()`` turns true first.
+
+    The work runs as its own task and the connection is polled every
+    ``poll_interval`` seconds. On disconnect the task is cancelled, so
+    ``CancelledError`` unwinds every pipeline stage still awaiting, and
+    ClientDisconnected is raised once the task has finished unwinding.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,217 @@
+"""
+ChromaDB-backed vector store supporting per-session and shared layouts.
+"""
+import chromadb
+from chromadb.config import Settings
+import numpy as np
+import structlog
+import threading
+from typing import Dict, List, Optional, Set
+import uuid
+from .cache import LRUCache
+from .vector_codec import DTYPE_FLOAT32, VectorCodec
+from .vector_layout import LAYOUT_SHARED, collection_name_for, shard_for_session
+from .vector_store import VectorStore
+
+logger = structlog.get_logger(__name__)
+
+# New collections rank by cosine distance, matching NumpyVectorStore's scores
+COLLECTION_SPACE = {"hnsw:space": "cosine"}
+
+class ChromaVectorStore(VectorStore):
+    """Stores vectors in ChromaDB collections with cached collection handles.
+
+    Chroma keeps float32 internally, so only the codec's projection applies;
+    vectors are passed to Chroma as NumPy arrays rather than Python lists.
+    In the shared layout a session's count is read once (a metadata scan of
+    its shard) and then kept up to date by this store's own writes.
+    """
+
+    def __init__(self, data_path: str, layout: str, shards: int = 1,
+                 handle_cache_size: int = 1024, handle_idle_seconds: Optional[float] = None,
+                 memory_limit_bytes: int = 0, codec: Optional[VectorCodec] = None):
+        self.data_path = data_path
+        self.layout = layout
+        self.shards = shards
+        self.codec = codec or VectorCodec()
+        if self.codec.dtype != DTYPE_FLOAT32:
+            logger.warning("Chroma stores float32 vectors; compact dtype ignored", dtype=self.codec.dtype)
+        # Handles for active sessions; idle ones are dropped so their segments can be paged out
+        self.collection_cache = LRUCache(maxsize=handle_cache_size, ttl_seconds=handle_idle_seconds)
+        # Per-session vector counts for shared shards, where collection.count() spans many sessions
+        self.session_counts = LRUCache(maxsize=handle_cache_size, ttl_seconds=handle_idle_seconds)
+        self._counts_lock = threading.Lock()
+
+        logger.info("Initializing ChromaDB client", data_path=data_path, layout=layout)
+        self.client = chromadb.PersistentClient(
+            path=data_path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True,
+                # Bound loaded HNSW segments; least recently used sessions are unloaded
+                chroma_segment_cache_policy="LRU",
+                chroma_memory_limit_bytes=memory_limit_bytes
+            )
+        )
+
+    @property
+    def is_shared_layout(self) -> bool:
+        return self.layout == LAYOUT_SHARED
+
+    def _session_filter(self, session_id: str) -> Optional[Dict]:
+        """Metadata filter scoping a shared collection to one session."""
+        return {"session_id": session_id} if self.is_shared_layout else None
+
+    def _get_collection(self, session_id: str, create: bool = False):
+        """Resolve a session's collection, using the handle cache when possible.
+
+        Returns None if the collection does not exist and ``create`` is False.
+        Shared-layout shard collections are always created on first use.
+        """
+        self.collection_cache.expire()
+        collection_name = collection_name_for(session_id, self.layout, self.shards)
+        collection = self.collection_cache.get(collection_name)
+        if collection is not None:
+            return collection
+
+        if self.is_shared_layout:
+            collection = self.client.get_or_create_collection(
+                name=collection_name,
+                metadata={"layout": LAYOUT_SHARED, "shard": shard_for_session(session_id, self.shards),
+                          **COLLECTION_SPACE}
+            )
+        elif create:
+            collection = self.client.get_or_create_collection(
+                name=collection_name,
+                metadata={"session_id": session_id, "created_at": str(uuid.uuid4()), **COLLECTION_SPACE}
+            )
+        else:
+            try:
+                collection = self.client.get_collection(collection_name)
+            except Exception:
+                return None
+
+        self.collection_cache.put(collection_name, collection)
+        return collection
+
+    def create_session(self, session_id: str) -> None:
+        self._get_collection(session_id, create=True)
+
+    def add(self, session_id: str, ids: List[str], embeddings: np.ndarray,
+            documents: List[str], metadatas: List[Dict]) -> None:
+        collection = self._get_collection(session_id, create=True)
+        collection.add(
+            ids=ids,
+            embeddings=self.codec.prepare(embeddings),
+            documents=documents,
+            metadatas=metadatas
+        )
+        self._counted(session_id, len(ids))
+
+    def _counted(self, session_id: str, added: int):
+        """Bump a cached shared-layout count after a write; uncached sessions are counted on demand."""
+        if not self.is_shared_layout:
+            return
+        with self._counts_lock:
+            cached = self.session_counts.get(session_id)
+            if cached is not None:
+                self.session_counts.put(session_id, cached + added)
+
+    def write_key(self, session_id: str) -> str:
+        return collection_name_for(session_id, self.layout, self.shards)
+
+    def add_records(self, records: List[Dict]) -> None:
+        """Write records for one collection (possibly several sessions) in a single add."""
+        collection = self._get_collection(records[0]["session_id"], create=True)
+        collection.add(
+            ids=[record["id"] for record in records],
+            embeddings=self.codec.prepare(np.stack([record["embedding"] for record in records])),
+            documents=[record["document"] for record in records],
+            metadatas=[record["metadata"] for record in records]
+        )
+        added: Dict[str, int] = {}
+        for record in records:
+            added[record["session_id"]] = added.get(record["session_id"], 0) + 1
+        for session_id, count in added.items():
+            self._counted(session_id, count)
+
+    def query(self, session_id: str, embedding: np.ndarray, n_results: int) -> List[Dict]:
+        collection = self._get_collection(session_id)
+        if collection is None:
+            return []
+
+        if not self.is_shared_layout:
+            # A dedicated collection holds only this session, so its size bounds the search
+            n_results = min(n_results, collection.count())
+            if n_results == 0:
+                return []
+
+        results = collection.query(
+            query_embeddings=self.codec.prepare(embedding).reshape(1, -1),
+            n_results=n_results,
+            where=self._session_filter(session_id),
+            include=["documents", "metadatas", "distances"]
+        )
+        if not results["ids"] or not results["ids"][0]:
+            return []
+
+        to_similarity = self._similarity_fn(collection)
+        return [
+            {
+                "id": item_id,
+                "document": document,
+                "metadata": metadata,
+                "similarity": to_similarity(distance)
+            }
+            for item_id, document, metadata, distance in zip(
+                results["ids"][0],
+                results["documents"][0],
+                results["metadatas"][0],
+                results["distances"][0]
+            )
+        ]
+
+    @staticmethod
+    def _similarity_fn(collection):
+        """Map a collection's distances to cosine similarity.
+
+        Cosine collections return 1 - cos. Collections created before the
+        space was set use squared L2, which for the unit vectors the codec
+        stores is 2 - 2 cos.
+        """
+        if (collection.metadata or {}).get("hnsw:space") == "cosine":
+            return lambda distance: 1 - distance
+        return lambda distance: 1 - distance / 2
+
+    def count(self, session_id: str) -> int:
+        collection = self._get_collection(session_id)
+        if collection is None:
+            return 0
+        if not self.is_shared_layout:
+            return collection.count()
+        with self._counts_lock:
+            cached = self.session_counts.get(session_id)
+            if cached is None:
+                cached = len(collection.get(where=self._session_filter(session_id), include=[])["ids"])
+                self.session_counts.put(session_id, cached)
+            return cached
+
+    def existing_ids(self, session_id: str, ids: List[str]) -> Set[str]:
+        collection = self._get_collection(session_id)
+        if collection is None or not ids:
+            return set()
+        return set(collection.get(ids=ids, include=[])["ids"])
+
+    def delete_session(self, session_id: str) -> None:
+        if self.is_shared_layout:
+            self._get_collection(session_id).delete(where=self._session_filter(session_id))
+            self.session_counts.pop(session_id)
+            return
+
+        collection_name = collection_name_for(session_id, self.layout)
+        # Drop the cached handle first so no caller writes to a deleted collection
+        self.collection_cache.pop(collection_name)
+        try:
+            self.client.delete_collection(collection_name)
+        except Exception:
+            logger.info("Session collection not found for deletion", session_id=session_id)
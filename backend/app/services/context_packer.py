@@ -0,0 +1,140 @@
+"""
+Token-budgeted context assembly from recent turns and retrieved memories.
+"""
+import math
+import re
+import structlog
+from typing import Callable, Dict, Iterable, List
+
+logger = structlog.get_logger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate: one per punctuation mark, about four characters per word piece.
+
+    Slightly pessimistic for English prose compared with the Claude
+    tokenizer, so a packed prompt stays within its budget.
+    """
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int, token_counter: Callable[[str], int] = estimate_tokens) -> str:
+    """Cut ``text`` at a word boundary so it fits ``max_tokens``, marking the cut with '...'."""
+    if token_counter(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    # Longest word prefix that still fits alongside the ellipsis
+    while low < high:
+        middle = (low + high + 1) // 2
+        if token_counter(" ".join(words[:middle]) + "...") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "..." if low else ""
+
+def _normalized(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+class ContextPacker:
+    """Packs recent turns and retrieved items into a fixed input-token budget.
+
+    Recent turns are taken newest first, so the immediately preceding
+    exchange is always kept, then retrieved items by rank. Items already
+    present as a recent turn (same message id or same text) are dropped,
+    each item is capped at ``max_item_tokens``, and anything that does not
+    fit the remaining budget is skipped.
+    """
+
+    def __init__(self, token_budget: int = 1500, recent_turns: int = 6, max_item_tokens: int = 300,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.max_item_tokens = max_item_tokens
+        self.token_counter = token_counter
+
+    def pack(self, recent: List[Dict], retrieved: List[Dict], exclude_message_ids: Iterable[str] = ()) -> Dict:
+        """Select and trim context for one turn.
+
+        Args:
+            recent: Chronological turns from SessionService.get_session_context
+            retrieved: Ranked items from EmbeddingService.retrieve_relevant_context
+            exclude_message_ids: Messages to leave out, e.g. the current user message
+
+        Returns:
+            Dict with ``history`` (chat messages, oldest first), ``memories``
+            (retrieved items with trimmed content), ``tokens`` used and the
+            number of ``dropped`` items
+        """
+        excluded = set(exclude_message_ids)
+        remaining = self.token_budget
+        dropped = 0
+
+        # Newest turns first so the preceding exchange survives a tight budget
+        turns = [turn for turn in recent if turn.get("message_id") not in excluded][-self.recent_turns:]
+        kept_turns = []
+        for turn in reversed(turns):
+            content, cost = self._fit(turn["content"], remaining)
+            if content is None:
+                # Older turns would leave a gap in the conversation, so stop here
+                break
+            kept_turns.append({**turn, "content": content})
+            remaining -= cost
+        kept_turns.reverse()
+        dropped += len(turns) - len(kept_turns)
+
+        seen_ids = {turn.get("message_id") for turn in kept_turns} | excluded
+        seen_texts = {_normalized(turn["content"]) for turn in kept_turns}
+        memories = []
+        for item in retrieved:
+            if item.get("message_id") in seen_ids or _normalized(item["content"]) in seen_texts:
+                continue
+            content, cost = self._fit(item["content"], remaining)
+            if content is None:
+                dropped += 1
+                continue
+            memories.append({**item, "content": content})
+            seen_ids.add(item.get("message_id"))
+            seen_texts.add(_normalized(item["content"]))
+            remaining -= cost
+
+        packed = {
+            "history": self._as_messages(kept_turns),
+            "memories": memories,
+            "tokens": self.token_budget - remaining,
+            "dropped": dropped
+        }
+        logger.info("Packed conversation context",
+                   recent_turns=len(kept_turns),
+                   memories=len(memories),
+                   tokens=packed["tokens"],
+                   token_budget=self.token_budget,
+                   dropped=dropped)
+        return packed
+
+    def _fit(self, text: str, remaining: int):
+        """Return (content, tokens) trimmed to the item cap and remaining budget, or (None, 0)."""
+        limit = min(self.max_item_tokens, remaining)
+        if limit <= 0:
+            return None, 0
+        content = truncate_to_tokens(text, limit, self.token_counter)
+        if not content:
+            return None, 0
+        return content, self.token_counter(content)
+
+    @staticmethod
+    def _as_messages(turns: List[Dict]) -> List[Dict]:
+        """Convert turns into alternating chat messages that precede a new user message."""
+        messages: List[Dict] = []
+        for turn in turns:
+            role = "user" if turn["type"] == "user" else "assistant"
+            if messages and messages[-1]["role"] == role:
+                messages[-1]["content"] += "\n\n" + turn["content"]
+            else:
+                messages.append({"role": role, "content": turn["content"]})
+        # History must start with the user and end with the assistant before the new user turn
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0)
+        while messages and messages[-1]["role"] != "assistant":
+            messages.pop()
+        return messages
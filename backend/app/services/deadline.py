@@ -0,0 +1,32 @@
+"""
+Request deadlines propagated from the HTTP handler down to upstream calls.
+"""
+import time
+from typing import Optional
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has no time left for further work."""
+
+class Deadline:
+    """An absolute point in time by which a request must finish."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Time left for one operation, bounded by ``cap`` when given."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def check(self, stage: str = "request"):
+        """Raise DeadlineExceeded if no time is left."""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
@@ -0,0 +1,49 @@
+"""
+Inference backends for the sentence embedding model.
+"""
+from sentence_transformers import SentenceTransformer
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch_int8"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx_int8"
+
+EMBEDDING_BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+# Dynamically quantized export published with all-MiniLM-L6-v2; AVX2 runs on any modern x86 host
+DEFAULT_ONNX_INT8_FILE = "onnx/model_qint8_avx2.onnx"
+
+def load_embedding_model(model_name: str, backend: str = BACKEND_TORCH,
+                         onnx_int8_file: str = DEFAULT_ONNX_INT8_FILE) -> SentenceTransformer:
+    """Load the embedding model with the requested inference backend.
+
+    - ``torch``: fp32 PyTorch (reference quality)
+    - ``torch_int8``: PyTorch with dynamic int8 quantization of Linear layers
+    - ``onnx``: fp32 ONNX Runtime graph
+    - ``onnx_int8``: dynamically int8-quantized ONNX Runtime graph
+
+    ONNX backends need ``sentence-transformers[onnx]`` (optimum + onnxruntime).
+    All backends keep the SentenceTransformer ``encode`` API.
+    """
+    logger.info("Loading embedding model", model=model_name, backend=backend)
+
+    if backend == BACKEND_TORCH:
+        return SentenceTransformer(model_name)
+
+    if backend == BACKEND_TORCH_INT8:
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+
+    if backend == BACKEND_ONNX:
+        return SentenceTransformer(model_name, backend="onnx")
+
+    if backend == BACKEND_ONNX_INT8:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": onnx_int8_file})
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -1,41 +1,90 @@
 """
-Embedding service using ChromaDB for session-isolated vector storage.
+Embedding service with session-isolated vector storage.
 """
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import asyncio
 import structlog
 from typing import List, Dict, Optional
-import os
-import uuid
+import hashlib
+import numpy as np
+import re
+from .cache import LRUCache
+from .embedding_backends import load_embedding_model
+from .vector_codec import PCAProjection, VectorCodec
+from .vector_store import VectorStore
+from .write_batcher import WriteBatcher
+from .encode_scheduler import EncodeScheduler, PRIORITY_QUERY, PRIORITY_STORAGE
+from ..config import settings
 
 logger = structlog.get_logger(__name__)
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Fast, lightweight model
+CHROMA_DATA_PATH = "./chroma_data"
+
+def create_vector_store(dim: int, data_path: Optional[str] = None) -> VectorStore:
+    """Build the vector store selected by ``settings.vector_backend``.
+    
+    ``data_path`` overrides the configured location, e.g. to rebuild into a new directory.
+    """
+    projection = PCAProjection.load(settings.vector_pca_path) if settings.vector_pca_path else None
+    codec = VectorCodec(dtype=settings.vector_dtype, projection=projection)
+    
+    if settings.vector_backend == "numpy":
+        from .numpy_vector_store import NumpyVectorStore
+        return NumpyVectorStore(
+            data_path=data_path or settings.numpy_store_path,
+            dim=dim,
+            cache_size=settings.collection_cache_size,
+            idle_seconds=settings.collection_cache_idle_seconds,
+            codec=codec
+        )
+    
+    from .chroma_vector_store import ChromaVectorStore
+    return ChromaVectorStore(
+        data_path=data_path or CHROMA_DATA_PATH,
+        layout=settings.vector_layout,
+        shards=settings.vector_shared_shards,
+        handle_cache_size=settings.collection_cache_size,
+        handle_idle_seconds=settings.collection_cache_idle_seconds,
+        memory_limit_bytes=settings.chroma_memory_limit_bytes,
+        codec=codec
+    )
+
 class EmbeddingService:
-    """Manages vector embeddings with session-based isolation using ChromaDB."""
+    """Manages vector embeddings with session-based isolation behind a pluggable vector store."""
     
-    def __init__(self):
-        self.model_name = "all-MiniLM-L6-v2"  # Fast, lightweight model
-        self.chroma_data_path = "./chroma_data"
+    def __init__(self, encode_pool=None):
+        self.model_name = EMBEDDING_MODEL_NAME
         self.model = None
-        self.chroma_client = None
+        self.encoder = None
+        self.vector_store: Optional[VectorStore] = None
+        self.write_batcher = None
+        self.embedding_cache = LRUCache(maxsize=settings.embedding_cache_size)
+        # Batched model calls run here (ExecutionPools.encode); inline on the scheduler thread without one
+        self.encode_pool = encode_pool
         self._initialize_services()
     
     def _initialize_services(self):
-        """Initialize sentence transformer and ChromaDB client."""
+        """Initialize sentence transformer and the configured vector store."""
         try:
-            # Initialize sentence transformer model
-            logger.info("Loading sentence transformer model", model=self.model_name)
-            self.model = SentenceTransformer(self.model_name)
-            
-            # Initialize ChromaDB client with persistent storage
-            logger.info("Initializing ChromaDB client", data_path=self.chroma_data_path)
-            self.chroma_client = chromadb.PersistentClient(
-                path=self.chroma_data_path,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
+            # Initialize sentence transformer model on the configured inference backend
+            self.model = load_embedding_model(
+                self.model_name,
+                backend=settings.embedding_backend,
+                onnx_int8_file=settings.embedding_onnx_int8_file
+            )
+            self.encoder = EncodeScheduler(
+                self.model.encode,
+                max_batch_size=settings.embedding_max_batch_size,
+                max_wait_ms=settings.embedding_max_wait_ms,
+                pool=self.encode_pool
+            )
+            
+            self.vector_store = create_vector_store(self.model.get_sentence_embedding_dimension())
+            # Group-commit inserts: one add per collection per flush window
+            self.write_batcher = WriteBatcher(
+                lambda key, records: self.vector_store.add_records(records),
+                max_items=settings.vector_write_batch_size,
+                max_delay_ms=settings.vector_write_max_delay_ms
             )
             
             logger.info("Embedding service initialized successfully")
@@ -44,63 +93,81 @@ class EmbeddingService:
             logger.error("Failed to initialize embedding service", error=str(e))
             raise
     
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        """Hash of the normalized text; MiniLM is uncased so casing is folded too."""
+        normalized = re.sub(r"\s+", " ", text).strip().casefold()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    
+    def embed_text(self, text: str, priority: int = PRIORITY_STORAGE) -> np.ndarray:
+        """Embed a single text, serving repeated content from the LRU cache."""
+        key = self._cache_key(text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.encoder.encode([text], priority=priority)[0]
+            embedding.setflags(write=False)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
+    async def embed_text_async(self, text: str, priority: int = PRIORITY_STORAGE) -> np.ndarray:
+        """embed_text for the event loop: awaits the shared batch instead of blocking a thread."""
+        key = self._cache_key(text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = (await self.encoder.encode_async([text], priority=priority))[0]
+            embedding.setflags(write=False)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+    
     def create_session_collection(self, session_id: str) -> bool:
         """Create a new vector collection for a chat session."""
         try:
-            collection_name = f"session_{session_id.replace('-', '_')}"
-            
-            # Check if collection already exists
-            try:
-                existing_collection = self.chroma_client.get_collection(collection_name)
-                logger.info("Session collection already exists", session_id=session_id)
-                return True
-            except Exception:
-                # Collection doesn't exist, create new one
-                pass
-            
-            collection = self.chroma_client.create_collection(
-                name=collection_name,
-                metadata={"session_id": session_id, "created_at": str(uuid.uuid4())}
-            )
-            
-            logger.info("Created new session collection", session_id=session_id, collection=collection_name)
+            self.vector_store.create_session(session_id)
+            logger.info("Session collection ready", session_id=session_id)
             return True
             
         except Exception as e:
             logger.error("Failed to create session collection", session_id=session_id, error=str(e))
             return False
     
-    def add_message_embedding(self, session_id: str, message: str, message_id: str, message_type: str) -> Optional[str]:
-        """Add a message embedding to the session's vector collection."""
+    @staticmethod
+    def embedding_id_for(message_type: str, message_id: str) -> str:
+        """The vector ID of a message, known before its vector is written."""
+        return f"{message_type}_{message_id}"
+    
+    def _queue_embedding(self, session_id: str, message: str, message_id: str, message_type: str,
+                         embedding: np.ndarray):
+        """Queue a record for the next group commit; returns its ID and the flush future."""
+        embedding_id = self.embedding_id_for(message_type, message_id)
+        flushed = self.write_batcher.submit(self.vector_store.write_key(session_id), {
+            "session_id": session_id,
+            "id": embedding_id,
+            "embedding": embedding,
+            "document": message,
+            "metadata": {
+                "message_id": message_id,
+                "message_type": message_type,
+                "session_id": session_id
+            }
+        })
+        return embedding_id, flushed
+    
+    def add_message_embedding(self, session_id: str, message: str, message_id: str, message_type: str,
+                              embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """Add a message embedding to the session's vector collection.
+        
+        A precomputed ``embedding`` is reused as-is instead of encoding again.
+        Blocks until the write is durable; from the event loop use
+        ``add_message_embedding_async``.
+        """
         try:
-            collection_name = f"session_{session_id.replace('-', '_')}"
-            
-            # Get or create collection
-            try:
-                collection = self.chroma_client.get_collection(collection_name)
-            except Exception:
-                # Create collection if it doesn't exist
-                if not self.create_session_collection(session_id):
-                    return None
-                collection = self.chroma_client.get_collection(collection_name)
-            
-            # Generate embedding
-            embedding = self.model.encode([message])[0].tolist()
-            
-            # Create unique embedding ID
-            embedding_id = f"{message_type}_{message_id}"
-            
-            # Add to collection
-            collection.add(
-                embeddings=[embedding],
-                documents=[message],
-                metadatas=[{
-                    "message_id": message_id,
-                    "message_type": message_type,
-                    "session_id": session_id
-                }],
-                ids=[embedding_id]
-            )
+            # Generate embedding unless the caller already has one
+            if embedding is None:
+                embedding = self.embed_text(message, priority=PRIORITY_STORAGE)
+            
+            # Queue for the next group commit and wait until it is durable
+            embedding_id, flushed = self._queue_embedding(session_id, message, message_id, message_type, embedding)
+            flushed.result()
             
             logger.info("Added message embedding", 
                        session_id=session_id, 
@@ -116,43 +183,66 @@ class EmbeddingService:
                         error=str(e))
             return None
     
-    def retrieve_relevant_context(self, session_id: str, query: str, n_results: int = 5) -> List[Dict]:
-        """Retrieve relevant conversation context using semantic search."""
+    async def add_message_embedding_async(self, session_id: str, message: str, message_id: str, message_type: str,
+                                          embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """add_message_embedding for the event loop.
+        
+        Awaits the group commit instead of parking a pool thread on it, so
+        concurrent turns can fill a write batch up to its size limit.
+        """
         try:
-            collection_name = f"session_{session_id.replace('-', '_')}"
-            
-            # Get collection
-            try:
-                collection = self.chroma_client.get_collection(collection_name)
-            except Exception:
-                logger.info("No collection found for session", session_id=session_id)
-                return []
-            
-            # Generate query embedding
-            query_embedding = self.model.encode([query])[0].tolist()
-            
-            # Search for similar messages
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(n_results, collection.count()),
-                include=["documents", "metadatas", "distances"]
-            )
+            if embedding is None:
+                embedding = await self.embed_text_async(message, priority=PRIORITY_STORAGE)
+            
+            embedding_id, flushed = self._queue_embedding(session_id, message, message_id, message_type, embedding)
+            await asyncio.wrap_future(flushed)
+            
+            logger.info("Added message embedding", 
+                       session_id=session_id, 
+                       message_type=message_type,
+                       embedding_id=embedding_id)
+            
+            return embedding_id
+            
+        except Exception as e:
+            logger.error("Failed to add message embedding", 
+                        session_id=session_id, 
+                        message_id=message_id, 
+                        error=str(e))
+            return None
+    
+    def retrieve_relevant_context(self, session_id: str, query: str, n_results: int = 5,
+                                  query_embedding: Optional[np.ndarray] = None,
+                                  exclude_message_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Retrieve relevant conversation context using semantic search.
+        
+        Messages in ``exclude_message_ids`` (typically the in-flight user message)
+        are left out so they don't take up a context slot.
+        """
+        try:
+            # Generate query embedding unless the caller already has one
+            if query_embedding is None:
+                query_embedding = self.embed_text(query, priority=PRIORITY_QUERY)
+            
+            # Search for similar messages, over-fetching to cover excluded ones
+            excluded = set(exclude_message_ids or [])
+            results = self.vector_store.query(session_id, query_embedding, n_results + len(excluded))
             
             # Format results
             context_items = []
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    context_items.append({
-                        "content": doc,
-                        "message_type": metadata.get("message_type", "unknown"),
-                        "message_id": metadata.get("message_id", ""),
-                        "similarity_score": 1 - distance,  # Convert distance to similarity
-                        "rank": i + 1
-                    })
+            for result in results:
+                metadata = result["metadata"] or {}
+                if metadata.get("message_id") in excluded:
+                    continue
+                context_items.append({
+                    "content": result["document"],
+                    "message_type": metadata.get("message_type", "unknown"),
+                    "message_id": metadata.get("message_id", ""),
+                    "similarity_score": result["similarity"],
+                    "rank": len(context_items) + 1
+                })
+                if len(context_items) == n_results:
+                    break
             
             logger.info("Retrieved relevant context", 
                        session_id=session_id, 
@@ -170,11 +260,7 @@ class EmbeddingService:
     def get_session_message_count(self, session_id: str) -> int:
         """Get the total number of messages in a session collection."""
         try:
-            collection_name = f"session_{session_id.replace('-', '_')}"
-            collection = self.chroma_client.get_collection(collection_name)
-            return collection.count()
-        except Exception:
-            return 0
+            return self.vector_store.count(session_id)
         except Exception as e:
             logger.error("Failed to get session message count", session_id=session_id, error=str(e))
             return 0
@@ -182,13 +268,18 @@ class EmbeddingService:
     def delete_session_collection(self, session_id: str) -> bool:
         """Delete a session's vector collection (for privacy compliance)."""
         try:
-            collection_name = f"session_{session_id.replace('-', '_')}"
-            self.chroma_client.delete_collection(collection_name)
+            self.vector_store.delete_session(session_id)
             logger.info("Deleted session collection", session_id=session_id)
             return True
-        except Exception:
-            logger.info("Session collection not found for deletion", session_id=session_id)
-            return True  # Consider it successful if already doesn't exist
         except Exception as e:
             logger.error("Failed to delete session collection", session_id=session_id, error=str(e))
-            return False
\ No newline at end of file
+            return False
+    
+    def close(self):
+        """Stop the encode scheduler, flush pending writes and close the store."""
+        if self.encoder:
+            self.encoder.close()
+        if self.write_batcher:
+            self.write_batcher.close()
+        if self.vector_store:
+            self.vector_store.close()
@@ -0,0 +1,171 @@
+"""
+Micro-batching scheduler that coalesces concurrent encode requests.
+"""
+import asyncio
+from concurrent.futures import Future
+import itertools
+import queue
+import threading
+import time
+import numpy as np
+import structlog
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .executor import BoundedPool
+
+logger = structlog.get_logger(__name__)
+
+# Lower value is served first
+PRIORITY_QUERY = 0
+PRIORITY_STORAGE = 1
+
+class EncodeScheduler:
+    """Gathers encode requests from many threads into batched model calls.
+
+    Callers wait on a future while a single batching thread collects requests
+    for up to ``max_wait_ms`` (or until ``max_batch_size`` texts are queued) and
+    runs one ``encode_fn`` call for the whole batch. Query embeddings are
+    dequeued ahead of storage embeddings and never wait for stragglers: a
+    query batch takes whatever is already queued, so retrieval latency stays
+    low. Request handlers should use ``encode_async`` so waiting does not
+    occupy a pool thread per text.
+
+    With ``pool`` (the encode execution pool) each batch's model call runs
+    on the pool, up to ``pool.max_workers`` batches at once; the next batch
+    is only collected once a worker is free, so requests arriving meanwhile
+    join it. Without a pool the batching thread runs the calls itself.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 pool: Optional["BoundedPool"] = None):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pool = pool
+        self._max_running = pool.max_workers if pool else 1
+        self._running = threading.Semaphore(self._max_running)
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._worker = threading.Thread(target=self._run, name="encode-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, priority: int = PRIORITY_STORAGE) -> Future:
+        """Queue a single text for encoding and return a future for its vector."""
+        if self._closed:
+            raise RuntimeError("Encode scheduler is closed")
+        future = Future()
+        self._queue.put((priority, next(self._sequence), text, future))
+        return future
+
+    def encode(self, texts: List[str], priority: int = PRIORITY_STORAGE) -> np.ndarray:
+        """Encode texts through the shared batches, blocking until done."""
+        futures = [self.submit(text, priority) for text in texts]
+        return np.stack([future.result() for future in futures])
+
+    async def encode_async(self, texts: List[str], priority: int = PRIORITY_STORAGE) -> np.ndarray:
+        """Encode texts through the shared batches, awaiting the result on the event loop."""
+        futures = [asyncio.wrap_future(self.submit(text, priority)) for text in texts]
+        return np.stack(await asyncio.gather(*futures))
+
+    def _collect_batch(self) -> List:
+        """Wait for the first request, then gather more until full or timed out."""
+        batch = [self._queue.get()]
+        if batch[0][2] is None:
+            return batch
+        # A query only picks up what is already queued instead of waiting the window out
+        wait = 0.0 if batch[0][0] == PRIORITY_QUERY else self.max_wait
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item[2] is None:
+                break
+        return batch
+
+    def _run(self):
+        """Batching loop executed on the scheduler thread."""
+        while True:
+            # Wait for a free worker before collecting, so the batch keeps growing meanwhile
+            self._running.acquire()
+            batch = self._collect_batch()
+            stop = any(item[2] is None for item in batch)
+            requests = [item for item in batch if item[2] is not None]
+            if requests:
+                self._dispatch(requests)
+            else:
+                self._running.release()
+            if stop:
+                # Drain: wait for the batches still running on the pool
+                for _ in range(self._max_running):
+                    self._running.acquire()
+                return
+
+    def _dispatch(self, requests: List):
+        """Start a batch on the pool, or inline without one (or once it has shut down)."""
+        if self._pool is not None:
+            try:
+                self._pool.submit(self._run_batch, requests)
+                return
+            except RuntimeError:
+                pass
+        self._run_batch(requests)
+
+    def _run_batch(self, requests: List):
+        try:
+            self._encode_batch(requests)
+        except Exception as e:
+            # Never let one batch take the scheduler down with every later caller
+            logger.error("Encode batch crashed", batch_size=len(requests), error=str(e))
+            for item in requests:
+                if not item[3].done():
+                    item[3].set_exception(e)
+        finally:
+            self._running.release()
+
+    def _encode_batch(self, requests: List):
+        """Run one model call and resolve every waiting future."""
+        # Awaiters that were cancelled (e.g. a client disconnect) cancel their
+        # future; skip those and mark the rest running so they can't be cancelled
+        requests = [item for item in requests if item[3].set_running_or_notify_cancel()]
+        if not requests:
+            return
+        texts = [item[2] for item in requests]
+        try:
+            embeddings = self.encode_fn(texts)
+        except Exception as e:
+            logger.error("Batched encode failed", batch_size=len(texts), error=str(e))
+            for item in requests:
+                item[3].set_exception(e)
+            return
+        for item, embedding in zip(requests, embeddings):
+            item[3].set_result(embedding)
+        with self._stats_lock:
+            self._batches += 1
+            self._texts += len(texts)
+
+    def stats(self) -> Dict:
+        """Return batching throughput counters."""
+        return {
+            "batches": self._batches,
+            "texts": self._texts,
+            "avg_batch_size": self._texts / self._batches if self._batches else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+    def close(self):
+        """Drain queued requests and stop the batching thread."""
+        if self._closed:
+            return
+        self._closed = True
+        # Sentinel sorts after all real requests
+        self._queue.put((PRIORITY_STORAGE + 1, next(self._sequence), None, None))
+        self._worker.join()
@@ -0,0 +1,111 @@
+"""
+Bounded execution pools for blocking work called from async request handlers.
+"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+import threading
+import structlog
+from typing import Any, Callable, Dict
+
+logger = structlog.get_logger(__name__)
+
+class BoundedPool:
+    """A thread pool with a cap on queued work, awaited from the event loop."""
+
+    def __init__(self, name: str, max_workers: int, queue_depth: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        # Running plus queued jobs; callers wait here instead of growing the executor queue
+        self._slots = asyncio.Semaphore(max_workers + queue_depth)
+        self._in_flight = 0
+        # Work is also submitted from threads (see submit)
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool and await its result."""
+        async with self._slots:
+            self._track(1)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+            finally:
+                self._track(-1)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run a blocking callable on the pool from another thread.
+
+        Not bounded by the pool's slots: the submitting thread must limit
+        itself to ``max_workers`` jobs at a time (as EncodeScheduler does).
+        """
+        self._track(1)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._track(-1)
+            raise
+        future.add_done_callback(lambda _: self._track(-1))
+        return future
+
+    def _track(self, delta: int):
+        with self._lock:
+            self._in_flight += delta
+
+    def stats(self) -> Dict:
+        """Return current pool utilisation."""
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight
+        }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running jobs to finish."""
+        self._executor.shutdown(wait=True)
+
+class ExecutionPools:
+    """Dedicated pools for CPU-bound encode calls and blocking store I/O.
+
+    Thread pools are used for both: SentenceTransformer/torch and SQLite release
+    the GIL during the heavy work, and the loaded model can be shared instead of
+    being copied into every worker process.
+    """
+
+    def __init__(self, encode_workers: int = 2, io_workers: int = 8, queue_depth: int = 64):
+        self.encode = BoundedPool("encode", encode_workers, queue_depth)
+        self.io = BoundedPool("io", io_workers, queue_depth)
+        logger.info("Execution pools initialized",
+                   encode_workers=encode_workers,
+                   io_workers=io_workers,
+                   queue_depth=queue_depth)
+
+    async def run_encode(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run CPU-bound work off the event loop.
+        
+        Single-text embeddings go through EncodeScheduler.encode_async
+        instead, which batches them and runs each batch's model call on
+        this pool without holding a thread per waiting text.
+        """
+        return await self.encode.run(fn, *args, **kwargs)
+
+    async def run_io(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run blocking database or vector store I/O off the event loop.
+        
+        Coroutine functions (e.g. AsyncSessionService methods) are awaited
+        directly, so callers need not know which session store is in use.
+        """
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args, **kwargs)
+        return await self.io.run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict:
+        """Return utilisation for all pools."""
+        return {"encode": self.encode.stats(), "io": self.io.stats()}
+
+    def shutdown(self):
+        """Shut down all pools."""
+        self.encode.shutdown()
+        self.io.shutdown()
+        logger.info("Execution pools shut down")
@@ -0,0 +1,36 @@
+"""
+Pooled HTTP client for the Anthropic SDK with explicit pool and timeout settings.
+"""
+from anthropic import DefaultAsyncHttpxClient, Timeout
+import httpx
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+def create_llm_http_client(max_connections: int = 100, max_keepalive_connections: int = 20,
+                           keepalive_expiry: float = 30.0, http2: bool = False,
+                           connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                           write_timeout: float = 10.0, pool_timeout: float = 5.0):
+    """Build the async HTTP client used by AsyncAnthropic.
+
+    ``read_timeout`` bounds the gap between received bytes, so a hung
+    upstream connection is dropped instead of holding the request for the
+    SDK's ten-minute default. HTTP/2 needs the ``h2`` package.
+    """
+    client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=Timeout(connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout),
+        http2=http2
+    )
+    logger.info("LLM HTTP client created",
+               max_connections=max_connections,
+               max_keepalive_connections=max_keepalive_connections,
+               keepalive_expiry=keepalive_expiry,
+               http2=http2,
+               connect_timeout=connect_timeout,
+               read_timeout=read_timeout)
+    return client
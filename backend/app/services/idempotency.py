@@ -0,0 +1,104 @@
+"""
+Idempotency keys and single-flight deduplication for retried requests.
+"""
+import asyncio
+import hashlib
+import time
+import structlog
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .cache import LRUCache
+
+logger = structlog.get_logger(__name__)
+
+OUTCOME_FRESH = "fresh"
+OUTCOME_JOINED = "joined"
+OUTCOME_CACHED = "cached"
+
+def request_key(session_id: Optional[str], message: str, idempotency_key: Optional[str] = None) -> Optional[str]:
+    """Deduplication key for a request, or None when it must not be deduplicated.
+
+    An explicit key is bound to the session and message, so reusing a key
+    with a different payload is a different request. Without one, the key
+    is derived from session and normalised message; requests that start a
+    new session are never deduplicated implicitly, since two users can send
+    the same first message.
+    """
+    normalized = " ".join(message.split()).casefold()
+    if idempotency_key:
+        material = f"key\x00{idempotency_key}\x00{session_id or ''}\x00{normalized}"
+    elif session_id:
+        material = f"auto\x00{session_id}\x00{normalized}"
+    else:
+        return None
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class _Flight:
+    """One in-flight computation and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class IdempotencyGuard:
+    """Runs each keyed computation once and shares its result.
+
+    Concurrent callers with the same key attach to the in-flight task, and
+    a successful result is replayed from a bounded cache until its TTL
+    passes. Failures are not cached. A caller that goes away only stops
+    waiting; the shared task is cancelled once no caller is left.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._results = LRUCache(maxsize)
+        self._in_flight: Dict[str, _Flight] = {}
+        self._counts = {OUTCOME_FRESH: 0, OUTCOME_JOINED: 0, OUTCOME_CACHED: 0}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Tuple[Any, str]:
+        """Return ``(result, outcome)`` where outcome is fresh, joined or cached."""
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, result = cached
+            if time.monotonic() < expires_at:
+                return self._count(key, result, OUTCOME_CACHED)
+            self._results.pop(key)
+
+        flight = self._in_flight.get(key)
+        outcome = OUTCOME_JOINED
+        if flight is None:
+            outcome = OUTCOME_FRESH
+            flight = _Flight(asyncio.ensure_future(self._execute(key, factory, ttl_seconds)))
+            self._in_flight[key] = flight
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        return self._count(key, result, outcome)
+
+    async def _execute(self, key: str, factory: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Any:
+        try:
+            result = await factory()
+            self._results.put(key, (time.monotonic() + ttl_seconds, result))
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def _count(self, key: str, result: Any, outcome: str) -> Tuple[Any, str]:
+        self._counts[outcome] += 1
+        if outcome != OUTCOME_FRESH:
+            logger.info("Deduplicated request", key=key[:12], outcome=outcome)
+        return result, outcome
+
+    def stats(self) -> Dict:
+        """Return deduplication counters."""
+        return {
+            "in_flight": len(self._in_flight),
+            "cached_results": len(self._results),
+            **self._counts
+        }
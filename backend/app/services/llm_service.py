@@ -1,18 +1,44 @@
 import asyncio
+from contextlib import nullcontext
 from anthropic import AsyncAnthropic
 import structlog
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
+from .admission import AdmissionController, AdmissionRejected
+from .resilience import ResilientCaller
+from .deadline import Deadline, DeadlineExceeded
 
 logger = structlog.get_logger()
 
+def _content_length(content: Union[str, List[Dict]]) -> int:
+    """Character length of a string or of the text in content blocks"""
+    if isinstance(content, str):
+        return len(content)
+    return sum(len(block.get("text", "")) for block in content)
+
+def _usage_fields(usage) -> Dict:
+    """Token usage for logging, including prompt cache reads and writes"""
+    return {
+        "usage_input_tokens": usage.input_tokens,
+        "usage_output_tokens": usage.output_tokens,
+        "usage_cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "usage_cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0
+    }
+
 class LLMService:
     """Service for interacting with Anthropic's Claude API"""
     
-    def __init__(self, api_key: str):
-        self.client = AsyncAnthropic(api_key=api_key)
+    def __init__(self, api_key: str, admission: Optional[AdmissionController] = None,
+                 resilience: Optional[ResilientCaller] = None, client: Optional[AsyncAnthropic] = None,
+                 http_client=None):
+        # Retries are handled by the resilience layer, not the SDK
+        self.client = client or AsyncAnthropic(api_key=api_key, max_retries=0, http_client=http_client)
+        self.admission = admission
+        self.resilience = resilience or ResilientCaller()
+        self._cancelled_calls = 0
         self.model = "claude-3-5-sonnet-20241022"  # Latest Claude Sonnet model
         self.max_tokens = 1000
         self.temperature = 0.7
+        self.fallback_response = "I apologize, but I'm experiencing some technical difficulties right now. Please try again in a moment, or if this persists, consider speaking with a human therapist."
         
         # CBT-focused system prompt
         self.system_prompt = """You are Alex, a warm, empathetic CBT (Cognitive Behavioral Therapy) assistant. 
@@ -38,48 +64,60 @@ CRITICAL SAFETY RULES:
 - For medical questions, redirect to healthcare professionals
 - If unsure about safety, err on the side of caution
 
+Conversation context:
+- Some turns include excerpts from earlier in the conversation before the current message
+- A CONVERSATION SUMMARY SO FAR block, when present, recaps older parts of the conversation
+- Use them to reference previous topics when therapeutically relevant, build on earlier insights and progress, and avoid repeating the same questions or advice
+- Show that you remember and care about the person's journey, while offering fresh, helpful CBT support
+
 Remember: Your role is to provide supportive guidance using CBT principles while ensuring user safety. Focus on being helpful, warm, and therapeutically oriented."""
+        
+        self.summary_system_prompt = (
+            "You maintain a concise, factual running summary of a supportive CBT conversation "
+            "for the assistant's own reference. Write in the third person about the user. "
+            "Do not add advice, diagnoses or anything that was not said."
+        )
+        
+        # Stable instructions go first as one cached block so every turn shares the same prefix
+        self.system_blocks = [{
+            "type": "text",
+            "text": self.system_prompt,
+            "cache_control": {"type": "ephemeral"}
+        }]
 
-    async def generate_response(self, user_message: str, conversation_history: Optional[list] = None) -> str:
+    async def generate_response(self, user_message: Union[str, List[Dict]], conversation_history: Optional[list] = None,
+                                policy: Optional[Dict] = None, deadline: Optional[Deadline] = None) -> str:
         """
         Generate a therapeutic response using Claude Sonnet 4
         
         Args:
-            user_message: The user's input message
+            user_message: The user's input message, or a list of content blocks
             conversation_history: Optional previous conversation context
+            policy: Optional generation policy (model, max_tokens, temperature) from ModelRouter
+            deadline: Optional request deadline; queueing, retries and waiting stop when it passes
             
         Returns:
             Therapeutic response string
         """
         try:
-            # Prepare messages for the API
-            messages = []
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
+            messages = self._build_messages(user_message, conversation_history)
+            params = self._generation_params(policy)
             
             logger.info(
                 "sending_request_to_anthropic",
-                model=self.model,
+                model=params["model"],
+                max_tokens=params["max_tokens"],
                 message_count=len(messages),
-                user_message_length=len(user_message)
+                user_message_length=_content_length(user_message)
             )
             
             # Make API call to Anthropic
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=self.system_prompt,
-                messages=messages
-            )
+            async with self._admit(deadline):
+                response = await self.resilience.call(lambda: self.client.messages.create(
+                    **params,
+                    system=self.system_blocks,
+                    messages=messages
+                ), request_deadline=deadline)
             
             # Extract response text
             if response.content and len(response.content) > 0:
@@ -88,8 +126,7 @@ Remember: Your role is to provide supportive guidance using CBT principles while
                 logger.info(
                     "received_response_from_anthropic",
                     response_length=len(therapeutic_response),
-                    usage_input_tokens=response.usage.input_tokens,
-                    usage_output_tokens=response.usage.output_tokens
+                    **_usage_fields(response.usage)
                 )
                 
                 return therapeutic_response
@@ -97,6 +134,13 @@ Remember: Your role is to provide supportive guidance using CBT principles while
                 logger.error("empty_response_from_anthropic")
                 return "I'm having trouble formulating a response right now. Could you please rephrase your message?"
                 
+        except asyncio.CancelledError:
+            # Client went away: the upstream request has been abandoned with this task
+            self._record_cancelled("generate")
+            raise
+        except (AdmissionRejected, DeadlineExceeded):
+            # Shed load and expired deadlines are reported to the caller, not hidden behind the fallback
+            raise
         except Exception as e:
             logger.error(
                 "error_calling_anthropic_api",
@@ -105,7 +149,190 @@ Remember: Your role is to provide supportive guidance using CBT principles while
             )
             
             # Return graceful fallback response
-            return "I apologize, but I'm experiencing some technical difficulties right now. Please try again in a moment, or if this persists, consider speaking with a human therapist."
+            return self.fallback_response
+    
+    async def stream_response(self, user_message: Union[str, List[Dict]], conversation_history: Optional[list] = None,
+                              policy: Optional[Dict] = None, deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """
+        Stream a therapeutic response as text deltas
+        
+        Args:
+            user_message: The user's input message, or a list of content blocks
+            conversation_history: Optional previous conversation context
+            policy: Optional generation policy (model, max_tokens, temperature) from ModelRouter
+            deadline: Optional request deadline; queueing, retries and waiting stop when it passes
+            
+        Yields:
+            Response text chunks in order; the fallback response if the
+            request fails before any text was produced
+        """
+        emitted = False
+        try:
+            messages = self._build_messages(user_message, conversation_history)
+            params = self._generation_params(policy)
+            
+            logger.info(
+                "sending_stream_request_to_anthropic",
+                model=params["model"],
+                max_tokens=params["max_tokens"],
+                message_count=len(messages),
+                user_message_length=_content_length(user_message)
+            )
+            
+            async def open_stream():
+                manager = self.client.messages.stream(
+                    **params,
+                    system=self.system_blocks,
+                    messages=messages
+                )
+                return manager, await manager.__aenter__()
+            
+            async with self._admit(deadline):
+                # Retries cover opening the stream; once tokens flow the answer cannot be replayed
+                manager, stream = await self.resilience.call(open_stream, hedge=False, request_deadline=deadline)
+                try:
+                    async for text in stream.text_stream:
+                        if text:
+                            emitted = True
+                            yield text
+                    final_message = await stream.get_final_message()
+                finally:
+                    await manager.__aexit__(None, None, None)
+            
+            logger.info(
+                "received_stream_from_anthropic",
+                stop_reason=final_message.stop_reason,
+                **_usage_fields(final_message.usage)
+            )
+            
+            if not emitted:
+                logger.error("empty_response_from_anthropic")
+                yield "I'm having trouble formulating a response right now. Could you please rephrase your message?"
+                
+        except (asyncio.CancelledError, GeneratorExit):
+            # Consumer stopped reading (client disconnected); closing the stream drops the connection
+            self._record_cancelled("stream")
+            raise
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(
+                "error_streaming_anthropic_api",
+                error_type=type(e).__name__,
+                error_message=str(e),
+                partial_response=emitted
+            )
+            
+            # A partially streamed answer cannot be replaced, so only fall back before the first token
+            if not emitted:
+                yield self.fallback_response
+            else:
+                raise
+    
+    async def summarize(self, previous_summary: str, transcript: str, max_tokens: int = 300,
+                        model: Optional[str] = None) -> Optional[str]:
+        """
+        Fold new conversation turns into a running session summary
+        
+        Args:
+            previous_summary: Summary of everything before ``transcript`` (may be empty)
+            transcript: New turns, one "Role: text" line each
+            max_tokens: Output cap, which keeps the summary a fixed size
+            model: Model to use; defaults to the service model
+            
+        Returns:
+            The updated summary, or None if it could not be produced
+            
+        Raises:
+            AdmissionRejected: No LLM slot is free; summaries never queue behind live turns
+        """
+        prompt = (
+            f"EXISTING SUMMARY:\n{previous_summary or '(none yet)'}\n\n"
+            f"NEW CONVERSATION TURNS:\n{transcript}\n\n"
+            "Rewrite the summary so it covers both. Keep the main concerns, recurring thoughts and feelings, "
+            "coping strategies tried and how they went, and any goals or homework agreed. "
+            f"Use plain prose under {int(max_tokens * 0.75)} words."
+        )
+        try:
+            async with self._admit_background():
+                response = await self.resilience.call(lambda: self.client.messages.create(
+                    model=model or self.model,
+                    max_tokens=max_tokens,
+                    temperature=0.2,
+                    system=self.summary_system_prompt,
+                    messages=[{"role": "user", "content": prompt}]
+                ))
+            if not response.content:
+                return None
+            logger.info("session_summary_generated", **_usage_fields(response.usage))
+            return response.content[0].text.strip()
+        except (asyncio.CancelledError, AdmissionRejected):
+            raise
+        except Exception as e:
+            logger.error(
+                "error_summarizing_session",
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+            return None
+    
+    def _record_cancelled(self, mode: str):
+        self._cancelled_calls += 1
+        logger.info("anthropic_call_cancelled", mode=mode, cancelled_calls=self._cancelled_calls)
+    
+    def stats(self) -> Dict:
+        """Return LLM call counters"""
+        return {"cancelled_calls": self._cancelled_calls}
+    
+    def _generation_params(self, policy: Optional[Dict]) -> Dict:
+        """Model, output cap and temperature for a request; defaults unless a policy overrides them"""
+        policy = policy or {}
+        return {
+            "model": policy.get("model", self.model),
+            "max_tokens": policy.get("max_tokens", self.max_tokens),
+            "temperature": policy.get("temperature", self.temperature)
+        }
+    
+    def check_capacity(self):
+        """Raise AdmissionRejected now if an LLM call would be shed, before any other work"""
+        if self.admission:
+            self.admission.check()
+    
+    def _admit(self, deadline: Optional[Deadline] = None):
+        if deadline is not None:
+            deadline.check("LLM call")
+        if not self.admission:
+            return nullcontext()
+        # Never queue longer than the caller has left
+        timeout = deadline.timeout(cap=self.admission.queue_timeout) if deadline is not None else None
+        return self.admission.admit(timeout=timeout)
+    
+    def _admit_background(self):
+        """A slot for background work, only if one is free without queuing"""
+        if not self.admission:
+            return nullcontext()
+        return self.admission.try_admit()
+    
+    async def close(self):
+        """Close the pooled HTTP connections"""
+        await self.client.close()
+    
+    def _build_messages(self, user_message: Union[str, List[Dict]], conversation_history: Optional[list] = None) -> list:
+        """Build the messages payload from history plus the current user message"""
+        messages = []
+        
+        # Add conversation history if provided. It is a sliding window of recent
+        # turns that shifts every request, so it carries no cache breakpoint:
+        # only the system block has a prefix worth caching
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        # Add current user message
+        messages.append({
+            "role": "user",
+            "content": user_message
+        })
+        return messages
     
     async def validate_api_connection(self) -> bool:
         """
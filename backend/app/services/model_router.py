@@ -0,0 +1,80 @@
+"""
+Per-request model tier and generation policy selection.
+"""
+import structlog
+from typing import Dict
+
+logger = structlog.get_logger(__name__)
+
+TIER_FAST = "fast"
+TIER_PREMIUM = "premium"
+
+class ModelRouter:
+    """Chooses the model, output-token cap and temperature for a turn.
+
+    Routing uses features the RAG pipeline already has, in order:
+
+    - long messages go to the premium tier;
+    - short check-ins ("thanks, that helped") go to the fast tier;
+    - deep sessions with retrieved context go to the premium tier;
+    - everything else uses ``default_tier``.
+
+    With routing disabled every turn uses the premium tier.
+    """
+
+    def __init__(self, premium_model: str = "claude-3-5-sonnet-20241022",
+                 fast_model: str = "claude-3-5-haiku-20241022",
+                 premium_max_tokens: int = 1000, fast_max_tokens: int = 400,
+                 temperature: float = 0.7, short_message_chars: int = 80,
+                 long_message_chars: int = 400, deep_session_messages: int = 12,
+                 default_tier: str = TIER_PREMIUM, enabled: bool = True):
+        self.tiers = {
+            TIER_PREMIUM: {"model": premium_model, "max_tokens": premium_max_tokens},
+            TIER_FAST: {"model": fast_model, "max_tokens": fast_max_tokens}
+        }
+        self.temperature = temperature
+        self.short_message_chars = short_message_chars
+        self.long_message_chars = long_message_chars
+        self.deep_session_messages = deep_session_messages
+        self.default_tier = default_tier
+        self.enabled = enabled
+        self._decisions = {TIER_PREMIUM: 0, TIER_FAST: 0}
+
+    def _choose(self, message_length: int, session_messages: int, context_used: bool):
+        if not self.enabled:
+            return TIER_PREMIUM, "routing_disabled"
+        if message_length >= self.long_message_chars:
+            return TIER_PREMIUM, "long_message"
+        if message_length <= self.short_message_chars:
+            return TIER_FAST, "short_message"
+        if context_used and session_messages >= self.deep_session_messages:
+            return TIER_PREMIUM, "deep_session_with_context"
+        return self.default_tier, "default"
+
+    def route(self, message_length: int, session_messages: int, context_used: bool) -> Dict:
+        """Return the generation policy for one turn.
+
+        Args:
+            message_length: Characters in the user message
+            session_messages: Messages already stored in the session
+            context_used: Whether retrieved context will be sent
+        """
+        tier, reason = self._choose(message_length, session_messages, context_used)
+        self._decisions[tier] += 1
+        policy = {
+            "tier": tier,
+            "model": self.tiers[tier]["model"],
+            "max_tokens": self.tiers[tier]["max_tokens"],
+            "temperature": self.temperature,
+            "reason": reason
+        }
+        logger.info("Routed LLM request",
+                   message_length=message_length,
+                   session_messages=session_messages,
+                   context_used=context_used,
+                   **policy)
+        return policy
+
+    def stats(self) -> Dict:
+        """Return how many turns were routed to each tier."""
+        return {"enabled": self.enabled, "decisions": dict(self._decisions)}
@@ -0,0 +1,198 @@
+"""
+In-process NumPy vector store with append-only, memory-mapped session files.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import numpy as np
+import structlog
+from typing import Dict, List, Optional, Set
+from .cache import LRUCache
+from .vector_codec import VectorCodec
+from .vector_store import VectorStore
+
+logger = structlog.get_logger(__name__)
+
+VECTOR_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+SCALES_FILE = "scales.f32"
+RECORDS_FILE = "records.jsonl"
+
+class _SessionIndex:
+    """Loaded state for one session: memmaps over its vectors (and scales) plus records."""
+
+    def __init__(self, path: str, dim: int, codec: VectorCodec):
+        self.path = path
+        self.dim = dim
+        self.codec = codec
+        self.vectors_path = os.path.join(path, VECTOR_FILES[codec.dtype])
+        self.scales_path = os.path.join(path, SCALES_FILE)
+        self.lock = threading.Lock()
+        self.records = self._load_records()
+        self.size = self._recover_size()
+        self._matrix = None
+        self._scales = None
+
+    def _load_records(self) -> List[Dict]:
+        records_path = os.path.join(self.path, RECORDS_FILE)
+        if not os.path.exists(records_path):
+            return []
+        with open(records_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _rows(self, path: str, row_bytes: int) -> int:
+        return os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+    def _recover_size(self) -> int:
+        """Trim files left uneven by an interrupted append so they stay aligned."""
+        row_bytes = self.dim * self.codec.storage_dtype.itemsize
+        sizes = [len(self.records), self._rows(self.vectors_path, row_bytes)]
+        if self.codec.has_scales:
+            sizes.append(self._rows(self.scales_path, 4))
+        size = min(sizes)
+        if size != max(sizes):
+            logger.warning("Repairing partially written session vectors", path=self.path, rows=size)
+            if os.path.exists(self.vectors_path):
+                os.truncate(self.vectors_path, size * row_bytes)
+            if self.codec.has_scales and os.path.exists(self.scales_path):
+                os.truncate(self.scales_path, size * 4)
+            self.records = self.records[:size]
+            with open(os.path.join(self.path, RECORDS_FILE), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in self.records)
+        return size
+
+    def matrix(self):
+        """Read-only views of the committed vectors and scales, remapped after appends."""
+        if self.size == 0:
+            return None, None
+        if self._matrix is None or self._matrix.shape[0] != self.size:
+            self._matrix = np.memmap(self.vectors_path, dtype=self.codec.storage_dtype, mode="r",
+                                     shape=(self.size, self.dim))
+            if self.codec.has_scales:
+                self._scales = np.memmap(self.scales_path, dtype=np.float32, mode="r", shape=(self.size,))
+        return self._matrix, self._scales
+
+    def append(self, stored: np.ndarray, scales: Optional[np.ndarray], records: List[Dict]):
+        """Append vectors, scales, then records; ``size`` only advances once all are durable."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(stored).tobytes())
+            os.fsync(f.fileno())
+        if scales is not None:
+            with open(self.scales_path, "ab") as f:
+                f.write(np.ascontiguousarray(scales, dtype=np.float32).tobytes())
+                os.fsync(f.fileno())
+        with open(os.path.join(self.path, RECORDS_FILE), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.extend(records)
+        self.size += len(records)
+
+class NumpyVectorStore(VectorStore):
+    """Exact cosine search over per-session vector matrices.
+
+    Sessions hold a few hundred vectors, so a brute-force matrix-vector product
+    with ``argpartition`` top-k is faster and more predictable than an ANN
+    index. The codec normalizes (and optionally projects and quantizes)
+    vectors on write so the dot product is cosine.
+    """
+
+    def __init__(self, data_path: str, dim: int, cache_size: int = 1024, idle_seconds: Optional[float] = None,
+                 codec: Optional[VectorCodec] = None):
+        self.data_path = data_path
+        self.input_dim = dim
+        self.codec = codec or VectorCodec()
+        self.dim = self.codec.output_dim(dim)
+        self._sessions = LRUCache(maxsize=cache_size, ttl_seconds=idle_seconds)
+        self._open_lock = threading.Lock()
+        os.makedirs(data_path, exist_ok=True)
+        logger.info("Initialized NumPy vector store",
+                   data_path=data_path,
+                   dim=self.dim,
+                   dtype=self.codec.dtype,
+                   bytes_per_vector=self.codec.bytes_per_vector(dim))
+
+    def _session_path(self, session_id: str) -> str:
+        return os.path.join(self.data_path, re.sub(r"[^A-Za-z0-9_-]", "_", session_id))
+
+    def _index(self, session_id: str, create: bool = False) -> Optional[_SessionIndex]:
+        """Return the loaded index for a session, loading it from disk on a miss."""
+        self._sessions.expire()
+        index = self._sessions.get(session_id)
+        if index is not None:
+            return index
+        with self._open_lock:
+            index = self._sessions.get(session_id)
+            if index is None:
+                path = self._session_path(session_id)
+                if not create and not os.path.isdir(path):
+                    return None
+                os.makedirs(path, exist_ok=True)
+                index = _SessionIndex(path, self.dim, self.codec)
+                self._sessions.put(session_id, index)
+        return index
+
+    def create_session(self, session_id: str) -> None:
+        self._index(session_id, create=True)
+
+    def add(self, session_id: str, ids: List[str], embeddings: np.ndarray,
+            documents: List[str], metadatas: List[Dict]) -> None:
+        stored, scales = self.codec.encode(np.asarray(embeddings).reshape(len(ids), self.input_dim))
+        records = [
+            {"id": item_id, "document": document, "metadata": metadata}
+            for item_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        index = self._index(session_id, create=True)
+        with index.lock:
+            index.append(stored, scales, records)
+
+    def query(self, session_id: str, embedding: np.ndarray, n_results: int) -> List[Dict]:
+        index = self._index(session_id)
+        if index is None:
+            return []
+        with index.lock:
+            matrix, scales = index.matrix()
+            records = index.records
+        if matrix is None or n_results <= 0:
+            return []
+
+        query = self.codec.prepare(np.asarray(embedding).ravel())
+        scores = self.codec.scores(matrix, query, scales)
+
+        k = min(n_results, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {
+                "id": records[i]["id"],
+                "document": records[i]["document"],
+                "metadata": records[i]["metadata"],
+                "similarity": float(scores[i])
+            }
+            for i in top
+        ]
+
+    def count(self, session_id: str) -> int:
+        index = self._index(session_id)
+        return index.size if index is not None else 0
+
+    def existing_ids(self, session_id: str, ids: List[str]) -> Set[str]:
+        index = self._index(session_id)
+        if index is None:
+            return set()
+        wanted = set(ids)
+        with index.lock:
+            return {record["id"] for record in index.records if record["id"] in wanted}
+
+    def delete_session(self, session_id: str) -> None:
+        self._sessions.pop(session_id)
+        shutil.rmtree(self._session_path(session_id), ignore_errors=True)
+
+    def close(self) -> None:
+        self._sessions.clear()
@@ -1,147 +1,309 @@
 """
 RAG (Retrieval Augmented Generation) service for context-aware therapeutic responses.
 """
+import asyncio
+from contextlib import aclosing
 from .embedding_service import EmbeddingService
+from .encode_scheduler import PRIORITY_QUERY
 from .session_service import SessionService
+from .session_cache import SessionCache
 from .llm_service import LLMService
+from .executor import ExecutionPools
+from .model_router import ModelRouter
+from .context_packer import ContextPacker, truncate_to_tokens
+from .session_summarizer import SessionSummarizer
+from .deadline import Deadline
+from .sqlite_profile import apply_configured_pragmas
+from ..config import settings
 import structlog
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
 logger = structlog.get_logger(__name__)
 
 class RAGService:
     """Orchestrates RAG functionality for context-aware therapeutic conversations."""
     
-    def __init__(self, llm_service=None):
-        self.embedding_service = EmbeddingService()
-        self.session_service = SessionService(embedding_service=self.embedding_service)
+    def __init__(self, llm_service=None, executor: Optional[ExecutionPools] = None, router: Optional[ModelRouter] = None,
+                 context_packer: Optional[ContextPacker] = None, summarizer: Optional[SessionSummarizer] = None):
         self.llm_service = llm_service  # Will be injected from main.py
+        self.executor = executor or ExecutionPools(
+            encode_workers=settings.encode_pool_workers,
+            io_workers=settings.io_pool_workers,
+            queue_depth=settings.executor_queue_depth
+        )
+        self.embedding_service = EmbeddingService(encode_pool=self.executor.encode)
+        if settings.database_driver == "async":
+            from .async_session_service import AsyncSessionService
+            self.session_service = AsyncSessionService(
+                settings.database_async_url or settings.database_url,
+                embedding_service=self.embedding_service,
+                executor=self.executor,
+                pool_size=settings.database_pool_size,
+                max_overflow=settings.database_max_overflow,
+                pool_timeout=settings.database_pool_timeout_seconds
+            )
+            apply_configured_pragmas(self.session_service.engine.sync_engine)
+        else:
+            self.session_service = SessionService(
+                embedding_service=self.embedding_service,
+                cache=SessionCache(
+                    maxsize=settings.session_cache_size,
+                    ttl_seconds=settings.session_cache_ttl_seconds,
+                    recent_messages=settings.session_cache_recent_messages
+                ) if settings.session_cache_enabled else None
+            )
+        self.router = router or ModelRouter()
+        self.context_packer = context_packer or ContextPacker(
+            token_budget=settings.context_token_budget,
+            recent_turns=settings.context_recent_turns,
+            max_item_tokens=settings.context_max_item_tokens
+        )
+        self.summarizer = summarizer or SessionSummarizer(
+            llm_service=self.llm_service,
+            session_service=self.session_service,
+            executor=self.executor,
+            every_turns=settings.session_summary_every_turns,
+            max_tokens=settings.session_summary_max_tokens,
+            model=settings.llm_fast_model,
+            enabled=settings.session_summary_enabled
+        )
+        self._cancelled_turns = {"prepare": 0, "generate": 0, "finalize": 0}
+    
+    def shutdown(self):
+        """Release execution pools and background resources."""
+        self.summarizer.shutdown()
+        self.executor.shutdown()
+        self.embedding_service.close()
     
-    async def generate_rag_response(self, user_message: str, session_id: Optional[str] = None) -> Dict:
-        """Generate a context-aware therapeutic response using RAG."""
+    async def generate_rag_response(self, user_message: str, session_id: Optional[str] = None,
+                                    deadline: Optional[Deadline] = None) -> Dict:
+        """Generate a context-aware therapeutic response using RAG.
+        
+        ``deadline`` is the caller's request deadline; the LLM call only gets the time that is left.
+        """
+        stage = "prepare"
         try:
-            # Create new session if none provided
-            if not session_id:
-                session_id = self.session_service.create_session()
-                is_new_session = True
-                logger.info("Created new session for RAG response", session_id=session_id)
-            else:
-                is_new_session = False
-                # Verify session exists
-                session = self.session_service.get_session(session_id)
-                if not session:
-                    logger.warning("Session not found, creating new one", requested_session_id=session_id)
-                    session_id = self.session_service.create_session()
-                    is_new_session = True
-            
-            # Store user message first
-            user_message_id = self.session_service.store_message(
-                session_id=session_id,
-                content=user_message,
-                message_type="user"
-            )
-            
-            if not user_message_id:
-                raise Exception("Failed to store user message")
-            
-            # Retrieve relevant conversation context
-            context_items = []
-            if not is_new_session:
-                context_items = self.embedding_service.retrieve_relevant_context(
-                    session_id=session_id,
-                    query=user_message,
-                    n_results=5
-                )
-            
-            # Build enhanced therapeutic prompt
-            enhanced_prompt = self._build_therapeutic_prompt(user_message, context_items, is_new_session)
+            turn = await self._prepare_turn(user_message, session_id)
+            session_id = turn["session_id"]
             
             # Generate response with Claude
-            llm_response = await self.llm_service.generate_response(enhanced_prompt)
-            
-            # Store therapist response
-            therapist_message_id = self.session_service.store_message(
-                session_id=session_id,
-                content=llm_response,
-                message_type="therapist"
+            stage = "generate"
+            llm_response = await self.llm_service.generate_response(
+                turn["prompt"], conversation_history=turn["history"], policy=turn["policy"], deadline=deadline
             )
             
-            # Extract and store any therapeutic insights
-            await self._extract_and_store_insights(session_id, user_message, llm_response)
+            stage = "finalize"
+            return await self._finalize_turn(turn, user_message, llm_response)
             
-            logger.info("Generated RAG response", 
-                       session_id=session_id,
-                       user_message_length=len(user_message),
-                       response_length=len(llm_response),
-                       context_items_used=len(context_items),
-                       is_new_session=is_new_session)
+        except asyncio.CancelledError:
+            self._record_cancelled(stage, session_id)
+            raise
+        except Exception as e:
+            logger.error("Failed to generate RAG response", 
+                        session_id=session_id, 
+                        user_message_length=len(user_message) if user_message else 0,
+                        error=str(e))
+            raise
+    
+    async def stream_rag_response(self, user_message: str, session_id: Optional[str] = None,
+                                  deadline: Optional[Deadline] = None) -> AsyncIterator[Dict]:
+        """Stream a context-aware therapeutic response.
+        
+        Yields ``{"type": "token", "text": ...}`` events as the model produces
+        text, then one ``{"type": "done", ...}`` event carrying the same fields
+        as ``generate_rag_response``. The therapist message is stored only
+        after the stream has completed.
+        """
+        stage = "prepare"
+        try:
+            turn = await self._prepare_turn(user_message, session_id)
+            session_id = turn["session_id"]
             
-            return {
-                "response": llm_response,
-                "session_id": session_id,
-                "context_used": len(context_items) > 0,
-                "context_items_count": len(context_items),
-                "is_new_session": is_new_session,
-                "user_message_id": user_message_id,
-                "therapist_message_id": therapist_message_id
-            }
+            stage = "generate"
+            chunks = []
+            # aclosing: if our consumer stops early, the upstream stream is closed right away
+            tokens = self.llm_service.stream_response(
+                turn["prompt"], conversation_history=turn["history"], policy=turn["policy"], deadline=deadline
+            )
+            async with aclosing(tokens):
+                async for text in tokens:
+                    chunks.append(text)
+                    yield {"type": "token", "text": text}
             
+            stage = "finalize"
+            result = await self._finalize_turn(turn, user_message, "".join(chunks))
+            result.pop("response")
+            yield {"type": "done", **result}
+            
+        except (asyncio.CancelledError, GeneratorExit):
+            self._record_cancelled(stage, session_id)
+            raise
         except Exception as e:
-            logger.error("Failed to generate RAG response", 
+            logger.error("Failed to stream RAG response", 
                         session_id=session_id, 
                         user_message_length=len(user_message) if user_message else 0,
                         error=str(e))
             raise
     
-    def _build_therapeutic_prompt(self, user_message: str, context_items: List[Dict], is_new_session: bool) -> str:
-        """Build an enhanced therapeutic prompt with conversation context."""
+    async def _prepare_turn(self, user_message: str, session_id: Optional[str]) -> Dict:
+        """Resolve the session, store the user message and build the prompt."""
+        # Shed before storing anything if the LLM is already saturated
+        self.llm_service.check_capacity()
         
-        # Base therapeutic system prompt
-        base_prompt = """You are Alex, a warm, empathetic CBT (Cognitive Behavioral Therapy) assistant. You provide supportive, evidence-based therapeutic guidance while maintaining professional boundaries.
-
-Your therapeutic approach:
-- Use CBT techniques: thought challenging, behavioral activation, cognitive restructuring
-- Ask gentle, open-ended questions to explore thoughts and feelings
-- Provide supportive reframes for negative thinking patterns
-- Keep responses concise (150-300 words) but compassionate
-- Remember you're an AI assistant, not a licensed therapist
-
-CRITICAL SAFETY RULES:
-- For crisis situations (suicide, self-harm, violence): "I'm not qualified to handle crisis situations. Please contact a mental health professional immediately or call a crisis helpline: 988 (US), 116 123 (UK), or your local emergency services."
-- Never diagnose mental health conditions
-- Never provide medical advice or medication recommendations
-- Redirect medical questions to healthcare professionals"""
+        # Shielded so a disconnect cannot leave the message half-written: once
+        # started, the session and message are committed and indexed either way
+        opened, user_embedding = await asyncio.shield(self._open_turn(session_id, user_message))
+        session_id = opened["session_id"]
+        is_new_session = opened["is_new_session"]
+        user_message_id = opened["message_id"]
+        session_messages = opened["previous_messages"]
+        rolling_summary = opened["rolling_summary"]
+        if is_new_session:
+            logger.info("Created new session for RAG response", session_id=session_id)
         
-        # Add conversation context if available
-        if context_items and not is_new_session:
-            context_text = "\n".join([
-                f"- {item['message_type'].title()}: {item['content'][:200]}{'...' if len(item['content']) > 200 else ''}"
-                for item in context_items[:3]  # Use top 3 most relevant items
-            ])
-            
-            context_prompt = f"""
-PREVIOUS CONVERSATION CONTEXT:
-{context_text}
-
-This shows relevant parts of your ongoing conversation with this person. Use this context to:
-- Reference previous topics when therapeutically relevant
-- Build on earlier insights and progress
-- Maintain therapeutic continuity and rapport
-- Avoid repeating the same questions or advice
-- Show that you remember and care about their journey"""
-        else:
-            context_prompt = "\nThis is the beginning of your conversation with this person."
+        # Recent turns and semantically relevant memories, packed into the token budget
+        packed = {"history": [], "memories": [], "tokens": 0, "dropped": 0}
+        if not is_new_session:
+            recent, retrieved = await asyncio.gather(
+                self.executor.run_io(
+                    self.session_service.get_session_context,
+                    session_id,
+                    limit=self.context_packer.recent_turns + 1
+                ),
+                self.executor.run_io(
+                    self.embedding_service.retrieve_relevant_context,
+                    session_id=session_id,
+                    query=user_message,
+                    n_results=settings.context_retrieved_items,
+                    query_embedding=user_embedding,
+                    exclude_message_ids=[user_message_id]
+                )
+            )
+            packed = self.context_packer.pack(recent, retrieved, exclude_message_ids=[user_message_id])
         
-        # Current message
-        current_message_prompt = f"""
-CURRENT MESSAGE: {user_message}
-
-Provide therapeutic guidance that demonstrates continuity while offering fresh, helpful CBT support. Be warm, empathetic, and professionally boundaried."""
+        context_items = packed["memories"]
+        context_used = bool(context_items or packed["history"])
+        return {
+            "session_id": session_id,
+            "is_new_session": is_new_session,
+            "user_message_id": user_message_id,
+            "context_items": context_items,
+            "history": packed["history"],
+            "context_used": context_used,
+            "session_messages": session_messages,
+            "rolling_summary": rolling_summary,
+            "policy": self.router.route(len(user_message), session_messages, context_used),
+            # Per-turn content; the therapist instructions are the cached system block
+            "prompt": self._build_turn_content(
+                user_message, context_items, is_new_session, summary=rolling_summary.get("text")
+            )
+        }
+    
+    async def _open_turn(self, session_id: Optional[str], user_message: str) -> Tuple[Dict, object]:
+        """Embed the user message, then resolve the session and store the message in one transaction."""
+        # Embed the user message once; it is both stored and used as the query.
+        # Awaited on the loop so concurrent turns can fill one encode batch.
+        user_embedding = await self.embedding_service.embed_text_async(user_message, priority=PRIORITY_QUERY)
+        
+        opened = await self.executor.run_io(
+            self.session_service.open_turn,
+            session_id,
+            user_message,
+            index=False
+        )
+        await self._index_message(opened["session_id"], user_message, opened["message_id"], "user", user_embedding)
+        return opened, user_embedding
+    
+    async def _index_message(self, session_id: str, content: str, message_id: str, message_type: str,
+                             embedding=None):
+        """Write a committed message's vector, awaiting the group commit on the loop.
+        
+        The row already carries the embedding ID; it is cleared only if the write fails.
+        """
+        embedding_id = await self.embedding_service.add_message_embedding_async(
+            session_id, content, message_id, message_type, embedding=embedding
+        )
+        if not embedding_id:
+            await self.executor.run_io(self.session_service.clear_embedding_id, message_id)
+    
+    def _record_cancelled(self, stage: str, session_id: Optional[str]):
+        """Count a turn abandoned because the client disconnected."""
+        self._cancelled_turns[stage] += 1
+        logger.info("RAG turn cancelled", session_id=session_id, stage=stage)
+    
+    def stats(self) -> Dict:
+        """Return counts of turns cancelled per pipeline stage."""
+        return {
+            "cancelled_turns": sum(self._cancelled_turns.values()),
+            "cancelled_by_stage": dict(self._cancelled_turns)
+        }
+    
+    async def _finalize_turn(self, turn: Dict, user_message: str, llm_response: str) -> Dict:
+        """Store the therapist response and insights; return the response payload."""
+        session_id = turn["session_id"]
+        context_items = turn["context_items"]
+        
+        # Store therapist response, then any therapeutic insights
+        insights = self._extract_insights(session_id, user_message, llm_response)
+        therapist_message_id = await self.executor.run_io(
+            self.session_service.store_reply,
+            session_id,
+            llm_response,
+            insights=insights,
+            index=False
+        )
+        if therapist_message_id:
+            await self._index_message(session_id, llm_response, therapist_message_id, "therapist")
+        
+        # Fold older turns into the rolling summary in the background every K turns
+        self.summarizer.maybe_schedule(session_id, turn["session_messages"] + 2, turn["rolling_summary"])
+        
+        logger.info("Generated RAG response", 
+                   session_id=session_id,
+                   user_message_length=len(user_message),
+                   response_length=len(llm_response),
+                   context_items_used=len(context_items),
+                   history_messages_used=len(turn["history"]),
+                   is_new_session=turn["is_new_session"],
+                   model_tier=turn["policy"]["tier"])
+        
+        return {
+            "response": llm_response,
+            "session_id": session_id,
+            "context_used": turn["context_used"],
+            "context_items_count": len(context_items),
+            "is_new_session": turn["is_new_session"],
+            "user_message_id": turn["user_message_id"],
+            "therapist_message_id": therapist_message_id
+        }
+    
+    def _build_turn_content(self, user_message: str, context_items: List[Dict], is_new_session: bool,
+                            summary: Optional[str] = None) -> List[Dict]:
+        """Build the user turn as content blocks: session summary, retrieved memories, then the current message.
+        
+        The therapist instructions live once in LLMService's cached system
+        block and recent turns travel as conversation history, so only
+        per-turn material is sent here. Items arrive already trimmed to the
+        token budget by ContextPacker and the summary is capped at a fixed
+        size, so the prompt does not grow with the session.
+        """
+        blocks = []
+        if summary and not is_new_session:
+            summary_text = truncate_to_tokens(summary, settings.session_summary_max_tokens)
+            blocks.append({"type": "text", "text": f"CONVERSATION SUMMARY SO FAR:\n{summary_text}"})
+        if is_new_session:
+            blocks.append({"type": "text", "text": "This is the beginning of your conversation with this person."})
+        elif context_items:
+            context_text = "\n".join(
+                f"- {item['message_type'].title()}: {item['content']}" for item in context_items
+            )
+            blocks.append({"type": "text", "text": f"PREVIOUS CONVERSATION CONTEXT:\n{context_text}"})
         
-        return base_prompt + context_prompt + current_message_prompt
+        blocks.append({"type": "text", "text": f"CURRENT MESSAGE: {user_message}"})
+        return blocks
     
-    async def _extract_and_store_insights(self, session_id: str, user_message: str, therapist_response: str):
-        """Extract and store therapeutic insights from the conversation."""
+    def _extract_insights(self, session_id: str, user_message: str, therapist_response: str) -> List[Dict]:
+        """Extract therapeutic insights from the conversation; they are stored with the reply."""
         try:
             # Simple keyword-based insight extraction
             # In a production system, this could use more sophisticated NLP
@@ -174,35 +336,29 @@ Provide therapeutic guidance that demonstrates continuity while offering fresh,
                     "confidence": 0.8
                 })
             
-            # Store insights
-            for insight in insights_to_store:
-                self.session_service.add_session_insight(
-                    session_id=session_id,
-                    insight_type=insight["type"],
-                    content=insight["content"],
-                    confidence_score=insight["confidence"]
-                )
-            
             if insights_to_store:
-                logger.info("Stored therapeutic insights", 
+                logger.info("Extracted therapeutic insights", 
                            session_id=session_id, 
                            insights_count=len(insights_to_store))
+            
+            return insights_to_store
                            
         except Exception as e:
             logger.error("Failed to extract insights", session_id=session_id, error=str(e))
             # Don't raise - insights are supplementary
+            return []
     
-    def get_session_summary(self, session_id: str) -> Dict:
+    async def get_session_summary(self, session_id: str) -> Dict:
         """Get a comprehensive summary of a therapy session."""
         try:
             # Get session stats
-            stats = self.session_service.get_session_stats(session_id)
+            stats = await self.executor.run_io(self.session_service.get_session_stats, session_id)
             
             # Get recent insights
-            insights = self.session_service.get_session_insights(session_id)
+            insights = await self.executor.run_io(self.session_service.get_session_insights, session_id)
             
             # Get recent context
-            context = self.session_service.get_session_context(session_id, limit=5)
+            context = await self.executor.run_io(self.session_service.get_session_context, session_id, limit=5)
             
             return {
                 "session_stats": stats,
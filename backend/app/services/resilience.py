@@ -0,0 +1,278 @@
+"""
+Resilience for upstream LLM calls: classified retries with jittered backoff,
+hedged requests and a circuit breaker.
+"""
+import asyncio
+from collections import deque
+import random
+import time
+import anthropic
+import structlog
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+from .admission import AdmissionRejected
+from .deadline import Deadline, DeadlineExceeded
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# Overload, throttling and gateway errors are worth another attempt; other 4xx are not
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for transient upstream failures: timeouts, connection errors, overload."""
+    if isinstance(exc, (asyncio.TimeoutError, anthropic.APIConnectionError)):
+        return True
+    if isinstance(exc, anthropic.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+def retry_after_hint(exc: BaseException) -> Optional[float]:
+    """Seconds from an upstream Retry-After header, if present."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class CircuitOpenError(AdmissionRejected):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("circuit_open", retry_after)
+
+class CircuitBreaker:
+    """Fails fast once the recent upstream failure rate crosses a threshold.
+
+    Outcomes are kept for ``window_seconds``. With at least ``min_calls``
+    outcomes and a failure rate of ``failure_rate`` or more the circuit opens
+    for ``open_seconds``; after that a single probe call is let through and
+    its outcome closes or re-opens the circuit. ``before_call`` hands the
+    probe a token, and while the circuit is not closed only the outcome
+    carrying the current token counts: calls that started before it opened
+    and finish late are ignored.
+    """
+
+    def __init__(self, failure_rate: float = 0.5, min_calls: int = 10,
+                 window_seconds: float = 30.0, open_seconds: float = 15.0):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at: Optional[float] = None
+        # Token of the half-open probe in flight, from a counter that never repeats
+        self._probe: Optional[int] = None
+        self._probes = 0
+        self._opens = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> Optional[int]:
+        """Raise CircuitOpenError unless a call may go upstream now.
+
+        Returns the probe token for a half-open probe, else None; pass it
+        back to ``record`` or ``abandon``.
+        """
+        state = self.state
+        if state == "open":
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+            raise CircuitOpenError(max(1, int(remaining + 0.999)))
+        if state == "half_open":
+            if self._probe is not None:
+                raise CircuitOpenError(1)
+            self._probes += 1
+            self._probe = self._probes
+            return self._probe
+        return None
+
+    def record(self, success: bool, probe: Optional[int] = None):
+        """Record the outcome of an upstream call started with token ``probe``."""
+        now = time.monotonic()
+        if self._opened_at is not None:
+            if probe is None or probe != self._probe:
+                # A straggler from before the circuit opened; only the probe decides
+                return
+            self._probe = None
+            if success:
+                self._opened_at = None
+                self._outcomes.clear()
+                logger.info("LLM circuit closed")
+            else:
+                self._opened_at = now
+                logger.warning("LLM circuit re-opened after failed probe")
+            return
+
+        self._outcomes.append((now, success))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._opened_at = now
+            self._opens += 1
+            logger.warning("LLM circuit opened",
+                          failures=failures,
+                          calls=len(self._outcomes),
+                          open_seconds=self.open_seconds)
+
+    def abandon(self, probe: Optional[int] = None):
+        """Forget a cancelled call so a half-open probe slot is not held forever."""
+        if probe is not None and probe == self._probe:
+            self._probe = None
+
+    def stats(self) -> Dict:
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_failures": failures,
+            "opens": self._opens
+        }
+
+class LatencyTracker:
+    """Recent successful call durations, for hedge delays."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class ResilientCaller:
+    """Runs an upstream call with retries, optional hedging and a circuit breaker.
+
+    Retries use full-jitter exponential backoff (or the upstream Retry-After
+    hint) and stop when another attempt would not fit in ``budget_seconds``.
+    With hedging enabled, a second identical request is sent when the first
+    has not answered within the recent p95 latency, and whichever answers
+    first wins.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 budget_seconds: float = 30.0, hedge: bool = False, hedge_min_delay: float = 1.0,
+                 hedge_min_samples: int = 20, breaker: Optional[CircuitBreaker] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number ``attempt`` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before sending a hedge, or None while there is too little latency data."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(0.95))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = True,
+                   request_deadline: Optional[Deadline] = None) -> T:
+        """Await ``fn()`` with retries; ``fn`` must start a fresh request on each call.
+
+        Pass ``hedge=False`` when a losing duplicate would hold resources
+        that cannot be released by cancellation (e.g. an opened stream).
+        With ``request_deadline`` the retry budget never outlives the
+        caller, and running out of its time raises DeadlineExceeded.
+        """
+        deadline = time.monotonic() + self.budget_seconds
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline.expires_at)
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = self.breaker.before_call()
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(self._attempt(fn, hedge), remaining)
+            except asyncio.CancelledError:
+                self.breaker.abandon(probe)
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                # Client errors say nothing about upstream health
+                self.breaker.record(success=not retryable, probe=probe)
+                if request_deadline is not None and request_deadline.expired:
+                    raise DeadlineExceeded("Deadline exceeded during LLM call") from e
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+                delay = retry_after_hint(e) or self.backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    logger.warning("LLM retry budget exhausted", attempt=attempt, error_type=type(e).__name__)
+                    raise
+                self._retries += 1
+                logger.info("Retrying LLM call",
+                           attempt=attempt,
+                           delay_seconds=round(delay, 3),
+                           error_type=type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record(success=True, probe=probe)
+            self.latency.record(time.monotonic() - started)
+            return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], hedge: bool) -> T:
+        delay = self.hedge_delay() if hedge else None
+        primary = asyncio.ensure_future(fn())
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._hedges += 1
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        p95 = self.latency.percentile(0.95)
+        return {
+            "retries": self._retries,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "p95_latency_ms": p95 * 1000 if p95 is not None else None,
+            "breaker": self.breaker.stats()
+        }
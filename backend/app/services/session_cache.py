@@ -0,0 +1,113 @@
+"""
+In-process write-through cache of active sessions and their most recent messages.
+"""
+from collections import deque
+from datetime import datetime
+import threading
+import structlog
+from typing import Dict, List, Optional
+
+from .cache import LRUCache
+
+logger = structlog.get_logger(__name__)
+
+class CachedSession:
+    """What a turn needs to know about a session, kept in step with committed writes.
+
+    Attribute names match ChatSession. ``recent`` always holds the
+    newest messages in chronological order (a suffix of the conversation),
+    possibly fewer than its capacity.
+    """
+
+    def __init__(self, session_id: str, total_messages: int, session_metadata: Optional[Dict],
+                 created_at: Optional[datetime], last_activity: Optional[datetime], recent_messages: int):
+        self.session_id = session_id
+        self.total_messages = total_messages or 0
+        self.session_metadata = session_metadata or {}
+        self.created_at = created_at
+        self.last_activity = last_activity
+        self.recent = deque(maxlen=recent_messages)
+        # Bumped on every write, so a slower database read cannot overwrite newer messages
+        self.version = 0
+
+class SessionCache:
+    """Bounded LRU of active sessions with an idle TTL.
+
+    SessionService updates entries only after the write they reflect has
+    committed, and drops them when a session is deleted. The cache is per
+    process: with several workers an entry can miss writes made elsewhere
+    until it idles out. Entries are only ever written from committed data;
+    nothing in them is written back to the database.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 900.0, recent_messages: int = 20):
+        self.recent_messages = recent_messages
+        self._entries = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._recent_served = 0
+
+    def get(self, session_id: str) -> Optional[CachedSession]:
+        """Return the cached session, or None if it is not cached."""
+        return self._entries.get(session_id)
+
+    def add(self, session_id: str, total_messages: int, session_metadata: Optional[Dict],
+            created_at: Optional[datetime] = None, last_activity: Optional[datetime] = None) -> CachedSession:
+        """Cache a session as committed; its recent messages start empty."""
+        entry = CachedSession(session_id, total_messages, session_metadata, created_at, last_activity,
+                              self.recent_messages)
+        self._entries.put(session_id, entry)
+        return entry
+
+    def record(self, session_id: str, message: Dict, last_activity: Optional[datetime] = None):
+        """Apply a committed message write."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry.total_messages += 1
+            entry.last_activity = last_activity
+            entry.recent.append(message)
+            entry.version += 1
+
+    def recent(self, session_id: str, limit: int) -> Optional[List[Dict]]:
+        """The newest ``limit`` messages, or None if the cache cannot vouch for them."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            # Enough cached, or everything the session has
+            if len(entry.recent) < limit and len(entry.recent) < entry.total_messages:
+                return None
+            self._recent_served += 1
+            return list(entry.recent)[-limit:] if limit > 0 else []
+
+    def version(self, session_id: str) -> Optional[int]:
+        """Write version of the cached session, to pass to ``remember_recent``."""
+        entry = self._entries.get(session_id)
+        return entry.version if entry is not None else None
+
+    def remember_recent(self, session_id: str, messages: List[Dict], version: Optional[int]):
+        """Fill the recent messages from a database read started at ``version``."""
+        if version is None:
+            return
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.version != version or len(messages) <= len(entry.recent):
+                return
+            entry.recent.clear()
+            entry.recent.extend(messages[-self.recent_messages:])
+
+    def update_metadata(self, session_id: str, session_metadata: Dict):
+        """Replace the cached metadata after a committed metadata write."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.session_metadata = session_metadata
+
+    def invalidate(self, session_id: str):
+        """Forget a session, e.g. after it was deleted."""
+        self._entries.pop(session_id)
+
+    def stats(self) -> Dict:
+        """Return entry hit-rate counters and how often recent turns came from the cache."""
+        return {**self._entries.stats(), "recent_served": self._recent_served}
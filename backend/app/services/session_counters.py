@@ -0,0 +1,106 @@
+"""
+Denormalized per-session message and insight counters.
+
+Counts live in their own ``session_counters`` table, one row per session
+and kind, next to the ``total_messages`` column. They are bumped with
+``count = count + 1`` in the same transaction as the row they count, so
+nothing else written to the session (e.g. the rolling summary in its
+metadata) can overwrite them, and session stats need no COUNT(*) over
+long sessions. When they disagree with ``total_messages`` (sessions from
+before the table, or a message type without a row) they are rebuilt from
+a single grouped query.
+"""
+from sqlalchemy import Column, ForeignKey, Integer, String, Table, delete, func, insert, literal, select, union_all, update
+from ..database.models import ChatSession, Message, SessionInsight
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INSIGHT_KIND = "__insight__"
+# Rows created with every session; other message types are added by repair
+KINDS = ("user", "therapist", INSIGHT_KIND)
+
+counters_table = Table(
+    "session_counters", ChatSession.metadata,
+    Column("session_id", String(36), ForeignKey("chat_sessions.session_id"), primary_key=True),
+    Column("kind", String(20), primary_key=True),
+    Column("count", Integer, nullable=False, default=0)
+)
+
+def initial_rows(session_id: str):
+    """Zeroed counter rows for a new session."""
+    return insert(counters_table).values([{"session_id": session_id, "kind": kind, "count": 0} for kind in KINDS])
+
+def _bump(session_id: str, kind: str):
+    return (
+        update(counters_table)
+        .where(counters_table.c.session_id == session_id, counters_table.c.kind == kind)
+        .values(count=counters_table.c.count + 1)
+    )
+
+def message_statements(session_id: str, message_type: str, now: Optional[datetime] = None) -> List:
+    """Statements recording one stored message; the session row is never read."""
+    return [
+        update(ChatSession).where(ChatSession.session_id == session_id).values(
+            total_messages=func.coalesce(ChatSession.total_messages, 0) + 1,
+            last_activity=now or datetime.utcnow()
+        ).execution_options(synchronize_session=False),
+        _bump(session_id, message_type)
+    ]
+
+def insight_statements(session_id: str) -> List:
+    """Statements recording one stored insight."""
+    return [_bump(session_id, INSIGHT_KIND)]
+
+def counts_query(session_id: str):
+    """The stored counter rows of a session."""
+    return select(counters_table.c.kind, counters_table.c.count).where(counters_table.c.session_id == session_id)
+
+def stored_counts(total_messages: Optional[int], rows: Iterable[Tuple[str, int]]) -> Optional[Dict]:
+    """Stats from ``counts_query`` rows, or None if they are missing or disagree with ``total_messages``."""
+    counts = dict(rows)
+    if not counts:
+        return None
+    insights = counts.pop(INSIGHT_KIND, 0)
+    if sum(counts.values()) != (total_messages or 0):
+        return None
+    return _as_stats(counts, insights)
+
+def count_query(session_id: str):
+    """One round trip: message counts per type plus the insight count."""
+    return union_all(
+        select(Message.message_type.label("kind"), func.count().label("count"))
+        .where(Message.session_id == session_id)
+        .group_by(Message.message_type),
+        select(literal(INSIGHT_KIND).label("kind"), func.count().label("count"))
+        .select_from(SessionInsight)
+        .where(SessionInsight.session_id == session_id)
+    )
+
+def repair(session_id: str, rows: Iterable[Tuple[str, int]]) -> Tuple[List, Dict]:
+    """Statements rebuilding the counters from ``count_query`` rows, and the resulting stats."""
+    counts = {kind: 0 for kind in KINDS}
+    counts.update(dict(rows))
+    insights = counts[INSIGHT_KIND]
+    messages = {kind: count for kind, count in counts.items() if kind != INSIGHT_KIND}
+    statements = [
+        delete(counters_table).where(counters_table.c.session_id == session_id),
+        insert(counters_table).values([
+            {"session_id": session_id, "kind": kind, "count": count} for kind, count in counts.items()
+        ]),
+        update(ChatSession).where(ChatSession.session_id == session_id).values(
+            total_messages=sum(messages.values())
+        ).execution_options(synchronize_session=False)
+    ]
+    return statements, _as_stats(messages, insights)
+
+def delete_rows(session_id: str):
+    """Remove a session's counters, e.g. before deleting the session."""
+    return delete(counters_table).where(counters_table.c.session_id == session_id)
+
+def _as_stats(messages: Dict[str, int], insights: int) -> Dict:
+    return {
+        "total_messages": sum(messages.values()),
+        "user_messages": messages.get("user", 0),
+        "therapist_messages": messages.get("therapist", 0),
+        "insights_count": insights
+    }
@@ -2,9 +2,12 @@
 Session management service for handling chat sessions and conversation context.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, update
 from ..database.models import ChatSession, Message, SessionInsight
 from ..database.connection import get_database
+from .unit_of_work import UnitOfWork, session_scope, unit_scope
+from .session_cache import SessionCache
+from . import session_counters
 import structlog
 from typing import List, Optional, Dict
 import uuid
@@ -15,41 +18,58 @@ logger = structlog.get_logger(__name__)
 class SessionService:
     """Manages chat sessions and conversation history."""
     
-    def __init__(self, embedding_service=None):
+    def __init__(self, embedding_service=None, cache: Optional[SessionCache] = None):
         self.embedding_service = embedding_service
+        # Write-through cache of active sessions; every write below keeps it in step after commit
+        self.cache = cache
     
-    def create_session(self, metadata: Optional[Dict] = None) -> str:
-        """Create a new chat session and return the session ID."""
+    async def close(self):
+        """Nothing to release; connections belong to the database module's engine."""
+    
+    def create_session(self, metadata: Optional[Dict] = None, uow: Optional[UnitOfWork] = None) -> str:
+        """Create a new chat session and return the session ID.
+        
+        With ``uow`` the session row joins that unit of work and is committed by its owner.
+        """
         try:
             session_id = str(uuid.uuid4())
             
-            # Create database session
-            db = next(get_database())
-            try:
+            with unit_scope(uow) as unit:
+                now = datetime.utcnow()
+                session_metadata = metadata or {}
                 new_session = ChatSession(
                     session_id=session_id,
-                    session_metadata=metadata or {}
+                    session_metadata=session_metadata,
+                    total_messages=0,
+                    created_at=now,
+                    last_activity=now
                 )
-                db.add(new_session)
-                db.commit()
+                unit.db.add(new_session)
+                unit.db.flush()
+                unit.db.execute(session_counters.initial_rows(session_id))
                 
-                # Create corresponding vector collection
+                if self.cache:
+                    unit.after_commit(lambda: self.cache.add(session_id, 0, session_metadata, now, now))
+                
+                # Create corresponding vector collection once the row exists
                 if self.embedding_service:
-                    self.embedding_service.create_session_collection(session_id)
+                    unit.after_commit(lambda: self.embedding_service.create_session_collection(session_id))
                 
-                logger.info("Created new chat session", session_id=session_id)
-                return session_id
-                
-            finally:
-                db.close()
+            logger.info("Created new chat session", session_id=session_id)
+            return session_id
                 
         except Exception as e:
             logger.error("Failed to create session", error=str(e))
             raise
     
-    def get_session(self, session_id: str) -> Optional[ChatSession]:
+    def get_session(self, session_id: str, uow: Optional[UnitOfWork] = None) -> Optional[ChatSession]:
         """Get session information by session ID."""
         try:
+            if uow is not None:
+                return uow.db.query(ChatSession).filter(
+                    ChatSession.session_id == session_id
+                ).first()
+            
             db = next(get_database())
             try:
                 session = db.query(ChatSession).filter(
@@ -62,55 +82,61 @@ class SessionService:
             logger.error("Failed to get session", session_id=session_id, error=str(e))
             return None
     
-    def store_message(self, session_id: str, content: str, message_type: str, token_count: Optional[int] = None) -> Optional[str]:
-        """Store a message in both database and vector store."""
+    def store_message(self, session_id: str, content: str, message_type: str, token_count: Optional[int] = None,
+                      embedding=None, uow: Optional[UnitOfWork] = None, index: bool = True) -> Optional[str]:
+        """Store a message in both database and vector store.
+        
+        ``embedding`` may carry a vector the caller already computed for this content.
+        The row, its (deterministic) embedding ID and the session counters are
+        written in one commit; with ``uow`` that commit is left to the unit of
+        work's owner. The vector is written only after the commit (see
+        ``index_message``), so a rollback leaves no orphan embedding and the
+        database lock is not held during the vector store flush. Pass
+        ``index=False`` to index the message yourself.
+        """
         try:
             message_id = str(uuid.uuid4())
             
-            # Store in database
-            db = next(get_database())
-            try:
+            with unit_scope(uow) as unit:
                 # Create message record
+                timestamp = datetime.utcnow()
                 new_message = Message(
                     message_id=message_id,
                     session_id=session_id,
                     content=content,
                     message_type=message_type,
-                    token_count=token_count
+                    token_count=token_count,
+                    timestamp=timestamp,
+                    embedding_id=(
+                        self.embedding_service.embedding_id_for(message_type, message_id)
+                        if self.embedding_service else None
+                    )
                 )
                 
-                # Update session activity and message count
-                session = db.query(ChatSession).filter(
-                    ChatSession.session_id == session_id
-                ).first()
-                
-                if session:
-                    session.last_activity = datetime.utcnow()
-                    session.total_messages = session.total_messages + 1
-                
-                db.add(new_message)
-                db.commit()
-                
-                # Store in vector database
-                if self.embedding_service:
-                    embedding_id = self.embedding_service.add_message_embedding(
-                        session_id, content, message_id, message_type
+                # Update session activity and message counters
+                self._record_on_session(unit, session_id, message={
+                    "content": content,
+                    "type": message_type,
+                    "timestamp": timestamp.isoformat(),
+                    "message_id": message_id
+                })
+                
+                unit.db.add(new_message)
+                unit.db.flush()
+                
+                # Store in vector database once the row is committed
+                if self.embedding_service and index:
+                    unit.after_commit(
+                        lambda: self.index_message(session_id, content, message_id, message_type, embedding=embedding)
                     )
-                    if embedding_id:
-                        # Update message with embedding ID
-                        new_message.embedding_id = embedding_id
-                        db.commit()
-                
-                logger.info("Stored message", 
-                           session_id=session_id, 
-                           message_id=message_id, 
-                           message_type=message_type,
-                           content_length=len(content))
-                
-                return message_id
                 
-            finally:
-                db.close()
+            logger.info("Stored message", 
+                       session_id=session_id, 
+                       message_id=message_id, 
+                       message_type=message_type,
+                       content_length=len(content))
+            
+            return message_id
                 
         except Exception as e:
             logger.error("Failed to store message", 
@@ -119,9 +145,138 @@ class SessionService:
                         error=str(e))
             return None
     
+    def index_message(self, session_id: str, content: str, message_id: str, message_type: str,
+                      embedding=None) -> Optional[str]:
+        """Write a committed message's vector; its embedding ID is cleared if the write fails."""
+        embedding_id = self.embedding_service.add_message_embedding(
+            session_id, content, message_id, message_type, embedding=embedding
+        )
+        if not embedding_id:
+            self.clear_embedding_id(message_id)
+        return embedding_id
+    
+    def clear_embedding_id(self, message_id: str) -> bool:
+        """Unset the embedding ID of a message whose vector could not be written."""
+        try:
+            with session_scope() as db:
+                db.execute(
+                    update(Message).where(Message.message_id == message_id).values(embedding_id=None)
+                    .execution_options(synchronize_session=False)
+                )
+            return True
+        except Exception as e:
+            logger.error("Failed to clear embedding ID", message_id=message_id, error=str(e))
+            return False
+    
+    def _record_on_session(self, unit: UnitOfWork, session_id: str, message: Optional[Dict] = None):
+        """Count a stored message (or, without ``message``, an insight) on the session.
+        
+        Counters and ``total_messages`` are incremented in SQL, so the session
+        row is neither read nor rewritten; a cached session applies the new
+        message once the unit of work commits.
+        """
+        now = datetime.utcnow()
+        if message:
+            statements = session_counters.message_statements(session_id, message["type"], now)
+        else:
+            statements = session_counters.insight_statements(session_id)
+        for statement in statements:
+            unit.db.execute(statement)
+        if self.cache and message:
+            unit.after_commit(lambda: self.cache.record(session_id, message, last_activity=now))
+    
+    def open_turn(self, session_id: Optional[str], content: str, embedding=None, index: bool = True) -> Dict:
+        """Resolve the session and store the user message in a single transaction.
+        
+        Creates a session when ``session_id`` is missing or unknown. Returns
+        the session ID, whether it is new, the stored message ID, the number
+        of messages before this one and the rolling summary. A cached session
+        is not read from the database at all. ``index`` is passed on to
+        ``store_message``.
+        """
+        entry = self.cache.get(session_id) if self.cache and session_id else None
+        with UnitOfWork() as uow:
+            session = self.get_session(session_id, uow=uow) if session_id and entry is None else None
+            if entry is not None:
+                is_new_session = False
+                previous_messages = entry.total_messages
+                rolling_summary = entry.session_metadata.get("rolling_summary", {})
+            elif session:
+                is_new_session = False
+                previous_messages = session.total_messages or 0
+                rolling_summary = (session.session_metadata or {}).get("rolling_summary", {})
+                if self.cache:
+                    # The committed state as read; this turn's write is applied on commit
+                    self.cache.add(session_id, previous_messages, dict(session.session_metadata or {}),
+                                   session.created_at, session.last_activity)
+            else:
+                if session_id:
+                    logger.warning("Session not found, creating new one", requested_session_id=session_id)
+                session_id = self.create_session(uow=uow)
+                is_new_session = True
+                previous_messages = 0
+                rolling_summary = {}
+            
+            message_id = self.store_message(session_id, content, "user", embedding=embedding, uow=uow, index=index)
+            if not message_id:
+                raise Exception("Failed to store user message")
+        
+        return {
+            "session_id": session_id,
+            "is_new_session": is_new_session,
+            "message_id": message_id,
+            "previous_messages": previous_messages,
+            "rolling_summary": rolling_summary
+        }
+    
+    def store_reply(self, session_id: str, content: str, insights: Optional[List[Dict]] = None,
+                    index: bool = True) -> Optional[str]:
+        """Store the therapist message and the turn's insights in one commit.
+        
+        Insights are supplementary: they are written under a savepoint, so a
+        failed insight is rolled back on its own and never loses the reply.
+        ``insights`` are dicts with ``type``, ``content`` and ``confidence``.
+        Returns the message ID, or None if the message could not be stored.
+        """
+        try:
+            with UnitOfWork() as uow:
+                message_id = self.store_message(session_id, content, "therapist", uow=uow, index=index)
+                if not message_id:
+                    raise Exception("Failed to store therapist message")
+                if insights:
+                    self._store_insights(uow, session_id, insights)
+        except Exception as e:
+            logger.error("Failed to store reply", session_id=session_id, error=str(e))
+            return None
+        return message_id
+    
+    def _store_insights(self, uow: UnitOfWork, session_id: str, insights: List[Dict]):
+        """Add insights to ``uow`` under a savepoint, dropping them all if one fails."""
+        try:
+            with uow.db.begin_nested():
+                for insight in insights:
+                    insight_id = self.add_session_insight(
+                        session_id,
+                        insight_type=insight["type"],
+                        content=insight["content"],
+                        confidence_score=insight["confidence"],
+                        uow=uow
+                    )
+                    if not insight_id:
+                        raise Exception("Failed to store insight")
+        except Exception as e:
+            logger.warning("Failed to store insights", session_id=session_id, error=str(e))
+    
     def get_session_context(self, session_id: str, limit: int = 10) -> List[Dict]:
-        """Get recent conversation context for a session."""
+        """Get recent conversation context for a session, from the cache when it holds enough turns."""
         try:
+            version = None
+            if self.cache:
+                cached = self.cache.recent(session_id, limit)
+                if cached is not None:
+                    return cached
+                version = self.cache.version(session_id)
+            
             db = next(get_database())
             try:
                 messages = db.query(Message).filter(
@@ -142,6 +297,8 @@ class SessionService:
                            session_id=session_id, 
                            message_count=len(context))
                 
+                if self.cache:
+                    self.cache.remember_recent(session_id, context, version)
                 return context
                 
             finally:
@@ -151,13 +308,89 @@ class SessionService:
             logger.error("Failed to get session context", session_id=session_id, error=str(e))
             return []
     
-    def add_session_insight(self, session_id: str, insight_type: str, content: str, confidence_score: Optional[float] = None) -> Optional[str]:
+    def get_session_messages(self, session_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Get messages of a session in chronological order, starting at ``offset``."""
+        try:
+            db = next(get_database())
+            try:
+                messages = db.query(Message).filter(
+                    Message.session_id == session_id
+                ).order_by(Message.timestamp).offset(offset).limit(limit).all()
+                
+                return [{
+                    "content": message.content,
+                    "type": message.message_type,
+                    "timestamp": message.timestamp.isoformat() if message.timestamp else None,
+                    "message_id": message.message_id
+                } for message in messages]
+                
+            finally:
+                db.close()
+                
+        except Exception as e:
+            logger.error("Failed to get session messages", session_id=session_id, error=str(e))
+            return []
+    
+    def get_rolling_summary(self, session_id: str) -> Dict:
+        """Get the rolling summary stored in the session metadata, or an empty dict.
+        
+        Always read from the database: the summarizer builds the next summary
+        on it, and another worker may have saved a newer one than is cached here.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return {}
+        return (session.session_metadata or {}).get("rolling_summary", {})
+    
+    def save_rolling_summary(self, session_id: str, summary: Dict) -> bool:
+        """Store the rolling summary in the session metadata.
+        
+        A summary covering no more messages than the stored one is dropped,
+        so a summarizer working from an older base never rolls it back.
+        """
+        try:
+            db = next(get_database())
+            try:
+                session = db.query(ChatSession).filter(
+                    ChatSession.session_id == session_id
+                ).first()
+                
+                if not session:
+                    return False
+                
+                stored = (session.session_metadata or {}).get("rolling_summary", {})
+                if stored.get("summarized_messages", 0) >= summary.get("summarized_messages", 0):
+                    logger.info("Skipped stale rolling summary", session_id=session_id)
+                    if self.cache:
+                        self.cache.update_metadata(session_id, dict(session.session_metadata or {}))
+                    return False
+                
+                # Assign a new dict so the JSON column is marked as changed
+                metadata = {**(session.session_metadata or {}), "rolling_summary": summary}
+                session.session_metadata = metadata
+                db.commit()
+                if self.cache:
+                    self.cache.update_metadata(session_id, metadata)
+                
+                logger.info("Saved rolling summary", 
+                           session_id=session_id, 
+                           summarized_messages=summary.get("summarized_messages"))
+                return True
+                
+            finally:
+                db.close()
+                
+        except Exception as e:
+            logger.error("Failed to save rolling summary", session_id=session_id, error=str(e))
+            return False
+    
+    def add_session_insight(self, session_id: str, insight_type: str, content: str, confidence_score: Optional[float] = None,
+                            uow: Optional[UnitOfWork] = None) -> Optional[str]:
         """Add a therapeutic insight to the session."""
         try:
             insight_id = str(uuid.uuid4())
             
-            db = next(get_database())
-            try:
+            with unit_scope(uow) as unit:
                 insight = SessionInsight(
                     insight_id=insight_id,
                     session_id=session_id,
@@ -166,18 +399,15 @@ class SessionService:
                     confidence_score=confidence_score
                 )
                 
-                db.add(insight)
-                db.commit()
+                unit.db.add(insight)
+                self._record_on_session(unit, session_id)
                 
-                logger.info("Added session insight", 
-                           session_id=session_id, 
-                           insight_type=insight_type,
-                           insight_id=insight_id)
-                
-                return insight_id
-                
-            finally:
-                db.close()
+            logger.info("Added session insight", 
+                       session_id=session_id, 
+                       insight_type=insight_type,
+                       insight_id=insight_id)
+            
+            return insight_id
                 
         except Exception as e:
             logger.error("Failed to add session insight", 
@@ -229,10 +459,13 @@ class SessionService:
             return []
     
     def get_session_stats(self, session_id: str) -> Dict:
-        """Get statistical information about a session."""
+        """Get statistical information about a session.
+        
+        Served from the session's counter rows; one grouped count rebuilds
+        them when they are missing or out of step with ``total_messages``.
+        """
         try:
-            db = next(get_database())
-            try:
+            with session_scope() as db:
                 session = db.query(ChatSession).filter(
                     ChatSession.session_id == session_id
                 ).first()
@@ -240,38 +473,26 @@ class SessionService:
                 if not session:
                     return {}
                 
-                message_count = db.query(Message).filter(
-                    Message.session_id == session_id
-                ).count()
-                
-                user_messages = db.query(Message).filter(
-                    Message.session_id == session_id,
-                    Message.message_type == "user"
-                ).count()
-                
-                therapist_messages = db.query(Message).filter(
-                    Message.session_id == session_id,
-                    Message.message_type == "therapist"
-                ).count()
-                
-                insights_count = db.query(SessionInsight).filter(
-                    SessionInsight.session_id == session_id
-                ).count()
+                rows = db.execute(session_counters.counts_query(session_id)).all()
+                counts = session_counters.stored_counts(session.total_messages, rows)
+                if counts is None:
+                    rows = db.execute(session_counters.count_query(session_id)).all()
+                    statements, counts = session_counters.repair(session_id, rows)
+                    for statement in statements:
+                        db.execute(statement)
+                    logger.info("Rebuilt session counters", session_id=session_id, **counts)
+                    if self.cache:
+                        # Re-read on the next turn with the repaired total
+                        self.cache.invalidate(session_id)
                 
                 return {
                     "session_id": session_id,
                     "created_at": session.created_at.isoformat() if session.created_at else None,
                     "last_activity": session.last_activity.isoformat() if session.last_activity else None,
-                    "total_messages": message_count,
-                    "user_messages": user_messages,
-                    "therapist_messages": therapist_messages,
-                    "insights_count": insights_count,
+                    **counts,
                     "metadata": session.session_metadata
                 }
                 
-            finally:
-                db.close()
-                
         except Exception as e:
             logger.error("Failed to get session stats", session_id=session_id, error=str(e))
             return {}
@@ -287,9 +508,13 @@ class SessionService:
                 ).first()
                 
                 if session:
+                    db.execute(session_counters.delete_rows(session_id))
                     db.delete(session)
                     db.commit()
                 
+                if self.cache:
+                    self.cache.invalidate(session_id)
+                
                 # Delete from vector store
                 if self.embedding_service:
                     self.embedding_service.delete_session_collection(session_id)
@@ -0,0 +1,113 @@
+"""
+Incremental rolling summaries for long sessions, maintained in the background.
+"""
+import asyncio
+from datetime import datetime
+import structlog
+from typing import Dict, Optional, Set
+
+from .admission import AdmissionRejected
+
+logger = structlog.get_logger(__name__)
+
+class SessionSummarizer:
+    """Keeps a fixed-size rolling summary per session up to date.
+
+    After a turn is stored, ``maybe_schedule`` starts a background update
+    once ``every_turns`` new turns (user + therapist messages) have
+    accumulated since the last summary. The update folds only those new
+    messages into the previous summary, so its cost does not grow with the
+    session. The summary lives in the session metadata under
+    ``rolling_summary`` with the number of messages it covers.
+    """
+
+    def __init__(self, llm_service, session_service, executor, every_turns: int = 10,
+                 max_tokens: int = 250, model: Optional[str] = None, enabled: bool = True):
+        self.llm_service = llm_service
+        self.session_service = session_service
+        self.executor = executor
+        self.every_messages = every_turns * 2
+        self.max_tokens = max_tokens
+        self.model = model
+        self.enabled = enabled
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._updates = 0
+        self._skipped = 0
+
+    def is_due(self, total_messages: int, summary: Dict) -> bool:
+        """Whether enough new messages have accumulated since the last summary."""
+        return total_messages - summary.get("summarized_messages", 0) >= self.every_messages
+
+    def maybe_schedule(self, session_id: str, total_messages: int, summary: Dict) -> bool:
+        """Start a background update if one is due and none is running for the session."""
+        if not self.enabled or session_id in self._running or not self.is_due(total_messages, summary):
+            return False
+        self._running.add(session_id)
+        task = asyncio.ensure_future(self._update(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _update(self, session_id: str):
+        try:
+            # Skip the reads when already saturated; summarize itself only
+            # runs if a slot is free and no live request is waiting for one
+            self.llm_service.check_capacity()
+
+            summary = await self.executor.run_io(self.session_service.get_rolling_summary, session_id)
+            summarized = summary.get("summarized_messages", 0)
+            messages = await self.executor.run_io(
+                self.session_service.get_session_messages,
+                session_id,
+                offset=summarized,
+                limit=self.every_messages * 2
+            )
+            if not messages:
+                return
+
+            transcript = "\n".join(
+                f"{'User' if message['type'] == 'user' else 'Therapist'}: {message['content']}"
+                for message in messages
+            )
+            text = await self.llm_service.summarize(
+                summary.get("text", ""), transcript, max_tokens=self.max_tokens, model=self.model
+            )
+            if not text:
+                self._skipped += 1
+                return
+
+            await self.executor.run_io(self.session_service.save_rolling_summary, session_id, {
+                "text": text,
+                "summarized_messages": summarized + len(messages),
+                "last_message_id": messages[-1]["message_id"],
+                "updated_at": datetime.utcnow().isoformat()
+            })
+            self._updates += 1
+            logger.info("Updated rolling summary",
+                       session_id=session_id,
+                       new_messages=len(messages),
+                       summarized_messages=summarized + len(messages))
+        except AdmissionRejected:
+            # Retried automatically after a later turn
+            self._skipped += 1
+            logger.info("Rolling summary deferred under load", session_id=session_id)
+        except Exception as e:
+            self._skipped += 1
+            logger.error("Failed to update rolling summary", session_id=session_id, error=str(e))
+        finally:
+            self._running.discard(session_id)
+
+    def stats(self) -> Dict:
+        """Return update counters."""
+        return {
+            "enabled": self.enabled,
+            "running": len(self._running),
+            "updates": self._updates,
+            "skipped": self._skipped
+        }
+
+    def shutdown(self):
+        """Cancel updates still in flight; they are redone after the next turn."""
+        for task in list(self._tasks):
+            task.cancel()
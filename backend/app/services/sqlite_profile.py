@@ -0,0 +1,119 @@
+"""
+SQLite storage profile (connection pragmas) and lightweight schema migrations.
+"""
+from datetime import datetime
+import structlog
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, event, select
+from sqlalchemy.engine import Connection, Engine
+from typing import Callable, List, Tuple
+
+from ..config import settings
+from ..database.models import Message, SessionInsight
+from . import session_counters
+
+logger = structlog.get_logger(__name__)
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+def apply_sqlite_pragmas(engine: Engine, wal: bool = True, synchronous: str = "NORMAL",
+                         cache_size_kib: int = 65536, mmap_size_bytes: int = 268435456,
+                         busy_timeout_ms: int = 5000) -> bool:
+    """Set the storage pragmas on every connection ``engine`` opens; no-op for other dialects.
+
+    WAL lets readers proceed while a writer commits, and with
+    synchronous=NORMAL a commit no longer fsyncs the database file (a power
+    loss can drop the last transactions but does not corrupt the file).
+    For an async engine pass ``async_engine.sync_engine``.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    synchronous = synchronous.upper()
+    if synchronous not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"synchronous must be one of: {', '.join(_SYNCHRONOUS_MODES)}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            # Negative cache_size is in KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size=-{int(cache_size_kib)}")
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size_bytes)}")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+    # Connections pooled before the listener existed would keep the defaults
+    engine.dispose()
+    logger.info("SQLite storage profile applied",
+               wal=wal,
+               synchronous=synchronous,
+               cache_size_kib=cache_size_kib,
+               mmap_size_bytes=mmap_size_bytes)
+    return True
+
+def apply_configured_pragmas(engine: Engine) -> bool:
+    """apply_sqlite_pragmas with the SQLITE_* settings."""
+    return apply_sqlite_pragmas(
+        engine,
+        wal=settings.sqlite_wal_enabled,
+        synchronous=settings.sqlite_synchronous,
+        cache_size_kib=settings.sqlite_cache_size_kib,
+        mmap_size_bytes=settings.sqlite_mmap_size_bytes,
+        busy_timeout_ms=settings.sqlite_busy_timeout_ms
+    )
+
+def _index_messages_by_session_time(connection: Connection):
+    # get_session_context / get_session_messages: WHERE session_id ORDER BY timestamp
+    Index("ix_messages_session_timestamp", Message.session_id, Message.timestamp).create(connection, checkfirst=True)
+
+def _index_insights_by_session_time(connection: Connection):
+    # get_session_insights: WHERE session_id ORDER BY created_at
+    Index(
+        "ix_session_insights_session_created", SessionInsight.session_id, SessionInsight.created_at
+    ).create(connection, checkfirst=True)
+
+def _create_session_counters(connection: Connection):
+    # Counter rows live outside the session metadata (see session_counters)
+    session_counters.counters_table.create(connection, checkfirst=True)
+
+# Append only: (version, description, migration)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "messages by session and timestamp", _index_messages_by_session_time),
+    (2, "session insights by session and creation time", _index_insights_by_session_time),
+    (3, "session counters table", _create_session_counters),
+]
+
+_schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime)
+)
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction; returns the versions applied."""
+    with engine.begin() as connection:
+        _schema_migrations.create(connection, checkfirst=True)
+        applied = set(connection.execute(select(_schema_migrations.c.version)).scalars())
+
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(_schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        newly_applied.append(version)
+        logger.info("Applied schema migration", version=version, description=description)
+
+    if engine.dialect.name == "sqlite" and newly_applied:
+        # Refresh planner statistics so the new indexes are picked up
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")
+    return newly_applied
@@ -0,0 +1,87 @@
+"""
+Unit of work: one database session and transaction shared by several service calls.
+"""
+import threading
+from contextlib import contextmanager
+import structlog
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..database.connection import get_database
+
+logger = structlog.get_logger(__name__)
+
+def _checkout() -> Session:
+    return next(get_database())
+
+class UnitOfWork:
+    """Checks out one session and commits everything done through it once.
+
+    Used as a (synchronous) context manager, inside an I/O pool thread:
+    the transaction is committed when the block exits normally and rolled
+    back if it raises; the session is closed either way. SessionService
+    methods given a unit of work only add and flush, leaving the commit to
+    its owner. Callbacks registered with ``after_commit`` run once the
+    commit has succeeded, e.g. to update caches with what was written or to
+    index committed messages in the vector store.
+    """
+
+    _lock = threading.Lock()
+    _counts = {"checkouts": 0, "commits": 0, "rollbacks": 0}
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory or _checkout
+        self.db: Optional[Session] = None
+        # Scratch space for services that write the same rows several times in one unit
+        self.state: Dict[Any, Any] = {}
+        self._after_commit: List[Callable[[], None]] = []
+
+    def __enter__(self) -> "UnitOfWork":
+        self.db = self._session_factory()
+        self._count("checkouts")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.db.commit()
+                self._count("commits")
+                for callback in self._after_commit:
+                    callback()
+            else:
+                self.db.rollback()
+                self._count("rollbacks")
+                logger.warning("Rolled back unit of work", error=str(exc))
+        finally:
+            self.db.close()
+        return False
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Run ``callback`` after this unit of work commits; dropped on rollback."""
+        self._after_commit.append(callback)
+
+    @classmethod
+    def _count(cls, name: str):
+        with cls._lock:
+            cls._counts[name] += 1
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Return process-wide checkout, commit and rollback counters."""
+        with cls._lock:
+            return dict(cls._counts)
+
+@contextmanager
+def unit_scope(uow: Optional[UnitOfWork] = None) -> Iterator[UnitOfWork]:
+    """Yield ``uow``, or a private unit of work committed on exit."""
+    if uow is not None:
+        yield uow
+        return
+    with UnitOfWork() as own:
+        yield own
+
+@contextmanager
+def session_scope(uow: Optional[UnitOfWork] = None) -> Iterator[Session]:
+    """Yield the session of ``uow``, or of a private unit of work committed on exit."""
+    with unit_scope(uow) as unit:
+        yield unit.db
@@ -0,0 +1,111 @@
+"""
+Compact vector encodings: float16, scalar-quantized int8 and PCA projection.
+"""
+import numpy as np
+from typing import Optional, Tuple
+
+DTYPE_FLOAT32 = "float32"
+DTYPE_FLOAT16 = "float16"
+DTYPE_INT8 = "int8"
+
+VECTOR_DTYPES = (DTYPE_FLOAT32, DTYPE_FLOAT16, DTYPE_INT8)
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving zero vectors untouched."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class PCAProjection:
+    """Linear projection onto the top principal components of a fitted corpus."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (n_components, input_dim)
+
+    @property
+    def output_dim(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, n_components: int) -> "PCAProjection":
+        """Fit on a sample of embeddings via SVD of the centred matrix."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(mean, vt[:n_components])
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, components=self.components)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        data = np.load(path)
+        return cls(data["mean"], data["components"])
+
+class VectorCodec:
+    """Turns model embeddings into the representation kept by a vector store.
+
+    Vectors are optionally projected with PCA, re-normalized so dot products
+    stay cosine similarities, then stored as float32, float16, or int8 with a
+    per-vector float32 scale (symmetric scalar quantization).
+    """
+
+    def __init__(self, dtype: str = DTYPE_FLOAT32, projection: Optional[PCAProjection] = None):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.dtype = dtype
+        self.projection = projection
+
+    @property
+    def storage_dtype(self) -> np.dtype:
+        return np.dtype(self.dtype)
+
+    @property
+    def has_scales(self) -> bool:
+        return self.dtype == DTYPE_INT8
+
+    def output_dim(self, input_dim: int) -> int:
+        return self.projection.output_dim if self.projection else input_dim
+
+    def prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Project (if configured) and normalize; used for queries and before encoding."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.projection:
+            vectors = self.projection.transform(vectors)
+        return normalize(vectors)
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Return stored vectors and, for int8, one scale per vector."""
+        vectors = self.prepare(np.atleast_2d(vectors))
+        if self.dtype == DTYPE_INT8:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+            quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return quantized, scales
+        return vectors.astype(self.storage_dtype), None
+
+    def decode(self, stored: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """Reconstruct float32 vectors from their stored form."""
+        vectors = np.asarray(stored, dtype=np.float32)
+        if scales is not None:
+            vectors = vectors * np.asarray(scales, dtype=np.float32)[:, None]
+        return vectors
+
+    def scores(self, stored: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of a prepared query against stored vectors.
+
+        For int8 the per-vector scale is applied to the scores rather than the
+        matrix, so the stored rows are only widened to float32, never rescaled.
+        """
+        scores = np.asarray(stored, dtype=np.float32) @ query
+        if scales is not None:
+            scores = scores * scales
+        return scores
+
+    def bytes_per_vector(self, input_dim: int) -> int:
+        size = self.output_dim(input_dim) * self.storage_dtype.itemsize
+        return size + (4 if self.has_scales else 0)
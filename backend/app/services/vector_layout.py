@@ -0,0 +1,30 @@
+"""
+Collection naming for the per-session and shared vector store layouts.
+"""
+import zlib
+
+LAYOUT_PER_SESSION = "per_session"
+LAYOUT_SHARED = "shared"
+
+SESSION_COLLECTION_PREFIX = "session_"
+SHARED_COLLECTION_PREFIX = "messages_shard_"
+
+def session_collection_name(session_id: str) -> str:
+    """Name of the dedicated collection for a session (per-session layout)."""
+    return f"{SESSION_COLLECTION_PREFIX}{session_id.replace('-', '_')}"
+
+def shard_for_session(session_id: str, shards: int) -> int:
+    """Stable shard index for a session; crc32 keeps it consistent across processes."""
+    return zlib.crc32(session_id.encode("utf-8")) % shards
+
+def shared_collection_name(session_id: str, shards: int) -> str:
+    """Name of the shared collection that holds a session (shared layout)."""
+    return f"{SHARED_COLLECTION_PREFIX}{shard_for_session(session_id, shards)}"
+
+def collection_name_for(session_id: str, layout: str, shards: int = 1) -> str:
+    """Resolve the collection name for a session under the given layout."""
+    if layout == LAYOUT_SHARED:
+        return shared_collection_name(session_id, shards)
+    if layout == LAYOUT_PER_SESSION:
+        return session_collection_name(session_id)
+    raise ValueError(f"Unknown vector layout: {layout}")
@@ -0,0 +1,63 @@
+"""
+Vector store interface used by EmbeddingService.
+"""
+from abc import ABC, abstractmethod
+from collections import defaultdict
+import numpy as np
+from typing import Dict, Hashable, List, Set
+
+class VectorStore(ABC):
+    """Session-scoped storage and similarity search for message vectors.
+
+    Query results are dicts with ``id``, ``document``, ``metadata`` and
+    ``similarity`` (higher is more similar), best match first.
+
+    Batched writes use records with ``session_id``, ``id``, ``embedding``,
+    ``document`` and ``metadata`` keys.
+    """
+
+    @abstractmethod
+    def create_session(self, session_id: str) -> None:
+        """Prepare storage for a session; a no-op if it already exists."""
+
+    @abstractmethod
+    def add(self, session_id: str, ids: List[str], embeddings: np.ndarray,
+            documents: List[str], metadatas: List[Dict]) -> None:
+        """Append vectors with their documents and metadata to a session."""
+
+    @abstractmethod
+    def query(self, session_id: str, embedding: np.ndarray, n_results: int) -> List[Dict]:
+        """Return up to ``n_results`` nearest items for a session."""
+
+    @abstractmethod
+    def count(self, session_id: str) -> int:
+        """Number of vectors stored for a session."""
+
+    @abstractmethod
+    def existing_ids(self, session_id: str, ids: List[str]) -> Set[str]:
+        """Which of ``ids`` are already stored for a session."""
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> None:
+        """Remove every vector of a session; missing sessions are ignored."""
+
+    def write_key(self, session_id: str) -> Hashable:
+        """Key grouping writes that can be applied in one ``add_records`` call."""
+        return session_id
+
+    def add_records(self, records: List[Dict]) -> None:
+        """Write records that share a write key; one ``add`` per session by default."""
+        by_session = defaultdict(list)
+        for record in records:
+            by_session[record["session_id"]].append(record)
+        for session_id, items in by_session.items():
+            self.add(
+                session_id,
+                ids=[item["id"] for item in items],
+                embeddings=np.stack([item["embedding"] for item in items]),
+                documents=[item["document"] for item in items],
+                metadatas=[item["metadata"] for item in items]
+            )
+
+    def close(self) -> None:
+        """Release resources held by the store."""
@@ -0,0 +1,113 @@
+"""
+Group-commit writer that coalesces small vector store inserts.
+"""
+from collections import defaultdict
+from concurrent.futures import Future
+import queue
+import threading
+import time
+import structlog
+from typing import Any, Callable, Dict, Hashable, List
+
+logger = structlog.get_logger(__name__)
+
+_STOP = object()
+
+class WriteBatcher:
+    """Buffers writes for a few milliseconds and flushes them per key in one call.
+
+    ``flush_fn(key, items)`` is called once per key (e.g. per collection) with
+    every buffered item for that key. Each ``submit`` returns a future that
+    resolves after the flush containing the item has completed, or fails with
+    the flush's exception.
+    """
+
+    def __init__(self, flush_fn: Callable[[Hashable, List[Any]], None], max_items: int = 64, max_delay_ms: float = 5.0):
+        self.flush_fn = flush_fn
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._flushes = 0
+        self._items = 0
+        self._worker = threading.Thread(target=self._run, name="vector-write-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, key: Hashable, item: Any) -> Future:
+        """Queue an item for the next flush of ``key``."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write batcher is closed")
+            self._queue.put((key, item, future))
+        return future
+
+    def _collect(self) -> List:
+        """Wait for the first write, then buffer more until full or the delay expires."""
+        batch = [self._queue.get()]
+        if batch[0] is _STOP:
+            return batch
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(entry)
+            if entry is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            writes = batch[:-1] if stop else batch
+            if writes:
+                self._flush(writes)
+            if stop:
+                return
+
+    def _flush(self, writes: List):
+        grouped: Dict[Hashable, List] = defaultdict(list)
+        for key, item, future in writes:
+            grouped[key].append((item, future))
+
+        for key, entries in grouped.items():
+            # A cancelled awaiter cancels its future but the write is still wanted;
+            # only futures still pending get a result
+            waiting = [future for _, future in entries if future.set_running_or_notify_cancel()]
+            try:
+                self.flush_fn(key, [item for item, _ in entries])
+            except Exception as e:
+                logger.error("Vector write flush failed", key=str(key), items=len(entries), error=str(e))
+                for future in waiting:
+                    future.set_exception(e)
+                continue
+            for future in waiting:
+                future.set_result(None)
+            self._flushes += 1
+            self._items += len(entries)
+
+    def stats(self) -> Dict:
+        """Return flush counters."""
+        return {
+            "flushes": self._flushes,
+            "items": self._items,
+            "avg_items_per_flush": self._items / self._flushes if self._flushes else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+    def close(self):
+        """Flush everything still buffered and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._worker.join()
+        logger.info("Vector write batcher flushed and stopped", **self.stats())
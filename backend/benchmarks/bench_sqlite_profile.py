@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the SQLite storage profile.
+
+Seeds two fresh database files with the same sessions and messages, one
+left at SQLite's defaults and one with the storage profile (WAL and tuned
+pragmas) and schema migrations (composite indexes) applied, then runs the
+same mix of turn-shaped work from a thread pool against each: read the
+recent context, store a message while bumping the session counters, and
+read the session insights. Reports throughput, latency percentiles and
+lock errors per profile.
+
+The models come from app.database.models, which is not part of this
+repository; run it where the application's database package is installed.
+Figures quoted alongside this script so far were measured with stand-in
+models (the columns the services use, plain single-column session_id
+indexes), not the production schema, and should be re-run against it.
+
+Usage (from backend/):
+    python benchmarks/bench_sqlite_profile.py --sessions 200 --messages 200 --threads 16 --turns 4000
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine, desc, insert  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database.models import ChatSession, Message, SessionInsight  # noqa: E402
+from app.services import session_counters  # noqa: E402
+from app.services.sqlite_profile import apply_sqlite_pragmas, run_migrations  # noqa: E402
+
+def seed(engine, sessions: int, messages: int, insights: int) -> list:
+    """Insert sessions with interleaved messages so each session's rows are spread over the table."""
+    Message.metadata.create_all(engine)
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    start = datetime.utcnow() - timedelta(days=30)
+    with engine.begin() as connection:
+        connection.execute(insert(ChatSession), [
+            {"session_id": session_id, "total_messages": messages, "session_metadata": {}} for session_id in session_ids
+        ])
+        connection.execute(insert(session_counters.counters_table), [
+            {"session_id": session_id, "kind": kind, "count": messages // 2 if kind != session_counters.INSIGHT_KIND else 0}
+            for session_id in session_ids for kind in session_counters.KINDS
+        ])
+        for index in range(messages):
+            connection.execute(insert(Message), [{
+                "message_id": str(uuid.uuid4()),
+                "session_id": session_id,
+                "content": f"message {index} " + "lorem ipsum " * 10,
+                "message_type": "user" if index % 2 == 0 else "therapist",
+                "timestamp": start + timedelta(seconds=index * sessions + position)
+            } for position, session_id in enumerate(session_ids)])
+        connection.execute(insert(SessionInsight), [{
+            "insight_id": str(uuid.uuid4()),
+            "session_id": random.choice(session_ids),
+            "insight_type": "emotion",
+            "content": "User expressed anxiety in conversation",
+            "confidence_score": 0.7
+        } for _ in range(sessions * insights)])
+    return session_ids
+
+def turn(Session, session_id: str):
+    db = Session()
+    try:
+        db.query(Message).filter(Message.session_id == session_id).order_by(desc(Message.timestamp)).limit(7).all()
+        for statement in session_counters.message_statements(session_id, "user"):
+            db.execute(statement)
+        db.add(Message(
+            message_id=str(uuid.uuid4()), session_id=session_id, content="benchmark turn", message_type="user"
+        ))
+        db.commit()
+        db.query(SessionInsight).filter(
+            SessionInsight.session_id == session_id
+        ).order_by(desc(SessionInsight.created_at)).all()
+    finally:
+        db.close()
+
+def run(engine, session_ids: list, threads: int, turns: int) -> dict:
+    Session = sessionmaker(engine)
+    latencies, errors = [], 0
+
+    def timed(session_id):
+        began = time.perf_counter()
+        try:
+            turn(Session, session_id)
+        except OperationalError:
+            return None
+        return time.perf_counter() - began
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for latency in pool.map(timed, (random.choice(session_ids) for _ in range(turns))):
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    return {
+        "turns_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "lock_errors": errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions to seed")
+    parser.add_argument("--messages", type=int, default=200, help="Messages seeded per session")
+    parser.add_argument("--insights", type=int, default=5, help="Insights seeded per session")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent workers")
+    parser.add_argument("--turns", type=int, default=4000, help="Turns per profile")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for profile in ("default", "tuned"):
+            random.seed(args.seed)
+            engine = create_engine(f"sqlite:///{os.path.join(directory, profile)}.db", pool_size=args.threads)
+            session_ids = seed(engine, args.sessions, args.messages, args.insights)
+            if profile == "tuned":
+                apply_sqlite_pragmas(engine)
+                run_migrations(engine)
+            results[profile] = run(engine, session_ids, args.threads, args.turns)
+            engine.dispose()
+
+    print(f"{args.sessions} sessions x {args.messages} messages, {args.threads} threads, {args.turns} turns")
+    print(f"{'profile':<10}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'lock errors':>13}")
+    for profile, result in results.items():
+        print(f"{profile:<10}{result['turns_per_second']:>10.0f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['lock_errors']:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memory vs recall trade-off of compact vector encodings.
+
+Embeds a text corpus (one message per line) with the service's model, or
+falls back to synthetic clustered vectors, then compares each encoding with
+exact float32 search: bytes per vector and recall@k of per-session top-k.
+Optionally fits and saves a PCA projection for VECTOR_PCA_PATH.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_codec.py --corpus messages.txt --save-pca data/pca_128.npz --pca-dim 128
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.vector_codec import PCAProjection, VectorCodec, normalize  # noqa: E402
+
+def load_corpus(path: str, model_name: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    with open(path, "r", encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    model = SentenceTransformer(model_name)
+    return model.encode(texts, batch_size=128, convert_to_numpy=True)
+
+def synthetic_corpus(count: int, dim: int, rng) -> np.ndarray:
+    """Clustered, anisotropic vectors; sentence embeddings are far from isotropic."""
+    topics = rng.standard_normal((64, dim))
+    spectrum = np.linspace(1.0, 0.05, dim)
+    assignments = rng.integers(0, len(topics), size=count)
+    return topics[assignments] + rng.standard_normal((count, dim)) * spectrum * 0.6
+
+def recall_at_k(reference: np.ndarray, codec: VectorCodec, session_size: int, k: int, rng) -> float:
+    """Average overlap between exact and encoded top-k within random sessions."""
+    hits = 0
+    trials = 0
+    for start in range(0, len(reference) - session_size + 1, session_size):
+        session = reference[start:start + session_size]
+        stored, scales = codec.encode(session)
+        for query_index in rng.choice(session_size, size=10, replace=False):
+            query = session[query_index] + rng.standard_normal(session.shape[1]) * 0.02
+            exact = set(np.argsort(-(session @ normalize(query)))[:k])
+            approx = set(np.argsort(-codec.scores(stored, codec.prepare(query), scales))[:k])
+            hits += len(exact & approx)
+            trials += k
+    return hits / trials
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compact vector encodings")
+    parser.add_argument("--corpus", help="Text file with one message per line (default: synthetic vectors)")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--synthetic-count", type=int, default=20000)
+    parser.add_argument("--session-size", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pca-dims", type=int, nargs="*", default=[192, 128, 64])
+    parser.add_argument("--save-pca", help="Write a fitted projection (.npz) for VECTOR_PCA_PATH")
+    parser.add_argument("--pca-dim", type=int, default=128, help="Components for --save-pca")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    vectors = load_corpus(args.corpus, args.model) if args.corpus else synthetic_corpus(args.synthetic_count, 384, rng)
+    reference = normalize(vectors)
+    dim = reference.shape[1]
+    # Fit on one half and evaluate on the other so PCA is not scored on its training data
+    fit_half, eval_half = reference[: len(reference) // 2], reference[len(reference) // 2:]
+
+    configs = [("float32", None), ("float16", None), ("int8", None)]
+    for pca_dim in args.pca_dims:
+        projection = PCAProjection.fit(fit_half, pca_dim)
+        configs += [("float32", projection), ("int8", projection)]
+
+    print(f"{len(reference)} vectors, dim {dim}, sessions of {args.session_size}, recall@{args.top_k}")
+    print(f"{'encoding':<16}{'bytes/vec':>10}{'MB per 1M':>11}{'recall':>9}")
+    for dtype, projection in configs:
+        codec = VectorCodec(dtype=dtype, projection=projection)
+        label = dtype if projection is None else f"pca{projection.output_dim}+{dtype}"
+        size = codec.bytes_per_vector(dim)
+        recall = recall_at_k(eval_half, codec, args.session_size, args.top_k, rng)
+        print(f"{label:<16}{size:>10}{size * 1e6 / 2**20:>11.0f}{recall:>9.3f}")
+
+    if args.save_pca:
+        PCAProjection.fit(reference, args.pca_dim).save(args.save_pca)
+        print(f"Saved {args.pca_dim}-component projection to {args.save_pca}")
+
+if __name__ == "__main__":
+    main()
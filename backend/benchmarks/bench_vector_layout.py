@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-session vs shared ChromaDB layouts.
+
+For each session count, fills a fresh Chroma directory with synthetic message
+vectors in both layouts and reports ingest time, cold startup time (new
+process, open client, first query), disk footprint and query latency.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_layout.py --sessions 10000 100000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.vector_layout import (  # noqa: E402
+    LAYOUT_PER_SESSION,
+    LAYOUT_SHARED,
+    collection_name_for,
+)
+
+DIM = 384
+
+STARTUP_SNIPPET = """
+import sys, time, numpy as np, chromadb
+from chromadb.config import Settings
+started = time.perf_counter()
+client = chromadb.PersistentClient(path=sys.argv[1], settings=Settings(anonymized_telemetry=False))
+collection = client.get_collection(sys.argv[2])
+where = {"session_id": sys.argv[3]} if sys.argv[4] == "shared" else None
+collection.query(query_embeddings=np.ones((1, %d), dtype=np.float32), n_results=5, where=where)
+print(time.perf_counter() - started)
+""" % DIM
+
+def random_vectors(rng: np.random.Generator, count: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def populate(client, layout: str, shards: int, session_ids, messages_per_session: int, rng) -> float:
+    started = time.perf_counter()
+    handles = {}
+    for session_id in session_ids:
+        name = collection_name_for(session_id, layout, shards)
+        if name not in handles:
+            handles[name] = client.get_or_create_collection(name=name, metadata={"layout": layout})
+        ids = [f"user_{uuid.uuid4()}" for _ in range(messages_per_session)]
+        handles[name].add(
+            ids=ids,
+            embeddings=random_vectors(rng, messages_per_session),
+            documents=[f"message {i}" for i in range(messages_per_session)],
+            metadatas=[{"session_id": session_id, "message_id": i, "message_type": "user"} for i in ids]
+        )
+        if layout == LAYOUT_PER_SESSION:
+            # Mirror the service: per-session handles are not all kept resident
+            handles.pop(name)
+    return time.perf_counter() - started
+
+def query_latencies(client, layout: str, shards: int, session_ids, queries: int, rng) -> np.ndarray:
+    samples = []
+    for session_id in rng.choice(session_ids, size=queries):
+        collection = client.get_collection(collection_name_for(session_id, layout, shards))
+        where = {"session_id": session_id} if layout == LAYOUT_SHARED else None
+        started = time.perf_counter()
+        collection.query(query_embeddings=random_vectors(rng, 1), n_results=5, where=where)
+        samples.append(time.perf_counter() - started)
+    return np.array(samples) * 1000
+
+def cold_startup(path: str, layout: str, shards: int, session_id: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SNIPPET, path, collection_name_for(session_id, layout, shards), session_id, layout],
+        capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+def run(sessions: int, messages_per_session: int, shards: int, queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    print(f"\n== {sessions} sessions x {messages_per_session} messages ==")
+    print(f"{'layout':<12}{'ingest s':>10}{'startup s':>11}{'disk MB':>10}{'p50 ms':>9}{'p99 ms':>9}")
+
+    for layout in (LAYOUT_PER_SESSION, LAYOUT_SHARED):
+        path = tempfile.mkdtemp(prefix=f"bench_{layout}_")
+        try:
+            client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+            ingest = populate(client, layout, shards, session_ids, messages_per_session, rng)
+            latencies = query_latencies(client, layout, shards, session_ids, queries, rng)
+            startup = cold_startup(path, layout, shards, session_ids[0])
+            size_mb = disk_usage(path) / (1024 * 1024)
+            print(f"{layout:<12}{ingest:>10.1f}{startup:>11.2f}{size_mb:>10.1f}"
+                  f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session and shared Chroma layouts")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--messages-per-session", type=int, default=20)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for sessions in args.sessions:
+        run(sessions, args.messages_per_session, args.shards, args.queries, args.seed)
+
+if __name__ == "__main__":
+    main()
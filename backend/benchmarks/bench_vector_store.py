@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark retrieval latency of the Chroma and NumPy vector store backends.
+
+Fills one store per backend with synthetic sessions of a typical size and
+reports per-query latency percentiles for top-k retrieval.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_store.py --messages-per-session 50 300 1000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.chroma_vector_store import ChromaVectorStore  # noqa: E402
+from app.services.numpy_vector_store import NumpyVectorStore  # noqa: E402
+
+DIM = 384
+
+def build_store(backend: str, path: str):
+    if backend == "numpy":
+        return NumpyVectorStore(path, dim=DIM)
+    return ChromaVectorStore(path, layout="per_session")
+
+def run(backend: str, sessions: int, messages: int, queries: int, top_k: int, rng) -> np.ndarray:
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        store = build_store(backend, path)
+        session_ids = [f"session-{i}" for i in range(sessions)]
+        for session_id in session_ids:
+            vectors = rng.standard_normal((messages, DIM)).astype(np.float32)
+            store.add(
+                session_id,
+                ids=[f"user_{session_id}_{i}" for i in range(messages)],
+                embeddings=vectors,
+                documents=[f"message {i}" for i in range(messages)],
+                metadatas=[{"message_id": str(i), "message_type": "user", "session_id": session_id} for i in range(messages)]
+            )
+
+        samples = []
+        for session_id in rng.choice(session_ids, size=queries):
+            query = rng.standard_normal(DIM).astype(np.float32)
+            started = time.perf_counter()
+            store.query(session_id, query, top_k)
+            samples.append(time.perf_counter() - started)
+        store.close()
+        return np.array(samples) * 1000
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector store retrieval latency")
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages-per-session", type=int, nargs="+", default=[50, 300, 1000])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    print(f"{'backend':<10}{'messages':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for messages in args.messages_per_session:
+        for backend in args.backends:
+            latencies = run(backend, args.sessions, messages, args.queries, args.top_k, rng)
+            print(f"{backend:<10}{messages:>10}{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 99):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Migrate ChromaDB data from per-session collections to the shared layout.
+
+Copies every ``session_*`` collection into ``messages_shard_*`` collections,
+keeping ids, documents, metadata and embeddings unchanged, so no re-encoding
+is needed. Each session's copy is verified against the source count, and
+source collections are only removed with ``--delete-source`` once verified.
+
+Usage (from backend/):
+    python scripts/migrate_vector_layout.py --path ./chroma_data --shards 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import chromadb
+from chromadb.config import Settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.chroma_vector_store import COLLECTION_SPACE  # noqa: E402
+from app.services.vector_layout import (  # noqa: E402
+    LAYOUT_SHARED,
+    SESSION_COLLECTION_PREFIX,
+    shard_for_session,
+    shared_collection_name,
+)
+
+def migrate(path: str, shards: int, batch_size: int, delete_source: bool, dry_run: bool) -> dict:
+    """Copy per-session collections into shared shards and return counters."""
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    names = [getattr(c, "name", c) for c in client.list_collections()]
+    session_names = [name for name in names if name.startswith(SESSION_COLLECTION_PREFIX)]
+    print(f"Found {len(session_names)} per-session collections in {path}")
+
+    shard_handles = {}
+    unverified = []
+    migrated_sessions = 0
+    migrated_vectors = 0
+    started = time.perf_counter()
+
+    for index, name in enumerate(session_names, start=1):
+        source = client.get_collection(name)
+        session_id = (source.metadata or {}).get("session_id")
+        if not session_id:
+            print(f"  skipping {name}: no session_id in collection metadata")
+            continue
+
+        target_name = shared_collection_name(session_id, shards)
+        if not dry_run and target_name not in shard_handles:
+            shard_handles[target_name] = client.get_or_create_collection(
+                name=target_name,
+                metadata={"layout": LAYOUT_SHARED, "shard": shard_for_session(session_id, shards), **COLLECTION_SPACE}
+            )
+
+        total = source.count()
+        for offset in range(0, total, batch_size):
+            rows = source.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            metadatas = [dict(m or {}, session_id=session_id) for m in rows["metadatas"]]
+            if not dry_run:
+                # upsert keeps the migration safe to re-run after an interruption
+                shard_handles[target_name].upsert(
+                    ids=rows["ids"],
+                    embeddings=rows["embeddings"],
+                    documents=rows["documents"],
+                    metadatas=metadatas
+                )
+            migrated_vectors += len(rows["ids"])
+
+        if not dry_run:
+            copied = len(shard_handles[target_name].get(where={"session_id": session_id}, include=[])["ids"])
+            if copied < total:
+                print(f"  {name}: only {copied} of {total} vectors found in {target_name}, keeping source")
+                unverified.append(session_id)
+                continue
+            if delete_source:
+                client.delete_collection(name)
+        migrated_sessions += 1
+
+        if index % 500 == 0:
+            print(f"  {index}/{len(session_names)} collections, {migrated_vectors} vectors")
+
+    elapsed = time.perf_counter() - started
+    print(f"Migrated {migrated_sessions} sessions ({migrated_vectors} vectors) into {shards} shard(s) in {elapsed:.1f}s")
+    if unverified:
+        print(f"{len(unverified)} session(s) failed verification; re-run to retry them")
+    return {"sessions": migrated_sessions, "vectors": migrated_vectors, "unverified": unverified, "seconds": elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-session Chroma collections to the shared layout")
+    parser.add_argument("--path", default="./chroma_data", help="ChromaDB persistent data directory")
+    parser.add_argument("--shards", type=int, default=1, help="Number of shared collections (VECTOR_SHARED_SHARDS)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Vectors copied per request")
+    parser.add_argument("--delete-source", action="store_true", help="Delete per-session collections after copying")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be migrated without writing")
+    args = parser.parse_args()
+
+    migrate(args.path, args.shards, args.batch_size, args.delete_source, args.dry_run)
+    print("Set VECTOR_LAYOUT=shared and VECTOR_SHARED_SHARDS to match before restarting the API.")
+
+if __name__ == "__main__":
+    main()
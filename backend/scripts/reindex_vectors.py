@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Rebuild the vector store from the SQL message table.
+
+Streams messages in keyset-paginated chunks (ordered by message_id), encodes
+them in large batches across a process pool and bulk-loads the vector store
+selected by the current settings (VECTOR_BACKEND, VECTOR_LAYOUT, VECTOR_DTYPE,
+...). Progress is checkpointed after every written chunk, so an interrupted
+run continues where it stopped with --resume; vectors of the chunk that may
+have been written just before the interruption are skipped rather than
+appended twice. A fresh run refuses a non-empty --target-path.
+
+Use it after changing the embedding model or vector layout, or to recover
+from corrupted vector data. Build into a fresh --target-path and point the
+service at it once the run completes.
+
+Usage (from backend/):
+    python scripts/reindex_vectors.py --target-path ./chroma_data_new --workers 8
+    python scripts/reindex_vectors.py --target-path ./chroma_data_new --resume
+"""
+import argparse
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.config import settings  # noqa: E402
+from app.database.connection import get_database  # noqa: E402
+from app.database.models import Message  # noqa: E402
+from app.services.embedding_service import EMBEDDING_MODEL_NAME, create_vector_store  # noqa: E402
+
+_worker_model = None
+
+def _init_worker(backend: str, onnx_int8_file: str):
+    """Load one model per worker process; one intra-op thread avoids oversubscription."""
+    global _worker_model
+    import torch
+    from app.services.embedding_backends import load_embedding_model
+
+    torch.set_num_threads(1)
+    _worker_model = load_embedding_model(EMBEDDING_MODEL_NAME, backend=backend, onnx_int8_file=onnx_int8_file)
+
+def _encode_chunk(texts):
+    return _worker_model.encode(texts, batch_size=128, convert_to_numpy=True)
+
+def stream_messages(chunk_size: int, after_id: str = ""):
+    """Yield chunks of (message_id, session_id, content, message_type) rows by keyset pagination."""
+    last_id = after_id
+    while True:
+        db = next(get_database())
+        try:
+            rows = db.query(
+                Message.message_id, Message.session_id, Message.content, Message.message_type
+            ).filter(
+                Message.message_id > last_id
+            ).order_by(Message.message_id).limit(chunk_size).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+def count_messages(after_id: str = "") -> int:
+    db = next(get_database())
+    try:
+        return db.query(Message).filter(Message.message_id > after_id).count()
+    finally:
+        db.close()
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"last_message_id": "", "indexed": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def write_chunk(store, rows, embeddings: np.ndarray, skip_existing: bool = False):
+    """Bulk-load one encoded chunk with one write per collection/session.
+
+    With ``skip_existing``, records whose ids the target already holds are left out.
+    """
+    grouped = defaultdict(list)
+    for (message_id, session_id, content, message_type), embedding in zip(rows, embeddings):
+        grouped[store.write_key(session_id)].append({
+            "session_id": session_id,
+            "id": f"{message_type}_{message_id}",  # same id scheme as add_message_embedding
+            "embedding": embedding,
+            "document": content,
+            "metadata": {
+                "message_id": message_id,
+                "message_type": message_type,
+                "session_id": session_id
+            }
+        })
+    for records in grouped.values():
+        if skip_existing:
+            by_session = defaultdict(list)
+            for record in records:
+                by_session[record["session_id"]].append(record["id"])
+            existing = set()
+            for session_id, ids in by_session.items():
+                existing |= store.existing_ids(session_id, ids)
+            records = [record for record in records if record["id"] not in existing]
+            if not records:
+                continue
+        store.add_records(records)
+
+def reindex(target_path: str, chunk_size: int, workers: int, checkpoint_path: str, resume: bool):
+    checkpoint = load_checkpoint(checkpoint_path) if resume else {"last_message_id": "", "indexed": 0}
+    total = checkpoint["indexed"] + count_messages(checkpoint["last_message_id"])
+    print(f"Reindexing {total} messages into {settings.vector_backend} store at {target_path}")
+    if resume:
+        print(f"Resuming after {checkpoint['indexed']} already indexed messages")
+
+    store = None
+    started = time.perf_counter()
+    indexed_at_start = checkpoint["indexed"]
+    pending = deque()
+    # Only the chunk after the checkpoint can already be (partly) in the target
+    skip_existing = resume
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(settings.embedding_backend, settings.embedding_onnx_int8_file)
+    ) as pool:
+        chunks = stream_messages(chunk_size, checkpoint["last_message_id"])
+
+        def drain_one():
+            nonlocal store, skip_existing
+            rows, future = pending.popleft()
+            embeddings = future.result()
+            if store is None:
+                store = create_vector_store(embeddings.shape[1], data_path=target_path)
+            write_chunk(store, rows, embeddings, skip_existing=skip_existing)
+            skip_existing = False
+            # Chunks are written in order, so the checkpoint only ever moves forward
+            checkpoint["last_message_id"] = rows[-1][0]
+            checkpoint["indexed"] += len(rows)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            rate = (checkpoint["indexed"] - indexed_at_start) / elapsed if elapsed else 0.0
+            remaining = (total - checkpoint["indexed"]) / rate if rate else float("inf")
+            print(f"  {checkpoint['indexed']}/{total} messages  {rate:,.0f} msg/s  eta {remaining:,.0f}s", flush=True)
+
+        for rows in chunks:
+            pending.append((rows, pool.submit(_encode_chunk, [row[2] for row in rows])))
+            # Keep every worker busy without buffering the whole table in memory
+            while len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    if store is not None:
+        store.close()
+    elapsed = time.perf_counter() - started
+    print(f"Done: {checkpoint['indexed']} messages indexed in {elapsed:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild vector collections from the SQL message store")
+    parser.add_argument("--target-path", required=True, help="Vector store directory to build into")
+    parser.add_argument("--chunk-size", type=int, default=2048, help="Messages per database page and encode task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoding processes")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <target-path>/reindex_checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    args = parser.parse_args()
+
+    if not args.resume and os.path.isdir(args.target_path) and os.listdir(args.target_path):
+        # Appending into existing vectors would duplicate them
+        parser.error(f"{args.target_path} is not empty; use --resume to continue a run, or a new directory")
+    os.makedirs(args.target_path, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(args.target_path, "reindex_checkpoint.json")
+    reindex(args.target_path, args.chunk_size, args.workers, checkpoint_path, args.resume)
+
+if __name__ == "__main__":
+    main()
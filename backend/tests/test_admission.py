@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, AdmissionRejected
+
+async def hold_slot(controller, release: asyncio.Event):
+    async with controller.admit():
+        await release.wait()
+
+@pytest.mark.asyncio
+async def test_in_flight_calls_are_capped():
+    controller = AdmissionController(max_in_flight=2, max_queue=4, queue_timeout_seconds=1.0)
+    release = asyncio.Event()
+    holders = [asyncio.create_task(hold_slot(controller, release)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    stats = controller.stats()
+    assert stats["in_flight"] == 2
+    assert stats["queued"] == 1
+
+    release.set()
+    await asyncio.gather(*holders)
+    assert controller.stats()["admitted"] == 3
+    assert controller.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout_seconds=1.0)
+    release = asyncio.Event()
+    holders = [asyncio.create_task(hold_slot(controller, release)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        async with controller.admit():
+            pass
+    assert excinfo.value.reason == "queue_full"
+    assert excinfo.value.retry_after >= 1
+
+    release.set()
+    await asyncio.gather(*holders)
+
+@pytest.mark.asyncio
+async def test_waiting_past_timeout_is_rejected_and_frees_the_queue():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_seconds=0.05)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold_slot(controller, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        async with controller.admit():
+            pass
+    assert excinfo.value.reason == "deadline"
+    assert controller.stats()["queued"] == 0
+    assert controller.stats()["rejected"]["deadline"] == 1
+
+    release.set()
+    await holder
+
+@pytest.mark.asyncio
+async def test_predicted_wait_beyond_deadline_is_shed_without_queueing():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_seconds=0.5)
+    controller._service_time = 2.0  # calls have been taking ~2s
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold_slot(controller, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.check()
+    assert excinfo.value.reason == "deadline"
+    assert excinfo.value.retry_after == 2
+
+    release.set()
+    await holder
+
+@pytest.mark.asyncio
+async def test_timeouts_racing_a_release_do_not_leak_slots():
+    """A wait that times out just as a slot frees up must not keep the slot"""
+    controller = AdmissionController(max_in_flight=2, max_queue=64, queue_timeout_seconds=0.005)
+
+    async def churn():
+        try:
+            async with controller.admit():
+                await asyncio.sleep(0.005)
+        except AdmissionRejected:
+            pass
+
+    for _ in range(20):
+        await asyncio.gather(*(churn() for _ in range(8)))
+
+    release = asyncio.Event()
+    holders = [asyncio.create_task(hold_slot(controller, release)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert controller.stats()["in_flight"] == 2
+    release.set()
+    await asyncio.gather(*holders)
+
+@pytest.mark.asyncio
+async def test_background_calls_take_only_a_free_slot():
+    """try_admit never queues and leaves freed slots to live calls that are waiting"""
+    controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout_seconds=1.0)
+    async with controller.try_admit():
+        assert controller.stats()["in_flight"] == 1
+    assert controller.stats()["in_flight"] == 0
+
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold_slot(controller, release))
+    waiter = asyncio.create_task(hold_slot(controller, release))
+    await asyncio.sleep(0.01)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        async with controller.try_admit():
+            pass
+    assert excinfo.value.reason == "busy"
+    assert controller.stats()["queued"] == 1
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+    assert controller.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_summaries_are_deferred_without_a_free_slot():
+    from types import SimpleNamespace
+    from app.services.llm_service import LLMService
+
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+
+    service = LLMService(api_key="sk-ant-test-key-123456789", admission=AdmissionController(max_in_flight=1),
+                         client=SimpleNamespace(messages=SimpleNamespace(create=create)))
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold_slot(service.admission, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected):
+        await service.summarize("", "User: hello")
+    assert calls == []
+
+    release.set()
+    await holder
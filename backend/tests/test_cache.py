@@ -0,0 +1,37 @@
+import time
+from app.services.cache import LRUCache
+
+def test_least_recently_used_entry_is_evicted():
+    """Touching an entry protects it from eviction"""
+    evicted = []
+    cache = LRUCache(maxsize=2, on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert evicted == ["b"]
+
+def test_idle_entries_expire():
+    """Entries idle longer than the TTL are treated as missing"""
+    evicted = []
+    cache = LRUCache(maxsize=10, ttl_seconds=0.05, on_evict=lambda key, value: evicted.append(key))
+    cache.put("session", "handle")
+    time.sleep(0.1)
+    assert cache.get("session") is None
+    assert evicted == ["session"]
+
+def test_pop_and_stats():
+    """Explicit removal notifies the callback and hit rate is tracked"""
+    evicted = []
+    cache = LRUCache(maxsize=4, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.put("x", 42)
+    cache.get("x")
+    cache.get("missing")
+    assert cache.pop("x") == 42
+    assert evicted == [("x", 42)]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 0
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.services.admission import AdmissionController
+from app.services.cancellation import ClientDisconnected, run_until_disconnected
+from app.services.llm_service import LLMService
+
+class Connection:
+    """Disconnect probe a test can flip"""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+@pytest.mark.asyncio
+async def test_result_is_returned_while_client_stays_connected():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "reply"
+
+    assert await run_until_disconnected(work(), Connection().is_disconnected, poll_interval=0.01) == "reply"
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_remaining_work():
+    connection = Connection()
+    stages = []
+
+    async def pipeline():
+        stages.append("generate")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stages.append("cancelled")
+            raise
+        stages.append("finalize")
+
+    async def disconnect_soon():
+        await asyncio.sleep(0.03)
+        connection.disconnected = True
+
+    asyncio.ensure_future(disconnect_soon())
+    with pytest.raises(ClientDisconnected):
+        await run_until_disconnected(pipeline(), connection.is_disconnected, poll_interval=0.01)
+    assert stages == ["generate", "cancelled"]
+
+@pytest.mark.asyncio
+async def test_cancelled_llm_call_is_counted_and_frees_its_slot():
+    service = LLMService(api_key="sk-ant-test-key-123456789", admission=AdmissionController(max_in_flight=1))
+    started = asyncio.Event()
+
+    async def slow_create(**kwargs):
+        started.set()
+        await asyncio.sleep(10)
+
+    service.client = SimpleNamespace(messages=SimpleNamespace(create=slow_create))
+    task = asyncio.ensure_future(service.generate_response("hello"))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert service.stats()["cancelled_calls"] == 1
+    assert service.admission.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_closing_stream_early_closes_upstream_stream():
+    closed = []
+
+    class Stream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            closed.append(True)
+
+        @property
+        async def text_stream(self):
+            for chunk in ["one ", "two ", "three"]:
+                yield chunk
+
+    service = LLMService(api_key="sk-ant-test-key-123456789")
+    service.client = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kwargs: Stream()))
+    tokens = service.stream_response("hello")
+    assert await tokens.__anext__() == "one "
+    await tokens.aclose()
+
+    assert closed == [True]
+    assert service.stats()["cancelled_calls"] == 1
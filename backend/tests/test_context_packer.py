@@ -0,0 +1,52 @@
+from app.services.context_packer import ContextPacker, estimate_tokens, truncate_to_tokens
+
+def turn(message_id, kind, content):
+    return {"message_id": message_id, "type": kind, "content": content, "timestamp": None}
+
+def memory(message_id, kind, content, rank=1):
+    return {"message_id": message_id, "message_type": kind, "content": content, "similarity_score": 0.8, "rank": rank}
+
+RECENT = [
+    turn("m1", "user", "Work has been overwhelming this week."),
+    turn("m2", "therapist", "What part of work feels heaviest right now?"),
+    turn("m3", "user", "The presentation on Friday."),
+    turn("m4", "therapist", "What thoughts come up when you picture Friday?"),
+    turn("m5", "user", "I keep thinking everyone will judge me."),
+]
+
+def test_truncate_respects_token_limit():
+    text = "word " * 200
+    cut = truncate_to_tokens(text, 20)
+    assert cut.endswith("...")
+    assert estimate_tokens(cut) <= 20
+    assert truncate_to_tokens("short text", 20) == "short text"
+
+def test_recent_turns_become_history_ending_before_current_message():
+    packer = ContextPacker(token_budget=1000, recent_turns=6)
+    packed = packer.pack(RECENT, [], exclude_message_ids=["m5"])
+    assert [m["role"] for m in packed["history"]] == ["user", "assistant", "user", "assistant"]
+    assert packed["history"][-1]["content"] == "What thoughts come up when you picture Friday?"
+
+def test_retrieved_items_overlapping_recent_turns_are_dropped():
+    packer = ContextPacker(token_budget=1000, recent_turns=6)
+    retrieved = [
+        memory("m3", "user", "The presentation on Friday.", rank=1),
+        memory("old9", "user", "the presentation  on FRIDAY.", rank=2),
+        memory("old2", "user", "Last month breathing exercises helped before meetings.", rank=3),
+    ]
+    packed = packer.pack(RECENT, retrieved, exclude_message_ids=["m5"])
+    assert [item["message_id"] for item in packed["memories"]] == ["old2"]
+
+def test_context_stays_within_budget_however_long_the_session():
+    long_session = [turn(f"m{i}", "user" if i % 2 == 0 else "therapist", "I have been thinking about this a lot. " * 40)
+                    for i in range(200)]
+    retrieved = [memory(f"r{i}", "user", "An older reflection about sleep and stress. " * 30, rank=i) for i in range(5)]
+    packer = ContextPacker(token_budget=400, recent_turns=6, max_item_tokens=150)
+    packed = packer.pack(long_session, retrieved)
+
+    used = sum(estimate_tokens(m["content"]) for m in packed["history"])
+    used += sum(estimate_tokens(item["content"]) for item in packed["memories"])
+    assert used <= 400
+    assert packed["tokens"] <= 400
+    assert packed["history"][-1]["role"] == "assistant"
+    assert packed["dropped"] > 0
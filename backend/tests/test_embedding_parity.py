@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from app.services.embedding_backends import (
+    BACKEND_ONNX,
+    BACKEND_ONNX_INT8,
+    BACKEND_TORCH,
+    BACKEND_TORCH_INT8,
+    load_embedding_model,
+)
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Representative chat turns: short check-ins, disclosures and therapist replies
+PARITY_CORPUS = [
+    "I've been feeling really anxious about my upcoming presentation at work.",
+    "thanks, that helped",
+    "I can't sleep because I keep replaying the argument with my sister.",
+    "Every time I open my inbox my chest gets tight.",
+    "I went for a walk like you suggested and it was a bit better.",
+    "My manager said my work was fine but I'm sure she was just being polite.",
+    "I feel like I'm a burden to my friends.",
+    "What if I fail the exam and everyone finds out?",
+    "It sounds like you're predicting the worst outcome. What evidence do you have for and against that thought?",
+    "Let's try breaking the task into smaller steps you can start today.",
+    "I've been journaling every evening this week.",
+    "Sometimes I just feel empty and don't know why.",
+    "I got angry at my partner over something small and now I feel guilty.",
+    "Can we talk about the breathing exercise again?",
+    "ok",
+    "I noticed I was catastrophizing again before the meeting, but I caught it.",
+]
+
+def load_or_skip(backend: str):
+    try:
+        return load_embedding_model(MODEL_NAME, backend)
+    except OSError as e:
+        pytest.skip(f"{MODEL_NAME} weights not available: {e}")
+
+@pytest.fixture(scope="module")
+def reference_embeddings():
+    model = load_or_skip(BACKEND_TORCH)
+    return model.encode(PARITY_CORPUS, normalize_embeddings=True)
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return np.sum(reference * candidate, axis=1)
+
+def nearest_neighbours(embeddings: np.ndarray) -> np.ndarray:
+    similarities = embeddings @ embeddings.T
+    np.fill_diagonal(similarities, -np.inf)
+    return np.argmax(similarities, axis=1)
+
+@pytest.mark.parametrize("backend,min_cosine", [
+    (BACKEND_TORCH_INT8, 0.97),
+    (BACKEND_ONNX, 0.999),
+    (BACKEND_ONNX_INT8, 0.97),
+])
+def test_backend_matches_fp32_reference(backend, min_cosine, reference_embeddings):
+    """Alternative backends agree with the fp32 model closely enough for retrieval"""
+    if backend in (BACKEND_ONNX, BACKEND_ONNX_INT8):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("optimum")
+
+    model = load_or_skip(backend)
+    candidate = np.asarray(model.encode(PARITY_CORPUS), dtype=np.float32)
+
+    agreement = cosine_agreement(reference_embeddings, candidate)
+    assert agreement.min() >= min_cosine
+    assert agreement.mean() >= 0.99
+
+    # Retrieval ranking is what matters downstream: nearest neighbours should be stable
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    matches = nearest_neighbours(reference_embeddings) == nearest_neighbours(candidate)
+    assert matches.mean() >= 0.9
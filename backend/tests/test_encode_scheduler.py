@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from app.services.encode_scheduler import EncodeScheduler, PRIORITY_QUERY, PRIORITY_STORAGE
+from app.services.executor import BoundedPool
+
+class FakeModel:
+    """Records every batch it is asked to encode"""
+
+    def __init__(self):
+        self.batches = []
+        self.threads = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def encode(self, texts):
+        self.started.set()
+        self.gate.wait()
+        self.batches.append(list(texts))
+        self.threads.append(threading.current_thread().name)
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+def test_concurrent_requests_share_one_batch():
+    """Requests arriving within the wait window are encoded together"""
+    model = FakeModel()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [scheduler.submit(f"message {i}") for i in range(5)]
+        vectors = [future.result(timeout=2) for future in futures]
+        assert len(model.batches) == 1
+        assert vectors[0][0] == len("message 0")
+    finally:
+        scheduler.close()
+
+def test_batches_respect_max_batch_size():
+    """A burst larger than the batch size is split into several calls"""
+    model = FakeModel()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=4, max_wait_ms=20)
+    try:
+        result = scheduler.encode([f"text {i}" for i in range(10)])
+        assert result.shape == (10, 2)
+        assert all(len(batch) <= 4 for batch in model.batches)
+    finally:
+        scheduler.close()
+
+def test_query_requests_are_served_first():
+    """Queued query embeddings are dequeued ahead of storage embeddings"""
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=2, max_wait_ms=1)
+    try:
+        blocker = scheduler.submit("blocker")
+        # Wait until the first batch is being encoded so the rest queue up
+        assert model.started.wait(timeout=2)
+        storage = [scheduler.submit(f"store {i}", PRIORITY_STORAGE) for i in range(2)]
+        query = scheduler.submit("query", PRIORITY_QUERY)
+        model.gate.set()
+        for future in [blocker, query] + storage:
+            future.result(timeout=2)
+        assert model.batches[1][0] == "query"
+    finally:
+        scheduler.close()
+
+@pytest.mark.asyncio
+async def test_awaiting_callers_fill_one_batch():
+    """Many coroutines awaiting encode_async share a batch without a thread each"""
+    model = FakeModel()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=32, max_wait_ms=50)
+    try:
+        results = await asyncio.gather(*(scheduler.encode_async([f"turn {i}"]) for i in range(20)))
+        assert len(model.batches) == 1
+        assert len(model.batches[0]) == 20
+        assert results[3].shape == (1, 2)
+    finally:
+        scheduler.close()
+
+@pytest.mark.asyncio
+async def test_cancelled_awaiter_does_not_stop_the_scheduler():
+    """A caller that goes away mid-encode leaves the batching thread running"""
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=4, max_wait_ms=1)
+    try:
+        blocker = scheduler.submit("blocker")
+        assert model.started.wait(timeout=2)
+        abandoned = asyncio.ensure_future(scheduler.encode_async(["abandoned"]))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        model.gate.set()
+        blocker.result(timeout=2)
+
+        result = await asyncio.wait_for(scheduler.encode_async(["next turn"]), timeout=2)
+        assert result.shape == (1, 2)
+        assert ["abandoned"] not in model.batches
+    finally:
+        scheduler.close()
+
+def test_lone_query_does_not_wait_for_the_window():
+    """A query with nothing else queued is encoded straight away"""
+    model = FakeModel()
+    scheduler = EncodeScheduler(model.encode, max_batch_size=8, max_wait_ms=2000)
+    try:
+        started = time.monotonic()
+        scheduler.submit("query", PRIORITY_QUERY).result(timeout=5)
+        assert time.monotonic() - started < 1.0
+    finally:
+        scheduler.close()
+
+def test_batches_run_on_the_encode_pool():
+    """With a pool, model calls run on its workers, at most max_workers batches at once"""
+    model = FakeModel()
+    model.gate.clear()
+    pool = BoundedPool("encode", max_workers=2, queue_depth=4)
+    scheduler = EncodeScheduler(model.encode, max_batch_size=2, max_wait_ms=1, pool=pool)
+    try:
+        futures = [scheduler.submit(f"text {i}") for i in range(8)]
+        assert model.started.wait(timeout=2)
+        time.sleep(0.05)
+        assert pool.stats()["in_flight"] == 2
+        model.gate.set()
+        for future in futures:
+            future.result(timeout=2)
+        assert all(name.startswith("encode-pool") for name in model.threads)
+        # Requests queued while both workers were busy were batched together
+        assert len(model.batches) < 8
+    finally:
+        scheduler.close()
+        pool.shutdown()
+    assert pool.stats()["in_flight"] == 0
+
+def test_encode_errors_propagate_to_callers():
+    """A failing model call fails every future in the batch"""
+    def broken(texts):
+        raise ValueError("model unavailable")
+
+    scheduler = EncodeScheduler(broken, max_batch_size=4, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            scheduler.encode(["hello"])
+    finally:
+        scheduler.close()
+
+def test_submit_after_close_is_rejected():
+    scheduler = EncodeScheduler(FakeModel().encode)
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("late")
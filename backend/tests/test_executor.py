@@ -0,0 +1,56 @@
+import asyncio
+import time
+import pytest
+from app.services.executor import ExecutionPools
+
+@pytest.mark.asyncio
+async def test_blocking_work_does_not_stall_event_loop():
+    """Blocking calls run on the pool while the loop keeps serving other tasks"""
+    pools = ExecutionPools(encode_workers=1, io_workers=1, queue_depth=4)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    try:
+        result, _ = await asyncio.gather(pools.run_io(time.sleep, 0.1), ticker())
+        assert result is None
+        assert ticks == 5
+    finally:
+        pools.shutdown()
+
+@pytest.mark.asyncio
+async def test_queue_depth_bounds_in_flight_work():
+    """No more than workers + queue_depth jobs are admitted at once"""
+    pools = ExecutionPools(encode_workers=1, io_workers=1, queue_depth=1)
+    peak = 0
+
+    def job():
+        nonlocal peak
+        peak = max(peak, pools.encode.stats()["in_flight"])
+        time.sleep(0.01)
+
+    try:
+        await asyncio.gather(*(pools.run_encode(job) for _ in range(6)))
+        assert peak <= 2
+        assert pools.stats()["encode"]["in_flight"] == 0
+    finally:
+        pools.shutdown()
+
+@pytest.mark.asyncio
+async def test_coroutine_functions_are_awaited_on_the_loop():
+    """An async session store is awaited directly instead of taking an I/O worker"""
+    pools = ExecutionPools(encode_workers=1, io_workers=1, queue_depth=1)
+
+    async def fetch(session_id, limit=10):
+        await asyncio.sleep(0)
+        return [session_id] * limit
+
+    try:
+        assert await pools.run_io(fetch, "s1", limit=2) == ["s1", "s1"]
+        assert pools.stats()["io"]["in_flight"] == 0
+    finally:
+        pools.shutdown()
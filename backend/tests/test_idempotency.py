@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from app.services.idempotency import IdempotencyGuard, request_key, OUTCOME_CACHED, OUTCOME_FRESH, OUTCOME_JOINED
+
+class CountingPipeline:
+    """Stands in for generate_rag_response and counts upstream work"""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return {"response": f"reply {self.calls}"}
+
+def test_request_keys():
+    assert request_key(None, "hi") is None  # new sessions are only deduplicated with an explicit key
+    assert request_key("s1", "I feel  anxious") == request_key("s1", "i feel anxious")
+    assert request_key("s1", "hi") != request_key("s2", "hi")
+    assert request_key(None, "hi", "key-1") != request_key(None, "different payload", "key-1")
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_computation():
+    guard, pipeline = IdempotencyGuard(), CountingPipeline()
+    results = await asyncio.gather(*[guard.run("k", pipeline, ttl_seconds=10) for _ in range(5)])
+    assert pipeline.calls == 1
+    assert {result["response"] for result, _ in results} == {"reply 1"}
+    assert sorted(outcome for _, outcome in results) == [OUTCOME_FRESH] + [OUTCOME_JOINED] * 4
+
+@pytest.mark.asyncio
+async def test_completed_result_is_replayed_until_ttl_expires():
+    guard, pipeline = IdempotencyGuard(), CountingPipeline(delay=0)
+    await guard.run("k", pipeline, ttl_seconds=0.05)
+    assert (await guard.run("k", pipeline, ttl_seconds=0.05))[1] == OUTCOME_CACHED
+    await asyncio.sleep(0.06)
+    assert (await guard.run("k", pipeline, ttl_seconds=0.05))[1] == OUTCOME_FRESH
+    assert pipeline.calls == 2
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_but_not_cached():
+    guard, pipeline = IdempotencyGuard(), CountingPipeline(fail=True)
+    outcomes = await asyncio.gather(guard.run("k", pipeline, 10), guard.run("k", pipeline, 10), return_exceptions=True)
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    pipeline.fail = False
+    assert (await guard.run("k", pipeline, 10))[0] == {"response": "reply 2"}
+
+@pytest.mark.asyncio
+async def test_disconnecting_caller_does_not_cancel_work_a_retry_waits_on():
+    guard, pipeline = IdempotencyGuard(), CountingPipeline(delay=0.1)
+    first = asyncio.ensure_future(guard.run("k", pipeline, 10))
+    await asyncio.sleep(0.01)
+    retry = asyncio.ensure_future(guard.run("k", pipeline, 10))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    result, outcome = await retry
+    assert result == {"response": "reply 1"}
+    assert outcome == OUTCOME_JOINED
+    assert not pipeline.cancelled
+
+@pytest.mark.asyncio
+async def test_last_caller_leaving_cancels_the_work():
+    guard, pipeline = IdempotencyGuard(), CountingPipeline(delay=1)
+    only = asyncio.ensure_future(guard.run("k", pipeline, 10))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+    assert pipeline.cancelled
+    assert guard.stats()["in_flight"] == 0
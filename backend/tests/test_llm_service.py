@@ -0,0 +1,108 @@
+import pytest
+from types import SimpleNamespace
+from app.services.llm_service import LLMService, _usage_fields
+
+class FakeStream:
+    """Stands in for the SDK's async message stream context manager"""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for index, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and index == self.fail_after:
+                raise ConnectionError("stream dropped")
+            yield chunk
+
+    async def get_final_message(self):
+        return SimpleNamespace(
+            usage=SimpleNamespace(input_tokens=12, output_tokens=len(self.chunks)),
+            stop_reason="end_turn"
+        )
+
+def make_service(stream, requests=None):
+    service = LLMService(api_key="sk-ant-test-key-123456789")
+
+    def open_stream(**kwargs):
+        if requests is not None:
+            requests.append(kwargs)
+        return stream
+
+    service.client = SimpleNamespace(messages=SimpleNamespace(stream=open_stream))
+    return service
+
+async def collect(service):
+    return [chunk async for chunk in service.stream_response("I feel anxious")]
+
+@pytest.mark.asyncio
+async def test_stream_response_yields_chunks_in_order():
+    service = make_service(FakeStream(["That ", "sounds ", "hard."]))
+    assert await collect(service) == ["That ", "sounds ", "hard."]
+
+@pytest.mark.asyncio
+async def test_stream_failure_before_first_token_yields_fallback():
+    service = make_service(FakeStream(["unused"], fail_after=0))
+    assert await collect(service) == [service.fallback_response]
+
+@pytest.mark.asyncio
+async def test_stream_failure_mid_response_is_raised():
+    service = make_service(FakeStream(["That ", "sounds "], fail_after=1))
+    with pytest.raises(ConnectionError):
+        await collect(service)
+
+@pytest.mark.asyncio
+async def test_instructions_are_sent_once_as_cached_system_block():
+    requests = []
+    service = make_service(FakeStream(["ok"]), requests)
+    content = [{"type": "text", "text": "PREVIOUS CONVERSATION CONTEXT:\n- User: work stress"},
+               {"type": "text", "text": "CURRENT MESSAGE: I feel anxious"}]
+    assert [chunk async for chunk in service.stream_response(content)] == ["ok"]
+
+    request = requests[0]
+    assert request["system"] == [{
+        "type": "text",
+        "text": service.system_prompt,
+        "cache_control": {"type": "ephemeral"}
+    }]
+    assert request["messages"] == [{"role": "user", "content": content}]
+
+@pytest.mark.asyncio
+async def test_sliding_history_is_sent_without_cache_breakpoint():
+    """The history window changes every turn, so marking it would only write the cache"""
+    requests = []
+    service = make_service(FakeStream(["ok"]), requests)
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello, how are you?"}]
+    [chunk async for chunk in service.stream_response("not great", conversation_history=history)]
+
+    messages = requests[0]["messages"]
+    assert messages[:2] == history
+    assert messages[2] == {"role": "user", "content": "not great"}
+    assert "cache_control" not in str(messages)
+
+def test_usage_fields_report_cache_tokens():
+    usage = SimpleNamespace(input_tokens=40, output_tokens=200, cache_creation_input_tokens=None, cache_read_input_tokens=1100)
+    assert _usage_fields(usage) == {
+        "usage_input_tokens": 40,
+        "usage_output_tokens": 200,
+        "usage_cache_creation_input_tokens": 0,
+        "usage_cache_read_input_tokens": 1100
+    }
+
+@pytest.mark.asyncio
+async def test_policy_overrides_model_and_output_cap():
+    requests = []
+    service = make_service(FakeStream(["ok"]), requests)
+    policy = {"tier": "fast", "model": "fast-model", "max_tokens": 300, "temperature": 0.5}
+    [chunk async for chunk in service.stream_response("thanks", policy=policy)]
+
+    assert requests[0]["model"] == "fast-model"
+    assert requests[0]["max_tokens"] == 300
+    assert requests[0]["temperature"] == 0.5
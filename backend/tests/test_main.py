@@ -77,4 +77,14 @@ def test_respond_endpoint_invalid_json(client):
 def test_cors_headers(client):
     """Test that CORS headers are properly set"""
     response = client.options("/health")
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_respond_stream_crisis_message(client, sample_messages):
+    """Test the streaming endpoint emits the safety response as SSE events"""
+    response = client.post("/respond/stream", json={"message": sample_messages["crisis"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    body = response.text
+    assert "event: token" in body
+    assert "988" in body
+    assert "event: done" in body
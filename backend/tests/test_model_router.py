@@ -0,0 +1,29 @@
+from app.services.model_router import ModelRouter, TIER_FAST, TIER_PREMIUM
+
+def make_router(**kwargs):
+    return ModelRouter(premium_model="premium-model", fast_model="fast-model",
+                       premium_max_tokens=1000, fast_max_tokens=300, **kwargs)
+
+def test_short_check_in_uses_fast_tier():
+    policy = make_router().route(len("thanks, that helped"), session_messages=20, context_used=True)
+    assert policy["tier"] == TIER_FAST
+    assert policy["model"] == "fast-model"
+    assert policy["max_tokens"] == 300
+    assert policy["reason"] == "short_message"
+
+def test_long_disclosure_uses_premium_tier():
+    policy = make_router().route(600, session_messages=0, context_used=False)
+    assert policy["tier"] == TIER_PREMIUM
+    assert policy["model"] == "premium-model"
+    assert policy["max_tokens"] == 1000
+
+def test_deep_session_with_context_uses_premium_over_fast_default():
+    router = make_router(default_tier=TIER_FAST, deep_session_messages=10)
+    assert router.route(200, session_messages=14, context_used=True)["reason"] == "deep_session_with_context"
+    assert router.route(200, session_messages=14, context_used=False)["tier"] == TIER_FAST
+    assert router.route(200, session_messages=2, context_used=True)["tier"] == TIER_FAST
+
+def test_disabled_routing_always_uses_premium():
+    router = make_router(enabled=False)
+    assert router.route(5, session_messages=0, context_used=False)["tier"] == TIER_PREMIUM
+    assert router.stats()["decisions"] == {TIER_PREMIUM: 1, TIER_FAST: 0}
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from app.services.numpy_vector_store import NumpyVectorStore
+
+DIM = 8
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), dim=DIM, cache_size=4)
+    yield store
+    store.close()
+
+def add_messages(store, session_id, vectors):
+    ids = [f"user_{i}" for i in range(len(vectors))]
+    store.add(
+        session_id,
+        ids=ids,
+        embeddings=np.array(vectors, dtype=np.float32),
+        documents=[f"message {i}" for i in range(len(vectors))],
+        metadatas=[{"message_id": str(i), "message_type": "user", "session_id": session_id} for i in range(len(vectors))]
+    )
+
+def test_query_returns_exact_top_k_in_order(store):
+    """Results match a brute-force cosine ranking"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, DIM))
+    add_messages(store, "s1", vectors)
+    query = rng.standard_normal(DIM)
+
+    results = store.query("s1", query, n_results=5)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+    assert [r["id"] for r in results] == [f"user_{i}" for i in expected]
+    assert results[0]["similarity"] >= results[-1]["similarity"]
+
+def test_sessions_are_isolated_and_counted(store):
+    add_messages(store, "s1", np.eye(DIM)[:3])
+    add_messages(store, "s2", np.eye(DIM)[3:4])
+    assert store.count("s1") == 3
+    assert store.count("s2") == 1
+    assert store.count("missing") == 0
+    assert all(r["metadata"]["session_id"] == "s2" for r in store.query("s2", np.ones(DIM), 10))
+
+def test_appends_persist_across_reopen(tmp_path):
+    """Append-only files are reloaded through the memory map"""
+    store = NumpyVectorStore(str(tmp_path), dim=DIM)
+    add_messages(store, "s1", np.eye(DIM)[:2])
+    add_messages(store, "s1", np.eye(DIM)[2:4])
+    store.close()
+
+    reopened = NumpyVectorStore(str(tmp_path), dim=DIM)
+    results = reopened.query("s1", np.eye(DIM)[3], n_results=1)
+    assert reopened.count("s1") == 4
+    assert results[0]["document"] == "message 1"
+    assert results[0]["similarity"] == pytest.approx(1.0)
+
+def test_delete_session_removes_data(store):
+    add_messages(store, "s1", np.eye(DIM)[:2])
+    store.delete_session("s1")
+    assert store.count("s1") == 0
+    assert store.query("s1", np.ones(DIM), 5) == []
+
+def test_existing_ids_reports_only_stored_vectors(store):
+    """Lets a resumed reindex skip vectors written just before an interruption"""
+    add_messages(store, "s1", np.eye(DIM)[:2])
+    assert store.existing_ids("s1", ["user_0", "user_1", "user_9"]) == {"user_0", "user_1"}
+    assert store.existing_ids("missing", ["user_0"]) == set()
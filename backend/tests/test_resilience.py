@@ -0,0 +1,196 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import pytest
+from anthropic import AsyncAnthropic
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.http_transport import create_llm_http_client
+from app.services.llm_service import LLMService
+from app.services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+class FakeAnthropicServer:
+    """Local Messages API stand-in that replays scripted latency and errors.
+
+    Each script entry is ``(status, delay_seconds)``; requests beyond the
+    script succeed immediately.
+    """
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("content-length", 0)))
+                with server.lock:
+                    index = server.requests
+                    server.requests += 1
+                status, delay = server.script[index] if index < len(server.script) else (200, 0.0)
+                time.sleep(delay)
+                if status == 200:
+                    body = {
+                        "id": f"msg_{index}", "type": "message", "role": "assistant", "model": "fake",
+                        "content": [{"type": "text", "text": f"reply {index}"}],
+                        "stop_reason": "end_turn", "stop_sequence": None,
+                        "usage": {"input_tokens": 10, "output_tokens": 2}
+                    }
+                else:
+                    body = {"type": "error", "error": {"type": "overloaded_error", "message": "injected"}}
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up: cancelled hedge or exhausted budget
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(script=()):
+        server = FakeAnthropicServer(script)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+def make_service(server, **caller_kwargs):
+    caller_kwargs.setdefault("base_delay", 0.01)
+    client = AsyncAnthropic(api_key="sk-ant-test-key-123456789", base_url=server.url, max_retries=0)
+    return LLMService(api_key="sk-ant-test-key-123456789", resilience=ResilientCaller(**caller_kwargs), client=client)
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(fake_server):
+    server = fake_server([(529, 0.0), (503, 0.0)])
+    service = make_service(server, max_attempts=3)
+    assert await service.generate_response("hello") == "reply 2"
+    assert server.requests == 3
+    assert service.resilience.stats()["retries"] == 2
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(fake_server):
+    server = fake_server([(400, 0.0)])
+    service = make_service(server, max_attempts=3)
+    assert await service.generate_response("hello") == service.fallback_response
+    assert server.requests == 1
+    assert service.resilience.breaker.stats()["window_failures"] == 0
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_time_budget(fake_server):
+    server = fake_server([(200, 0.5)])
+    service = make_service(server, max_attempts=5, budget_seconds=0.2)
+    started = time.monotonic()
+    assert await service.generate_response("hello") == service.fallback_response
+    assert time.monotonic() - started < 0.45
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_calling_upstream(fake_server):
+    server = fake_server([(500, 0.0), (500, 0.0)])
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, open_seconds=30.0)
+    service = make_service(server, max_attempts=1, breaker=breaker)
+    for _ in range(2):
+        await service.generate_response("hello")
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        await service.generate_response("hello")
+    assert excinfo.value.retry_after >= 1
+    assert server.requests == 2
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_circuit_on_success():
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=1, open_seconds=0.05)
+    breaker.record(success=False)
+    assert breaker.state == "open"
+    await asyncio.sleep(0.06)
+
+    probe = breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record(success=True, probe=probe)
+    assert breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_only_the_probe_outcome_changes_an_open_circuit():
+    """Calls that started before the circuit opened cannot close or re-open it"""
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=1, open_seconds=0.05)
+    straggler = breaker.before_call()
+    breaker.record(success=False)
+    assert breaker.state == "open"
+
+    breaker.record(success=True, probe=straggler)
+    assert breaker.state == "open"
+
+    await asyncio.sleep(0.06)
+    probe = breaker.before_call()
+    breaker.record(success=False)  # another straggler while the probe runs
+    assert breaker.state == "half_open"
+    breaker.abandon()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # the probe still holds the slot
+
+    breaker.record(success=False, probe=probe)
+    assert breaker.state == "open"
+    breaker.record(success=True, probe=probe)  # a token is only good once
+    assert breaker.state == "open"
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_and_fastest_answer_wins(fake_server):
+    server = fake_server([(200, 1.0)])
+    service = make_service(server, hedge=True, hedge_min_delay=0.05, hedge_min_samples=1)
+    service.resilience.latency.record(0.05)
+
+    started = time.monotonic()
+    assert await service.generate_response("hello") == "reply 1"
+    assert time.monotonic() - started < 0.8
+    stats = service.resilience.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+@pytest.mark.asyncio
+async def test_llm_call_only_gets_the_time_the_request_has_left(fake_server):
+    server = fake_server([(200, 1.0)])
+    service = make_service(server, max_attempts=3)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await service.generate_response("hello", deadline=Deadline(0.2))
+    assert time.monotonic() - started < 0.6
+
+@pytest.mark.asyncio
+async def test_expired_deadline_skips_the_upstream_call(fake_server):
+    server = fake_server()
+    service = make_service(server)
+    with pytest.raises(DeadlineExceeded):
+        await service.generate_response("hello", deadline=Deadline(0))
+    assert server.requests == 0
+
+@pytest.mark.asyncio
+async def test_read_timeout_drops_hung_connection_and_retries(fake_server):
+    server = fake_server([(200, 1.0)])
+    http_client = create_llm_http_client(read_timeout=0.2)
+    client = AsyncAnthropic(api_key="sk-ant-test-key-123456789", base_url=server.url, max_retries=0, http_client=http_client)
+    service = LLMService(api_key="sk-ant-test-key-123456789", client=client,
+                         resilience=ResilientCaller(max_attempts=2, base_delay=0.01))
+    assert await service.generate_response("hello") == "reply 1"
+    assert service.resilience.stats()["retries"] == 1
+    await service.close()
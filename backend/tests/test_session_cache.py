@@ -0,0 +1,56 @@
+import time
+from app.services.session_cache import SessionCache
+
+def message(index, message_type="user"):
+    return {"content": f"message {index}", "type": message_type, "timestamp": None, "message_id": f"m{index}"}
+
+def test_recent_turns_are_served_only_when_the_cache_can_vouch_for_them():
+    cache = SessionCache(recent_messages=4)
+    cache.add("s1", total_messages=10, session_metadata={})
+    # Ten messages exist but none are cached yet
+    assert cache.recent("s1", 3) is None
+
+    cache.record("s1", message(10))
+    assert cache.recent("s1", 3) is None
+    assert cache.recent("s1", 1) == [message(10)]
+
+    cache.remember_recent("s1", [message(i) for i in range(5, 11)], cache.version("s1"))
+    assert [m["message_id"] for m in cache.recent("s1", 4)] == ["m7", "m8", "m9", "m10"]
+
+def test_new_session_is_served_in_full():
+    cache = SessionCache()
+    cache.add("s1", total_messages=0, session_metadata={})
+    cache.record("s1", message(0))
+    assert cache.recent("s1", 7) == [message(0)]
+    assert cache.get("s1").total_messages == 1
+
+def test_read_started_before_a_write_does_not_replace_newer_messages():
+    cache = SessionCache()
+    cache.add("s1", total_messages=3, session_metadata={})
+    version = cache.version("s1")
+    cache.record("s1", message(3))
+
+    cache.remember_recent("s1", [message(0), message(1), message(2)], version)
+    assert cache.recent("s1", 1) == [message(3)]
+    assert cache.recent("s1", 3) is None
+
+def test_metadata_follows_writes_and_invalidation_forgets_the_session():
+    cache = SessionCache()
+    cache.add("s1", total_messages=0, session_metadata={})
+    cache.update_metadata("s1", {"rolling_summary": {"text": "so far"}})
+    assert cache.get("s1").session_metadata == {"rolling_summary": {"text": "so far"}}
+
+    cache.invalidate("s1")
+    assert cache.get("s1") is None
+    cache.record("s1", message(0))
+    assert cache.get("s1") is None
+
+def test_entries_expire_and_are_bounded():
+    cache = SessionCache(maxsize=2, ttl_seconds=0.05)
+    for session_id in ["s1", "s2", "s3"]:
+        cache.add(session_id, total_messages=0, session_metadata={})
+    assert cache.get("s1") is None
+    assert cache.get("s3") is not None
+
+    time.sleep(0.06)
+    assert cache.get("s3") is None
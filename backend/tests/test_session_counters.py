@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+pytest.importorskip("app.database.models")
+
+from app.database.models import ChatSession, Message
+from app.services import session_counters
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    ChatSession.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(ChatSession(session_id="s1", session_metadata={}, total_messages=0))
+        session.flush()
+        session.execute(session_counters.initial_rows("s1"))
+        yield session
+
+def stats(db, session_id="s1"):
+    total = db.get(ChatSession, session_id, populate_existing=True).total_messages
+    return session_counters.stored_counts(total, db.execute(session_counters.counts_query(session_id)).all())
+
+def test_counters_follow_stored_rows(db):
+    for message_type in ["user", "therapist", "user"]:
+        for statement in session_counters.message_statements("s1", message_type):
+            db.execute(statement)
+    for statement in session_counters.insight_statements("s1"):
+        db.execute(statement)
+
+    assert stats(db) == {"total_messages": 3, "user_messages": 2, "therapist_messages": 1, "insights_count": 1}
+
+def test_metadata_writes_do_not_touch_the_counters(db):
+    """The rolling summary rewrites session_metadata; counts live elsewhere"""
+    for statement in session_counters.message_statements("s1", "user"):
+        db.execute(statement)
+    session = db.get(ChatSession, "s1", populate_existing=True)
+    session.session_metadata = {"rolling_summary": {"text": "so far", "summarized_messages": 1}}
+    db.flush()
+    for statement in session_counters.message_statements("s1", "therapist"):
+        db.execute(statement)
+
+    assert stats(db)["total_messages"] == 2
+    assert db.get(ChatSession, "s1", populate_existing=True).session_metadata["rolling_summary"]["text"] == "so far"
+
+def test_missing_or_stale_counters_are_not_trusted(db):
+    # A session from before the counters table
+    db.add(ChatSession(session_id="legacy", session_metadata={}, total_messages=4))
+    db.flush()
+    assert stats(db, "legacy") is None
+
+    # A message type without a counter row is still counted in total_messages
+    for statement in session_counters.message_statements("s1", "system"):
+        db.execute(statement)
+    assert stats(db) is None
+
+def test_repair_rebuilds_counters_from_grouped_rows(db):
+    for index, message_type in enumerate(["user", "user", "therapist"]):
+        db.add(Message(message_id=f"m{index}", session_id="s1", content="...", message_type=message_type))
+    db.flush()
+
+    rows = db.execute(session_counters.count_query("s1")).all()
+    statements, repaired = session_counters.repair("s1", rows)
+    for statement in statements:
+        db.execute(statement)
+
+    assert repaired == {"total_messages": 3, "user_messages": 2, "therapist_messages": 1, "insights_count": 0}
+    assert stats(db) == repaired
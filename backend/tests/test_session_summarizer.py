@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionRejected
+from app.services.session_summarizer import SessionSummarizer
+
+class FakeSessionStore:
+    def __init__(self, message_count):
+        self.messages = [
+            {"message_id": f"m{i}", "type": "user" if i % 2 == 0 else "therapist", "content": f"message {i}"}
+            for i in range(message_count)
+        ]
+        self.summary = {}
+
+    def get_rolling_summary(self, session_id):
+        return self.summary
+
+    def get_session_messages(self, session_id, offset=0, limit=50):
+        return self.messages[offset:offset + limit]
+
+    def save_rolling_summary(self, session_id, summary):
+        self.summary = summary
+        return True
+
+class InlineExecutor:
+    async def run_io(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+class FakeLLM:
+    def __init__(self, saturated=False, busy=False):
+        self.calls = []
+        self.saturated = saturated
+        self.busy = busy
+
+    def check_capacity(self):
+        if self.saturated:
+            raise AdmissionRejected("queue_full", 1)
+
+    async def summarize(self, previous_summary, transcript, max_tokens=300, model=None):
+        if self.busy:
+            raise AdmissionRejected("busy", 1)
+        self.calls.append((previous_summary, transcript))
+        return f"summary covering {transcript.count(chr(10)) + 1} new lines"
+
+async def drain(summarizer):
+    await asyncio.gather(*summarizer._tasks)
+
+@pytest.mark.asyncio
+async def test_summary_is_updated_every_k_turns_with_only_new_messages():
+    store, llm = FakeSessionStore(4), FakeLLM()
+    summarizer = SessionSummarizer(llm, store, InlineExecutor(), every_turns=2)
+
+    assert summarizer.maybe_schedule("s1", 4, store.summary)
+    await drain(summarizer)
+    assert store.summary["summarized_messages"] == 4
+    assert store.summary["last_message_id"] == "m3"
+
+    store.messages += [{"message_id": "m4", "type": "user", "content": "message 4"},
+                       {"message_id": "m5", "type": "therapist", "content": "message 5"}]
+    assert not summarizer.maybe_schedule("s1", 6, store.summary)  # one new turn is not enough yet
+
+    store.messages += [{"message_id": "m6", "type": "user", "content": "message 6"},
+                       {"message_id": "m7", "type": "therapist", "content": "message 7"}]
+    assert summarizer.maybe_schedule("s1", 8, store.summary)
+    await drain(summarizer)
+
+    previous, transcript = llm.calls[-1]
+    assert previous == "summary covering 4 new lines"
+    assert transcript.splitlines()[0] == "User: message 4"
+    assert store.summary["summarized_messages"] == 8
+
+@pytest.mark.asyncio
+async def test_only_one_update_runs_per_session():
+    store = FakeSessionStore(20)
+    summarizer = SessionSummarizer(FakeLLM(), store, InlineExecutor(), every_turns=2)
+    assert summarizer.maybe_schedule("s1", 20, {})
+    assert not summarizer.maybe_schedule("s1", 20, {})
+    await drain(summarizer)
+
+@pytest.mark.asyncio
+async def test_update_is_deferred_while_llm_is_saturated():
+    store, llm = FakeSessionStore(4), FakeLLM(saturated=True)
+    summarizer = SessionSummarizer(llm, store, InlineExecutor(), every_turns=2)
+    summarizer.maybe_schedule("s1", 4, {})
+    await drain(summarizer)
+    assert llm.calls == []
+    assert store.summary == {}
+    assert summarizer.stats()["skipped"] == 1
+
+@pytest.mark.asyncio
+async def test_update_is_deferred_when_no_slot_is_free():
+    """Passing the capacity check is not enough; the call itself must get a slot"""
+    store, llm = FakeSessionStore(4), FakeLLM(busy=True)
+    summarizer = SessionSummarizer(llm, store, InlineExecutor(), every_turns=2)
+    summarizer.maybe_schedule("s1", 4, {})
+    await drain(summarizer)
+    assert store.summary == {}
+    assert summarizer.stats()["skipped"] == 1
+    assert summarizer.maybe_schedule("s1", 4, {})
+    await asyncio.gather(*summarizer._tasks, return_exceptions=True)
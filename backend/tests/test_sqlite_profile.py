@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+
+pytest.importorskip("app.database.models")
+
+from app.database.models import Message
+from app.services.sqlite_profile import MIGRATIONS, apply_sqlite_pragmas, run_migrations
+
+def test_pragmas_are_set_on_new_connections(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    assert apply_sqlite_pragmas(engine, synchronous="normal", cache_size_kib=8192)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -8192
+
+def test_migrations_add_composite_indexes_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    Message.metadata.create_all(engine)
+
+    assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+
+    indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes(Message.__tablename__)}
+    assert indexes["ix_messages_session_timestamp"] == ["session_id", "timestamp"]
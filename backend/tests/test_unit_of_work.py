@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("app.database.connection")
+
+from app.services.unit_of_work import UnitOfWork, session_scope
+
+class FakeSession:
+    """Records what a unit of work does with its session"""
+
+    def __init__(self):
+        self.calls = []
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def close(self):
+        self.calls.append("close")
+
+def test_commits_once_and_closes():
+    db = FakeSession()
+    with UnitOfWork(lambda: db) as uow:
+        for _ in range(3):
+            with session_scope(uow) as shared:
+                assert shared is db
+    assert db.calls == ["commit", "close"]
+
+def test_rolls_back_on_error():
+    db = FakeSession()
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(lambda: db):
+            raise RuntimeError("flush failed")
+    assert db.calls == ["rollback", "close"]
+
+def test_counts_checkouts_and_commits():
+    before = UnitOfWork.stats()
+    with UnitOfWork(FakeSession):
+        pass
+    after = UnitOfWork.stats()
+    assert after["checkouts"] - before["checkouts"] == 1
+    assert after["commits"] - before["commits"] == 1
+    assert after["rollbacks"] == before["rollbacks"]
+
+def test_after_commit_callbacks_run_only_once_committed():
+    calls = []
+    with UnitOfWork(FakeSession) as uow:
+        uow.after_commit(lambda: calls.append("cache updated"))
+        assert calls == []
+    assert calls == ["cache updated"]
+
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(FakeSession) as uow:
+            uow.after_commit(lambda: calls.append("rolled back"))
+            raise RuntimeError("flush failed")
+    assert calls == ["cache updated"]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.vector_codec import PCAProjection, VectorCodec, normalize
+
+DIM = 32
+
+@pytest.fixture
+def vectors():
+    return normalize(np.random.default_rng(3).standard_normal((200, DIM)))
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 2e-2)])
+def test_round_trip_error_is_bounded(vectors, dtype, tolerance):
+    codec = VectorCodec(dtype=dtype)
+    stored, scales = codec.encode(vectors)
+    assert stored.dtype == np.dtype(dtype)
+    assert (scales is not None) == (dtype == "int8")
+    assert np.abs(codec.decode(stored, scales) - vectors).max() < tolerance
+
+def test_int8_scores_match_float_scores(vectors):
+    """Scale applied to scores equals scoring the dequantized vectors"""
+    codec = VectorCodec(dtype="int8")
+    stored, scales = codec.encode(vectors)
+    query = codec.prepare(vectors[0])
+    np.testing.assert_allclose(
+        codec.scores(stored, query, scales),
+        codec.decode(stored, scales) @ query,
+        rtol=1e-5, atol=1e-6
+    )
+    assert np.argmax(codec.scores(stored, query, scales)) == 0
+
+def test_pca_projection_reduces_dimension(vectors, tmp_path):
+    projection = PCAProjection.fit(vectors, n_components=8)
+    path = str(tmp_path / "pca.npz")
+    projection.save(path)
+    codec = VectorCodec(projection=PCAProjection.load(path))
+    assert codec.output_dim(DIM) == 8
+    stored, _ = codec.encode(vectors[:5])
+    assert stored.shape == (5, 8)
+    np.testing.assert_allclose(np.linalg.norm(stored, axis=1), 1.0, rtol=1e-5)
+
+def test_compact_store_keeps_exact_neighbour(vectors, tmp_path):
+    """An int8 NumPy store still finds the exact match first"""
+    store = NumpyVectorStore(str(tmp_path), dim=DIM, codec=VectorCodec(dtype="int8"))
+    store.add(
+        "s1",
+        ids=[f"id_{i}" for i in range(len(vectors))],
+        embeddings=vectors,
+        documents=[str(i) for i in range(len(vectors))],
+        metadatas=[{"message_id": str(i)} for i in range(len(vectors))]
+    )
+    assert store.query("s1", vectors[42], n_results=1)[0]["id"] == "id_42"
+    assert (tmp_path / "s1" / "vectors.i8").stat().st_size == len(vectors) * DIM
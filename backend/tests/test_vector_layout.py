@@ -0,0 +1,138 @@
+import importlib.util
+import os
+import zlib
+import numpy as np
+import pytest
+from app.services.vector_layout import (
+    LAYOUT_PER_SESSION,
+    LAYOUT_SHARED,
+    collection_name_for,
+    shard_for_session,
+)
+
+chromadb = pytest.importorskip("chromadb")
+from app.services.chroma_vector_store import ChromaVectorStore  # noqa: E402
+
+DIM = 8
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "migrate_vector_layout.py")
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("migrate_vector_layout", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def sessions_in_one_shard(shards, count=2):
+    """Session ids that crc32 routes to the same shard"""
+    by_shard = {}
+    for i in range(1000):
+        session_id = f"session-{i}"
+        by_shard.setdefault(shard_for_session(session_id, shards), []).append(session_id)
+        if len(by_shard[shard_for_session(session_id, shards)]) == count:
+            return by_shard[shard_for_session(session_id, shards)]
+    raise AssertionError("no shard collision found")
+
+def drop_cached_clients():
+    """Chroma refuses a second client on one path with other settings; drop the cached one"""
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+
+def add_messages(store, session_id, vectors):
+    store.add(
+        session_id,
+        ids=[f"user_{session_id}_{i}" for i in range(len(vectors))],
+        embeddings=np.array(vectors, dtype=np.float32),
+        documents=[f"{session_id} message {i}" for i in range(len(vectors))],
+        metadatas=[{"message_id": str(i), "message_type": "user", "session_id": session_id} for i in range(len(vectors))]
+    )
+
+def test_shard_routing_is_stable_crc32():
+    """Shards come from crc32, not hash(), so every process agrees"""
+    session_id = "3f2b9c1e-0000-4a4a-8b8b-123456789abc"
+    assert shard_for_session(session_id, 4) == zlib.crc32(session_id.encode("utf-8")) % 4
+    assert collection_name_for(session_id, LAYOUT_SHARED, 4) == f"messages_shard_{shard_for_session(session_id, 4)}"
+    assert collection_name_for(session_id, LAYOUT_PER_SESSION) == "session_3f2b9c1e_0000_4a4a_8b8b_123456789abc"
+    assert {shard_for_session(f"s{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+def test_unknown_layout_is_rejected():
+    with pytest.raises(ValueError):
+        collection_name_for("s1", "flat")
+
+def test_shared_layout_scopes_queries_to_the_session(tmp_path):
+    """Sessions sharing a shard never see each other's messages"""
+    first, second = sessions_in_one_shard(2)
+    store = ChromaVectorStore(str(tmp_path), LAYOUT_SHARED, shards=2)
+    add_messages(store, first, np.eye(DIM)[:3])
+    add_messages(store, second, np.eye(DIM)[3:5])
+
+    results = store.query(first, np.eye(DIM)[3], n_results=10)
+
+    assert results and all(r["metadata"]["session_id"] == first for r in results)
+    assert store.count(first) == 3
+    assert store.count(second) == 2
+
+def test_shared_layout_count_tracks_writes_and_deletes(tmp_path):
+    first, second = sessions_in_one_shard(2)
+    store = ChromaVectorStore(str(tmp_path), LAYOUT_SHARED, shards=2)
+    add_messages(store, first, np.eye(DIM)[:2])
+    assert store.count(first) == 2
+    store.add_records([
+        {"session_id": first, "id": "therapist_x", "embedding": np.eye(DIM)[5], "document": "reply",
+         "metadata": {"message_id": "x", "message_type": "therapist", "session_id": first}}
+    ])
+    assert store.count(first) == 3
+
+    store.delete_session(first)
+    assert store.count(first) == 0
+    assert store.count(second) == 0
+
+def test_migration_copies_and_is_safe_to_rerun(tmp_path):
+    """Per-session collections land in their shard once, even if the migration runs twice"""
+    migration = load_migration()
+    source = ChromaVectorStore(str(tmp_path), LAYOUT_PER_SESSION)
+    add_messages(source, "s1", np.eye(DIM)[:3])
+    add_messages(source, "s2", np.eye(DIM)[3:4])
+    drop_cached_clients()
+
+    first = migration.migrate(str(tmp_path), shards=2, batch_size=2, delete_source=False, dry_run=False)
+    second = migration.migrate(str(tmp_path), shards=2, batch_size=2, delete_source=True, dry_run=False)
+    drop_cached_clients()
+
+    assert first["sessions"] == second["sessions"] == 2
+    assert first["unverified"] == second["unverified"] == []
+    shared = ChromaVectorStore(str(tmp_path), LAYOUT_SHARED, shards=2)
+    assert shared.count("s1") == 3
+    assert shared.count("s2") == 1
+    assert shared.query("s2", np.eye(DIM)[3], n_results=5)[0]["id"] == "user_s2_0"
+    # Verified sources were deleted on the second run
+    names = {getattr(c, "name", c) for c in shared.client.list_collections()}
+    assert not any(name.startswith("session_") for name in names)
+
+def test_chroma_scores_match_numpy_cosine(tmp_path):
+    """Both backends report cosine similarity, including for legacy L2 collections"""
+    from app.services.numpy_vector_store import NumpyVectorStore
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((6, DIM))
+    query = rng.standard_normal(DIM)
+    numpy_store = NumpyVectorStore(str(tmp_path / "numpy"), dim=DIM)
+    chroma_store = ChromaVectorStore(str(tmp_path / "chroma"), LAYOUT_PER_SESSION)
+    add_messages(numpy_store, "s1", vectors)
+    add_messages(chroma_store, "s1", vectors)
+    # A collection created before the cosine space was configured
+    legacy = chroma_store.client.create_collection("session_legacy", metadata={"session_id": "legacy"})
+    legacy.add(ids=["user_legacy_0"], embeddings=chroma_store.codec.prepare(vectors[:1]))
+
+    expected = {r["id"]: r["similarity"] for r in numpy_store.query("s1", query, n_results=6)}
+    actual = {r["id"]: r["similarity"] for r in chroma_store.query("s1", query, n_results=6)}
+    legacy_score = chroma_store.query("legacy", query, n_results=1)[0]["similarity"]
+    numpy_store.close()
+
+    assert actual.keys() == expected.keys()
+    assert all(abs(actual[key] - expected[key]) < 1e-4 for key in expected)
+    assert abs(legacy_score - expected["user_s1_0"]) < 1e-4
+
+def test_existing_ids_are_scoped_to_the_store(tmp_path):
+    store = ChromaVectorStore(str(tmp_path), LAYOUT_SHARED, shards=1)
+    add_messages(store, "s1", np.eye(DIM)[:2])
+    assert store.existing_ids("s1", ["user_s1_0", "user_s1_5"]) == {"user_s1_0"}
+    assert store.existing_ids("s1", []) == set()
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import pytest
+from app.services.write_batcher import WriteBatcher
+
+class RecordingSink:
+    """Collects flush calls made by the batcher"""
+
+    def __init__(self, fail_keys=()):
+        self.calls = []
+        self.fail_keys = set(fail_keys)
+        self.lock = threading.Lock()
+
+    def flush(self, key, items):
+        if key in self.fail_keys:
+            raise IOError(f"disk full for {key}")
+        with self.lock:
+            self.calls.append((key, list(items)))
+
+def test_writes_are_grouped_per_key_in_one_flush():
+    sink = RecordingSink()
+    batcher = WriteBatcher(sink.flush, max_items=16, max_delay_ms=50)
+    try:
+        futures = [batcher.submit("shard_0" if i % 2 else "shard_1", i) for i in range(6)]
+        for future in futures:
+            future.result(timeout=2)
+        assert sorted(key for key, _ in sink.calls) == ["shard_0", "shard_1"]
+        assert sorted(item for _, items in sink.calls for item in items) == list(range(6))
+    finally:
+        batcher.close()
+
+def test_failed_flush_only_fails_its_key():
+    sink = RecordingSink(fail_keys={"broken"})
+    batcher = WriteBatcher(sink.flush, max_items=16, max_delay_ms=50)
+    try:
+        ok = batcher.submit("healthy", "a")
+        bad = batcher.submit("broken", "b")
+        ok.result(timeout=2)
+        with pytest.raises(IOError):
+            bad.result(timeout=2)
+    finally:
+        batcher.close()
+
+@pytest.mark.asyncio
+async def test_awaiting_writers_reach_the_batch_size():
+    """Coroutines awaiting their flush hold no thread, so a batch fills up completely"""
+    sink = RecordingSink()
+    batcher = WriteBatcher(sink.flush, max_items=32, max_delay_ms=2000)
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(asyncio.wrap_future(batcher.submit("shard_0", i)) for i in range(32))), timeout=1.5
+        )
+        assert [len(items) for _, items in sink.calls] == [32]
+    finally:
+        batcher.close()
+
+@pytest.mark.asyncio
+async def test_cancelled_awaiter_does_not_stop_the_batcher():
+    """The write still lands and later writes are flushed after an awaiter is cancelled"""
+    sink = RecordingSink()
+    batcher = WriteBatcher(sink.flush, max_items=16, max_delay_ms=50)
+    try:
+        abandoned = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("shard_0", "abandoned")))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.wait_for(asyncio.wrap_future(batcher.submit("shard_0", "next")), timeout=2)
+        assert batcher._worker.is_alive()
+        assert sorted(item for _, items in sink.calls for item in items) == ["abandoned", "next"]
+    finally:
+        batcher.close()
+
+def test_close_flushes_pending_writes():
+    """Writes still buffered at shutdown are flushed before the thread exits"""
+    sink = RecordingSink()
+    batcher = WriteBatcher(sink.flush, max_items=1000, max_delay_ms=10_000)
+    futures = [batcher.submit("shard_0", i) for i in range(3)]
+    batcher.close()
+    assert all(future.done() and future.exception() is None for future in futures)
+    assert sink.calls == [("shard_0", [0, 1, 2])]
+    with pytest.raises(RuntimeError):
+        batcher.submit("shard_0", 4)